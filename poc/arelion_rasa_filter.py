@@ -6,6 +6,7 @@ RASA Authorization Filter Example: DigitalOcean in Arelion AS-SET
 import json
 import os
 from typing import Set
+from asn_set import sorted_asns
 from irr_fetcher import fetch_asset, is_asn
 
 
@@ -34,7 +35,7 @@ def generate_junos_accept(peer_asn: int, peer_name: str, allowed_asns: Set[int])
         f"as-path-group AS{peer_asn}-allowed {{",
     ])
     
-    for asn in sorted(allowed_asns):
+    for asn in sorted_asns(allowed_asns):
         lines.append(f'    as-path allow-{asn} ".* {asn} .*";')
     
     lines.append("}")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Compact ASN Sets
+
+Immutable sorted-array representation for AS-SET closures.
+
+A Python set[int] costs 60+ bytes per ASN and every config generator sorts
+it again. ASNSet stores ASNs once in a sorted uint32 array (4 bytes per
+ASN), iterates in sorted order for free and supports the usual set
+operations, so large closures can be held across hundreds of peers.
+"""
+
+import heapq
+import operator
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Set as AbstractSet
+from typing import Iterable, Iterator, List, Union
+
+
+ASN_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+# Above this size ratio, intersections probe the larger set by binary
+# search instead of hashing both sides.
+_PROBE_RATIO = 16
+
+
+def _sorted_array(asns: Iterable[int]) -> array:
+    return array(ASN_TYPECODE, sorted(set(asns)))
+
+
+class ASNSet(AbstractSet):
+    """Immutable set of 32-bit ASNs backed by a sorted uint32 array."""
+
+    __slots__ = ('_asns',)
+
+    def __init__(self, asns: Iterable[int] = ()):
+        if isinstance(asns, ASNSet):
+            self._asns = asns._asns
+        else:
+            self._asns = _sorted_array(asns)
+
+    @classmethod
+    def from_sorted(cls, asns: Iterable[int]) -> "ASNSet":
+        """Build from ASNs already sorted and unique (not re-checked)."""
+        result = cls.__new__(cls)
+        result._asns = asns if isinstance(asns, array) else array(ASN_TYPECODE, asns)
+        return result
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[int]) -> "ASNSet":
+        return cls(it)
+
+    @classmethod
+    def union_all(cls, sets: Iterable[Iterable[int]]) -> "ASNSet":
+        """Union of many ASN collections, merging their sorted arrays."""
+        runs = [asns._asns if isinstance(asns, ASNSet) else _sorted_array(asns)
+                for asns in sets]
+        runs = [run for run in runs if run]
+        if len(runs) <= 1:
+            return cls.from_sorted(runs[0] if runs else array(ASN_TYPECODE))
+        merged = array(ASN_TYPECODE)
+        last = -1
+        for asn in heapq.merge(*runs):
+            if asn != last:
+                merged.append(asn)
+                last = asn
+        return cls.from_sorted(merged)
+
+    # -- container protocol -------------------------------------------------
+
+    def __contains__(self, asn) -> bool:
+        try:
+            asn = operator.index(asn)   # int, bool, numpy integers
+        except TypeError:
+            return False
+        asns = self._asns
+        i = bisect_left(asns, asn)
+        return i < len(asns) and asns[i] == asn
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._asns)
+
+    def __reversed__(self) -> Iterator[int]:
+        return reversed(self._asns)
+
+    def __len__(self) -> int:
+        return len(self._asns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ASNSet.from_sorted(self._asns[index])
+        return self._asns[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ASNSet):
+            return self._asns == other._asns
+        return AbstractSet.__eq__(self, other)
+
+    def __hash__(self) -> int:
+        # Equal to frozensets and other Sets, so it must hash like them
+        return AbstractSet._hash(self)
+
+    def __repr__(self) -> str:
+        if len(self._asns) > 8:
+            head = ", ".join(str(a) for a in self._asns[:8])
+            return f"ASNSet([{head}, ...] {len(self._asns)} ASNs)"
+        return f"ASNSet({self._asns.tolist()})"
+
+    # -- set algebra ----------------------------------------------------------
+
+    def union(self, *others: Iterable[int]) -> "ASNSet":
+        return ASNSet.union_all((self,) + others)
+
+    def intersection(self, other: Iterable[int]) -> "ASNSet":
+        if not isinstance(other, AbstractSet):
+            other = set(other)
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        if isinstance(large, ASNSet) and len(large) > _PROBE_RATIO * len(small):
+            return ASNSet(asn for asn in small if asn in large)
+        return ASNSet(set(small).intersection(large))
+
+    def difference(self, other: Iterable[int]) -> "ASNSet":
+        if not isinstance(other, AbstractSet):
+            other = set(other)
+        return ASNSet.from_sorted(
+            array(ASN_TYPECODE, (asn for asn in self._asns if asn not in other))
+        )
+
+    def __or__(self, other):
+        if not isinstance(other, AbstractSet):
+            return NotImplemented
+        return self.union(other)
+
+    __ror__ = __or__
+
+    def __and__(self, other):
+        if not isinstance(other, AbstractSet):
+            return NotImplemented
+        return self.intersection(other)
+
+    __rand__ = __and__
+
+    def __sub__(self, other):
+        if not isinstance(other, AbstractSet):
+            return NotImplemented
+        return self.difference(other)
+
+    def __rsub__(self, other):
+        if not isinstance(other, AbstractSet):
+            return NotImplemented
+        return ASNSet(other).difference(self)
+
+    # -- helpers --------------------------------------------------------------
+
+    def to_array(self) -> array:
+        """The underlying sorted uint32 array (shared, do not modify)."""
+        return self._asns
+
+    @property
+    def nbytes(self) -> int:
+        return self._asns.itemsize * len(self._asns)
+
+
+class ASNBitmap:
+    """
+    Mutable roaring-style ASN bitmap for deduplication.
+
+    The 32-bit ASN space is split into 65536-ASN chunks, each an 8 KB
+    bitmap allocated on first use. Memory grows with the number of chunks
+    touched rather than the number of ASNs seen.
+    """
+
+    __slots__ = ('_chunks', '_count')
+
+    def __init__(self):
+        self._chunks = {}
+        self._count = 0
+
+    def add(self, asn: int) -> bool:
+        """Add an ASN; return True if it was not already present."""
+        chunk = self._chunks.get(asn >> 16)
+        if chunk is None:
+            chunk = self._chunks[asn >> 16] = bytearray(8192)
+        low = asn & 0xFFFF
+        mask = 1 << (low & 7)
+        if chunk[low >> 3] & mask:
+            return False
+        chunk[low >> 3] |= mask
+        self._count += 1
+        return True
+
+    def __contains__(self, asn) -> bool:
+        chunk = self._chunks.get(asn >> 16)
+        if chunk is None:
+            return False
+        low = asn & 0xFFFF
+        return bool(chunk[low >> 3] & (1 << (low & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return 8192 * len(self._chunks)
+
+
+def sorted_asns(asns: Union[ASNSet, Iterable[int]]) -> Union[ASNSet, List[int]]:
+    """Sorted view of ASNs; free for ASNSet, sorts anything else."""
+    if isinstance(asns, ASNSet):
+        return asns
+    return sorted(asns)
+
+
+if __name__ == "__main__":
+    import random
+
+    print("Compact ASN Set")
+    print("=" * 70)
+
+    random.seed(1)
+    raw = {random.randrange(1, 400000) for _ in range(100000)}
+    compact = ASNSet(raw)
+
+    set_bytes = sys.getsizeof(raw) + sum(sys.getsizeof(a) for a in raw)
+    print(f"ASNs:             {len(compact)}")
+    print(f"set[int] size:    {set_bytes / 1024 / 1024:.2f} MB")
+    print(f"ASNSet size:      {(sys.getsizeof(compact._asns)) / 1024 / 1024:.2f} MB")
+
+    other = ASNSet(random.randrange(1, 400000) for _ in range(1000))
+    print(f"intersection:     {len(compact & other)} ASNs")
+    print(f"difference:       {len(other - compact)} ASNs")
+    print(f"15169 in set:     {15169 in compact}")
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+AS-SET Graph Engine
+
+In-memory graph of AS-SET objects with forward (set -> member) and
+reverse (member -> containing set) edges.
+
+The reverse edges form an inverted membership index: "which AS-SETs
+include AS15169?" is answered by walking up from the sets that list the
+ASN directly, touching only the sets in the answer instead of expanding
+every AS-SET in the registry. This is the chain-of-trust question from
+ARCHITECTURAL-LIMITATIONS.md and operational_tier1_attack.py.
+
+The index is maintained incrementally: update_object() and
+remove_object() adjust only the edges of the changed object, and drop
+only the memoized closures of that object and its ancestors.
+
+Identical bodies (same direct ASNs and nested sets, e.g. an AS-SET
+mirrored under another name or source) are stored once. A closure depends
+only on the body, so closures are memoized per body and computed once
+for all duplicates; dedup_stats() reports how much that saves.
+"""
+
+from collections import deque
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from asn_set import ASNSet
+from asset_names import NAMES, NameTable
+from batch_expander import plan_fetches
+from irr_fetcher import ASSET, fetch_asset, split_members
+
+
+_NO_SETS: Set[str] = frozenset()
+_EMPTY = ASNSet()
+
+# (direct ASNs, nested AS-SET names)
+Body = Tuple[FrozenSet[int], FrozenSet[str]]
+
+
+class ASSetGraph:
+    """AS-SET membership graph with an incrementally maintained reverse index."""
+
+    def __init__(self, name_table: Optional[NameTable] = None):
+        # All names are stored canonical and interned through name_table
+        self.name_table = name_table if name_table is not None else NAMES
+        self.asns: Dict[str, FrozenSet[int]] = {}
+        self.children: Dict[str, FrozenSet[str]] = {}
+        self.sources: Dict[str, str] = {}
+        # Reverse edges: member -> AS-SETs listing it directly
+        self.parents: Dict[str, Set[str]] = {}
+        self.asn_parents: Dict[int, Set[str]] = {}
+        # Shared bodies: name -> body, body -> (shared instance, reference count)
+        self._body: Dict[str, Body] = {}
+        self._bodies: Dict[Body, Tuple[Body, int]] = {}
+        # Memoized closures: body -> {max_depth: closure}
+        self._closures: Dict[Body, Dict[int, ASNSet]] = {}
+        # Called with the name of every AS-SET whose members changed
+        self._listeners: List[Callable[[str], None]] = []
+
+    @classmethod
+    def from_objects(cls, objects: Iterable[ASSET],
+                     name_table: Optional[NameTable] = None) -> "ASSetGraph":
+        """Build a graph from fetched AS-SET objects."""
+        graph = cls(name_table)
+        for asset in objects:
+            graph.add_object(asset)
+        return graph
+
+    @classmethod
+    def from_roots(cls, roots: Iterable[str], max_depth: int = 5,
+                   fetch: Callable[[str], Optional[ASSET]] = fetch_asset,
+                   workers: int = 1) -> "ASSetGraph":
+        """Fetch everything reachable from roots and build a graph of it."""
+        objects = plan_fetches(roots, max_depth, fetch, workers)
+        return cls.from_objects(asset for asset in objects.values() if asset)
+
+    # -- maintenance ----------------------------------------------------------
+
+    def add_object(self, asset: ASSET) -> None:
+        """Add or replace an AS-SET from its IRR object."""
+        asns, nested = split_members(asset)
+        self.update_object(asset.name, asns, nested, asset.source)
+
+    def update_object(self, name: str, asns: Iterable[int], nested: Iterable[str],
+                      source: str = "UNKNOWN"
+                      ) -> Tuple[FrozenSet[int], FrozenSet[int], FrozenSet[str], FrozenSet[str]]:
+        """
+        Replace an AS-SET's members, updating reverse edges incrementally.
+
+        Returns (asns_added, asns_removed, sets_added, sets_removed) for the
+        object's direct members.
+        """
+        canonical = self.name_table.canonical
+        name = canonical(name)
+        new_asns = frozenset(asns)
+        new_sets = frozenset(canonical(child) for child in nested)
+        old_asns = self.asns.get(name, frozenset())
+        old_sets = self.children.get(name, frozenset())
+
+        asns_added = new_asns - old_asns
+        asns_removed = old_asns - new_asns
+        sets_added = new_sets - old_sets
+        sets_removed = old_sets - new_sets
+
+        for asn in asns_removed:
+            self._unlink(self.asn_parents, asn, name)
+        for asn in asns_added:
+            self.asn_parents.setdefault(asn, set()).add(name)
+        for child in sets_removed:
+            self._unlink(self.parents, child, name)
+        for child in sets_added:
+            self.parents.setdefault(child, set()).add(name)
+
+        if name not in self.asns or asns_added or asns_removed or sets_added or sets_removed:
+            self._invalidate(name)
+            self._release(name)
+            body = self._share((new_asns, new_sets))
+            self._body[name] = body
+            self.asns[name], self.children[name] = body
+
+            self._notify(name)
+
+        self.sources[name] = source
+        return asns_added, asns_removed, sets_added, sets_removed
+
+    def remove_object(self, name: str) -> None:
+        """Remove an AS-SET object (references to it from parents remain)."""
+        name = self.name_table.lookup(name)
+        if name not in self.asns:
+            return
+        self.update_object(name, (), ())
+        self._invalidate(name)
+        self._release(name)
+        del self.asns[name]
+        del self.children[name]
+        del self.sources[name]
+        self._notify(name)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        """Call listener(name) after an AS-SET is added, changed or removed."""
+        self._listeners.append(listener)
+
+    def _notify(self, name: str) -> None:
+        for listener in self._listeners:
+            listener(name)
+
+    def _invalidate(self, name: str) -> None:
+        """Drop memoized closures that may include the named AS-SET."""
+        if not self._closures:
+            return
+        # The name's own body is left alone: identical mirrors still use
+        # its closure, and _release drops it with the last reference. If
+        # the name is on a cycle it is its own ancestor and dropped below.
+        for ancestor in self.ancestors(name):
+            self._closures.pop(self._body.get(ancestor), None)
+
+    def _share(self, body: Body) -> Body:
+        """The shared instance of an identical body, registering body if new."""
+        shared, refs = self._bodies.get(body, (body, 0))
+        self._bodies[shared] = (shared, refs + 1)
+        return shared
+
+    def _release(self, name: str) -> None:
+        body = self._body.pop(name, None)
+        if body is None:
+            return
+        shared, refs = self._bodies[body]
+        if refs > 1:
+            self._bodies[body] = (shared, refs - 1)
+        else:
+            del self._bodies[body]
+            self._closures.pop(body, None)
+
+    @staticmethod
+    def _unlink(index: dict, key, name: str) -> None:
+        holders = index.get(key)
+        if holders is None:
+            return
+        holders.discard(name)
+        if not holders:
+            del index[key]
+
+    # -- queries --------------------------------------------------------------
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.asns or self.name_table.lookup(name) in self.asns
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    def names(self) -> Iterator[str]:
+        return iter(self.asns)
+
+    def closure(self, name: str, max_depth: int = 5) -> ASNSet:
+        """
+        ASNs of an AS-SET expanded to max_depth, memoized per depth.
+
+        Uses the batch expander's depth rule: an AS-SET is expanded when its
+        distance from name is below max_depth. Missing objects contribute
+        nothing.
+        """
+        return self._closure(self.name_table.lookup(name), max_depth)
+
+    def _closure(self, name: str, max_depth: int) -> ASNSet:
+        if max_depth <= 0 or name not in self.asns:
+            return _EMPTY
+        body = self._body[name]
+        memo = self._closures.setdefault(body, {})
+        cached = memo.get(max_depth)
+        if cached is None:
+            direct, nested = body
+            if not direct and len(nested) == 1:
+                # Proxy set wrapping one nested set: share the child's closure
+                (child,) = nested
+                cached = self._closure(child, max_depth - 1)
+            else:
+                asns = set(direct)
+                for child in nested:
+                    asns.update(self._closure(child, max_depth - 1))
+                cached = ASNSet(asns)
+            memo[max_depth] = cached
+        return cached
+
+    def cached_closure(self, name: str, max_depth: int) -> Optional[ASNSet]:
+        """Memoized closure if one is available, without computing it."""
+        body = self._body.get(name) or self._body.get(self.name_table.lookup(name))
+        memo = self._closures.get(body) if body else None
+        return memo.get(max_depth) if memo else None
+
+    def dedup_stats(self) -> Dict[str, float]:
+        """How many AS-SET objects share a body with another one."""
+        objects = len(self._body)
+        unique = len(self._bodies)
+        return {
+            "objects": objects,
+            "unique_bodies": unique,
+            "duplicates": objects - unique,
+            "dedup_ratio": round(objects / unique, 3) if unique else 1.0,
+            "memoized_bodies": len(self._closures),
+        }
+
+    def duplicate_groups(self) -> List[List[str]]:
+        """Names of AS-SETs with identical bodies, one list per shared body."""
+        groups: Dict[Body, List[str]] = {}
+        for name, body in self._body.items():
+            if self._bodies[body][1] > 1:
+                groups.setdefault(body, []).append(name)
+        return sorted(sorted(names) for names in groups.values())
+
+    def direct_containers(self, asn: int) -> Set[str]:
+        """AS-SETs that list the ASN as a direct member."""
+        return self.asn_parents.get(asn, _NO_SETS)
+
+    def containing_sets(self, asn: int, max_depth: Optional[int] = None) -> Set[str]:
+        """
+        AS-SETs that contain the ASN directly or through nesting.
+
+        With max_depth, only AS-SETs whose expansion would reach the ASN
+        under expand_asset(max_depth=...) are returned. Cost is proportional
+        to the size of the answer.
+        """
+        return self._walk_up(self.direct_containers(asn), max_depth)
+
+    def ancestors(self, name: str, max_depth: Optional[int] = None) -> Set[str]:
+        """AS-SETs that include the named AS-SET directly or through nesting."""
+        name = self.name_table.lookup(name)
+        return self._walk_up(self.parents.get(name, _NO_SETS), max_depth)
+
+    def strongly_connected_components(self, names: Optional[Iterable[str]] = None
+                                      ) -> List[List[str]]:
+        """
+        AS-SET objects grouped into strongly connected components.
+
+        Components come out in reverse topological order (a component is
+        listed after every component it nests), so bottom-up computations
+        can process them in sequence. Iterative Tarjan, no recursion limit.
+        With names, only the subgraph of those AS-SETs is considered.
+        """
+        nodes = self.asns if names is None else {name for name in names if name in self.asns}
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        counter = 0
+
+        for start in nodes:
+            if start in index:
+                continue
+            work = [(start, iter(self.children[start]))]
+            index[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                name, children = work[-1]
+                for child in children:
+                    if child not in nodes:
+                        continue
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.children[child])))
+                        break
+                    if child in on_stack:
+                        lowlink[name] = min(lowlink[name], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[name])
+                    if lowlink[name] == index[name]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == name:
+                                break
+                        components.append(component)
+        return components
+
+    def _walk_up(self, start: Iterable[str], max_depth: Optional[int]) -> Set[str]:
+        if max_depth is not None and max_depth <= 0:
+            # expand_asset(max_depth=0) expands nothing
+            return set()
+        found = set(start)
+        frontier = deque((name, 1) for name in found)
+        while frontier:
+            name, level = frontier.popleft()
+            if max_depth is not None and level >= max_depth:
+                continue
+            for parent in self.parents.get(name, _NO_SETS):
+                if parent not in found:
+                    found.add(parent)
+                    frontier.append((parent, level + 1))
+        return found
+
+
+if __name__ == "__main__":
+    print("AS-SET Graph: Reverse Membership Index")
+    print("=" * 70)
+
+    registry = [
+        ASSET("AS2914:AS-GLOBAL", ["AS64496", "AS64497", "AS15169:AS-GOOGLE"], "NTTCOM"),
+        ASSET("AS15169:AS-GOOGLE", ["AS15169", "AS36040", "AS36384"], "RADB"),
+        ASSET("AS1299:AS-TWELVE99", ["AS1299", "AS2914:AS-GLOBAL"], "RIPE"),
+        ASSET("AS-EVIL:CUSTOMERS", ["AS99999", "AS1299:AS-TWELVE99"], "RADB"),
+    ]
+    graph = ASSetGraph.from_objects(registry)
+
+    print(f"\nAS15169 listed directly in: {sorted(graph.direct_containers(15169))}")
+    print(f"AS15169 contained in:       {sorted(graph.containing_sets(15169))}")
+    print(f"  within max_depth=2:       {sorted(graph.containing_sets(15169, max_depth=2))}")
+
+    print("\nGoogle removes AS15169 from AS15169:AS-GOOGLE ...")
+    graph.update_object("AS15169:AS-GOOGLE", [36040, 36384], [], "RADB")
+    print(f"AS15169 contained in:       {sorted(graph.containing_sets(15169))}")
+    print(f"AS36040 contained in:       {sorted(graph.containing_sets(36040))}")
+
+    print("\nAS-GOOGLE mirrored into a second registry under another name ...")
+    graph.update_object("AS-GOOGLE-MIRROR", [36040, 36384], [], "ALTDB")
+    stats = graph.dedup_stats()
+    print(f"Duplicate groups:           {graph.duplicate_groups()}")
+    print(f"Objects / unique bodies:    {stats['objects']} / {stats['unique_bodies']} "
+          f"(ratio {stats['dedup_ratio']})")
+    print(f"Closures shared:            "
+          f"{graph.closure('AS-GOOGLE-MIRROR') is graph.closure('AS15169:AS-GOOGLE')}")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Canonical AS-SET Names
+
+RPSL object names are case-insensitive (RFC 2622), but the IRR tools here
+compared them as raw strings: AS-Google and AS-GOOGLE got different cache
+keys, separate fetches and separate graph nodes.
+
+canonical_asset_name() gives the one spelling used everywhere (stripped,
+upper-case, including hierarchical names like AS2914:AS-US). NameTable
+interns canonical names: every spelling maps to a single shared string
+object and a compact integer ID. The graph's forward, reverse and memo
+dicts are keyed by the shared strings, so they reference one copy of
+each name instead of one copy per parsed member line; the RASA indexes
+key by the IDs.
+
+Only names of objects and members that are stored get registered.
+Queries use lookup() / get_id(), which never register, so asking about
+arbitrary names does not grow the table.
+
+NAMES is the process-wide table used by the fetcher, the cache keys, the
+graph engine and the RASA lookups, so IDs agree between them.
+"""
+
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+def canonical_asset_name(name: str) -> str:
+    """Canonical spelling of an AS-SET (or aut-num) name."""
+    return name.strip().upper()
+
+
+class NameTable:
+    """Interns canonical AS-SET names and assigns them integer IDs."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        # Registration is locked so concurrent fetch threads agree on IDs
+        self._lock = threading.Lock()
+
+    def canonical(self, name: str) -> str:
+        """The shared canonical string for name, registering it if new."""
+        return self._names[self.id(name)]
+
+    def id(self, name: str) -> int:
+        """Integer ID of name (any spelling), registering it if new."""
+        name_id = self._ids.get(name)
+        if name_id is not None:
+            return name_id
+        key = canonical_asset_name(name)
+        name_id = self._ids.get(key)
+        if name_id is not None:
+            return name_id
+        with self._lock:
+            name_id = self._ids.get(key)
+            if name_id is None:
+                name_id = len(self._names)
+                self._names.append(key)
+                self._ids[key] = name_id
+        return name_id
+
+    def lookup(self, name: str) -> Optional[str]:
+        """The shared canonical string for name, or None if it was never registered."""
+        name_id = self.get_id(name)
+        return self._names[name_id] if name_id is not None else None
+
+    def get_id(self, name: str) -> Optional[int]:
+        """Integer ID of name, or None if it was never registered."""
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = self._ids.get(canonical_asset_name(name))
+        return name_id
+
+    def name(self, name_id: int) -> str:
+        """Canonical name for an ID."""
+        return self._names[name_id]
+
+    def __contains__(self, name: str) -> bool:
+        return self.get_id(name) is not None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+NAMES = NameTable()
+
+
+def benchmark(n_sets: int = 50000, nested_per_set: int = 20) -> None:
+    """
+    Memory of an ASSetGraph with and without name interning.
+
+    Both graphs get the same input: every member reference is a distinct
+    string object, as when each WHOIS response is parsed separately. The
+    saving grows with fan-in (how often each AS-SET is nested elsewhere).
+    """
+    from asset_graph import ASSetGraph
+    from irr_fetcher import is_asn
+    from synthetic_registry import synthetic_registry
+
+    class RawNames(NameTable):
+        def canonical(self, name: str) -> str:
+            return name
+
+    registry = synthetic_registry(n_sets, nested_per_set=nested_per_set)
+    parsed = []
+    for asset in registry.values():
+        asns = [int(m[2:]) for m in asset.members if is_asn(m)]
+        nested = [m for m in asset.members if not is_asn(m)]
+        parsed.append((asset.name, asns, nested))
+
+    print(f"Synthetic registry: {n_sets} AS-SETs, "
+          f"{sum(len(n) for _, _, n in parsed)} nested references")
+    for label, table in (("raw strings", RawNames()), ("interned", NameTable())):
+        tracemalloc.start()
+        graph = ASSetGraph(name_table=table)
+        for name, asns, nested in parsed:
+            # Fresh string objects, as produced by parsing each response
+            graph.update_object((name + " ")[:-1], asns,
+                                [(child + " ")[:-1] for child in nested], "SYNTHETIC")
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {label:12s} {size / 1024 / 1024:7.1f} MB")
+
+
+if __name__ == "__main__":
+    print("Canonical AS-SET Names")
+    print("=" * 70)
+    for spelling in ("AS-Google", "as-google ", "AS-GOOGLE", "as2914:as-us"):
+        print(f"{spelling!r:16} -> {NAMES.canonical(spelling)!r} (id {NAMES.id(spelling)})")
+    print()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Batch AS-SET Expansion
+
+Expands many root AS-SETs together. Fleet jobs expand hundreds of peer
+AS-SETs that mostly share nested sets; expanding them one by one with
+expand_asset() re-fetches and re-walks the shared subtrees every time.
+
+The batch expander works in two phases:
+
+1. Plan: a level-by-level BFS from all roots at once collects one
+   deduplicated fetch set. Every AS-SET is fetched at most once for the
+   whole batch, and each level can be fetched in parallel.
+2. Expand: closures are computed from the fetched objects and memoized
+   per (AS-SET, remaining depth), so a nested set shared by many roots
+   is expanded once.
+
+Depth follows expand_asset(): the root is at depth 0 and an AS-SET is
+expanded when it is reachable from the root in fewer than max_depth
+steps. Because memoization is keyed on remaining depth, the result does
+not depend on member order.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from asn_set import ASNSet
+from irr_fetcher import ASSET, fetch_asset, split_members
+
+
+Fetcher = Callable[[str], Optional[ASSET]]
+_EMPTY = ASNSet()
+Closure = Tuple[ASNSet, FrozenSet[str], FrozenSet[str]]
+
+
+@dataclass
+class BatchStats:
+    """Work-sharing statistics for a batch expansion."""
+    roots: int = 0
+    objects_fetched: int = 0
+    object_visits: int = 0
+    closures_computed: int = 0
+    closures_reused: int = 0
+
+    @property
+    def fetches_saved(self) -> int:
+        """Fetches avoided compared with expanding every root separately."""
+        return self.object_visits - self.objects_fetched
+
+    @property
+    def sharing_ratio(self) -> float:
+        """Per-root object visits per actual fetch (1.0 = nothing shared)."""
+        if not self.objects_fetched:
+            return 1.0
+        return self.object_visits / self.objects_fetched
+
+    def as_dict(self) -> dict:
+        return {
+            "roots": self.roots,
+            "objects_fetched": self.objects_fetched,
+            "object_visits": self.object_visits,
+            "fetches_saved": self.fetches_saved,
+            "sharing_ratio": round(self.sharing_ratio, 2),
+            "closures_computed": self.closures_computed,
+            "closures_reused": self.closures_reused,
+        }
+
+
+@dataclass
+class BatchExpansion:
+    """Per-root results of a batch expansion plus sharing statistics.
+
+    Each result has the same shape as expand_asset(): (asns, nested_sets, log),
+    with asns as a compact ASNSet shared with the memoized closures.
+    """
+    results: Dict[str, Tuple[ASNSet, Set[str], List[dict]]] = field(default_factory=dict)
+    stats: BatchStats = field(default_factory=BatchStats)
+
+
+def plan_fetches(roots: Iterable[str], max_depth: int = 5,
+                 fetch: Fetcher = fetch_asset,
+                 workers: int = 1) -> Dict[str, Optional[ASSET]]:
+    """
+    Fetch every AS-SET reachable from any root within max_depth, once.
+
+    Runs a multi-source BFS: an AS-SET is fetched when its shortest distance
+    from any root is below max_depth. Missing objects map to None.
+    """
+    objects: Dict[str, Optional[ASSET]] = {}
+    frontier = sorted(set(roots))
+    depth = 0
+
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while frontier and depth < max_depth:
+            if executor:
+                fetched = list(executor.map(fetch, frontier))
+            else:
+                fetched = [fetch(name) for name in frontier]
+
+            objects.update(zip(frontier, fetched))
+            next_frontier = set()
+            for asset in fetched:
+                if asset is None:
+                    continue
+                for nested in split_members(asset)[1]:
+                    if nested not in objects:
+                        next_frontier.add(nested)
+
+            frontier = sorted(next_frontier)
+            depth += 1
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return objects
+
+
+class _ClosureBuilder:
+    """Memoized closures over a fetched object map."""
+
+    def __init__(self, objects: Dict[str, Optional[ASSET]], stats: BatchStats):
+        self.objects = objects
+        self.stats = stats
+        self.members: Dict[str, Tuple[List[int], List[str]]] = {}
+        self.memo: Dict[Tuple[str, int], Closure] = {}
+
+    def _members(self, name: str) -> Tuple[List[int], List[str]]:
+        members = self.members.get(name)
+        if members is None:
+            members = split_members(self.objects[name])
+            self.members[name] = members
+        return members
+
+    def closure(self, name: str, depth: int) -> Closure:
+        """
+        Return (asns, nested_sets, visited_sets) for name with depth levels left.
+
+        visited_sets holds the AS-SETs the expansion looked up (found or not);
+        nested_sets holds every AS-SET referenced by a found, visited set.
+        """
+        if depth <= 0:
+            return _EMPTY, frozenset(), frozenset()
+        if self.objects.get(name) is None:
+            return _EMPTY, frozenset(), frozenset((name,))
+
+        key = (name, depth)
+        cached = self.memo.get(key)
+        if cached is not None:
+            self.stats.closures_reused += 1
+            return cached
+
+        direct_asns, direct_sets = self._members(name)
+        asns = set(direct_asns)
+        nested = set(direct_sets)
+        visited = {name}
+        for child in direct_sets:
+            sub_asns, sub_nested, sub_visited = self.closure(child, depth - 1)
+            asns.update(sub_asns)
+            nested |= sub_nested
+            visited |= sub_visited
+
+        result = (ASNSet(asns), frozenset(nested), frozenset(visited))
+        self.memo[key] = result
+        self.stats.closures_computed += 1
+        return result
+
+
+def expand_assets_batch(roots: Iterable[str], max_depth: int = 5,
+                        fetch: Fetcher = fetch_asset,
+                        workers: int = 1) -> BatchExpansion:
+    """
+    Expand many AS-SETs together, sharing fetched objects and sub-closures.
+
+    Args:
+        roots: AS-SET names to expand
+        max_depth: Same meaning as in expand_asset()
+        fetch: Function returning an ASSET (or None) for a name
+        workers: Number of parallel fetches per BFS level
+
+    Returns:
+        BatchExpansion with per-root (asns, nested_sets, log) and statistics
+    """
+    roots = list(dict.fromkeys(roots))
+    objects = plan_fetches(roots, max_depth, fetch, workers)
+
+    batch = BatchExpansion()
+    batch.stats.roots = len(roots)
+    batch.stats.objects_fetched = len(objects)
+    builder = _ClosureBuilder(objects, batch.stats)
+
+    for root in roots:
+        asns, nested, visited = builder.closure(root, max_depth)
+
+        log = []
+        for name in sorted(nested | {root}):
+            asset = objects.get(name)
+            if name not in visited:
+                log.append({"asset": name, "action": "max_depth"})
+            elif asset is None:
+                log.append({"asset": name, "action": "not_found"})
+            else:
+                log.append({"asset": name, "source": asset.source, "action": "expanded"})
+
+        batch.stats.object_visits += len(visited)
+        batch.results[root] = (asns, set(nested), log)
+
+    return batch
+
+
+if __name__ == "__main__":
+    roots = sys.argv[1:] or ["AS-14061", "AS-GOOGLE"]
+
+    print("Batch AS-SET Expansion")
+    print("=" * 70)
+
+    batch = expand_assets_batch(roots, max_depth=3)
+    for root, (asns, nested, _) in batch.results.items():
+        print(f"{root}: {len(asns)} ASNs, {len(nested)} nested AS-SETs")
+
+    print("\nStatistics:")
+    for key, value in batch.stats.as_dict().items():
+        print(f"  {key}: {value}")
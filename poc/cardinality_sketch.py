@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Cardinality Sketches for AS-SETs
+
+Approximate closure sizes without expanding anything.
+
+Each AS-SET gets a HyperLogLog sketch of its full (unbounded-depth)
+closure, merged bottom-up through the graph's strongly connected
+components, so every estimate afterwards is O(1). The index follows its
+graph: when an AS-SET changes, only its sketch and those of the AS-SETs
+nesting it are rebuilt. Sketches are small
+(2**precision bytes) and mergeable, which makes two uses cheap:
+
+- choosing an expansion strategy from the estimated size, and
+- comparing snapshots to flag sudden growth, the classic signature of a
+  leak where someone nests a full-table AS-SET into a customer set.
+
+small_as_sets.json already lists expected sizes; check_expected_sizes()
+compares those ranges against the estimates.
+"""
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asset_graph import ASSetGraph
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(value: int) -> int:
+    """splitmix64 finalizer; spreads sequential ASNs over 64 bits."""
+    z = (value + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch over integers (ASNs)."""
+
+    __slots__ = ('precision', 'registers', '_estimate')
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._estimate: Optional[float] = None
+
+    def add(self, asn: int) -> None:
+        x = _hash64(asn)
+        p = self.precision
+        index = x >> (64 - p)
+        rest = x & ((1 << (64 - p)) - 1)
+        rank = (64 - p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            self._estimate = None
+
+    def update(self, asns: Iterable[int]) -> None:
+        for asn in asns:
+            self.add(asn)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """In-place union with another sketch of the same precision."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        self._estimate = None
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = bytearray(self.registers)
+        sketch._estimate = self._estimate
+        return sketch
+
+    def estimate(self) -> float:
+        """Estimated number of distinct ASNs added (cached until changed)."""
+        if self._estimate is None:
+            m = len(self.registers)
+            alpha = 0.7213 / (1 + 1.079 / m)
+            raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+            zeros = self.registers.count(0)
+            if raw <= 2.5 * m and zeros:
+                raw = m * math.log(m / zeros)
+            self._estimate = raw
+        return self._estimate
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def __len__(self) -> int:
+        return round(self.estimate())
+
+
+class SketchIndex:
+    """Per-AS-SET closure sketches over an ASSetGraph."""
+
+    def __init__(self, graph: ASSetGraph, precision: int = 10):
+        self.precision = precision
+        self.graph = graph
+        self.sketches: Dict[str, HyperLogLog] = {}
+        self._build(graph)
+        graph.subscribe(self.refresh)
+
+    def _build(self, graph: ASSetGraph, names: Optional[Iterable[str]] = None) -> None:
+        # Components arrive children-first; members of a cycle share a sketch.
+        for component in graph.strongly_connected_components(names):
+            sketch = HyperLogLog(self.precision)
+            members = set(component)
+            for name in component:
+                sketch.update(graph.asns[name])
+                for child in graph.children[name]:
+                    if child not in members and child in self.sketches:
+                        sketch.merge(self.sketches[child])
+            for name in component:
+                self.sketches[name] = sketch
+
+    def refresh(self, name: str) -> None:
+        """Rebuild the sketches of a changed AS-SET and of every AS-SET nesting it."""
+        # Every member of a cycle through an ancestor is itself an
+        # ancestor, so the affected components are complete
+        affected = self.graph.ancestors(name)
+        affected.add(name)
+        for stale in affected:
+            self.sketches.pop(stale, None)
+        self._build(self.graph, affected)
+
+    def estimate(self, name: str) -> Optional[int]:
+        """Estimated closure size, or None for an unknown AS-SET."""
+        sketch = self.sketches.get(name)
+        return len(sketch) if sketch is not None else None
+
+    def snapshot(self) -> Dict[str, int]:
+        """Estimates for every AS-SET, for storing alongside a run."""
+        return {name: len(sketch) for name, sketch in self.sketches.items()}
+
+
+def growth_alarms(previous: Dict[str, int], current: Dict[str, int],
+                  ratio: float = 2.0, min_increase: int = 50) -> List[Dict]:
+    """
+    Flag AS-SETs whose estimated closure grew suddenly between snapshots.
+
+    An alarm needs both a size ratio of at least `ratio` and an absolute
+    increase of at least `min_increase` ASNs, so small sets gaining a
+    couple of members stay quiet. AS-SETs missing from `previous` count as
+    empty: a new set that is already large raises an alarm.
+    """
+    alarms = []
+    for name, size in current.items():
+        before = previous.get(name, 0)
+        if size - before >= min_increase and size >= ratio * max(before, 1):
+            alarms.append({
+                "asset": name,
+                "previous": before,
+                "current": size,
+                "growth": round(size / max(before, 1), 1),
+                "severity": "security_event"
+            })
+    return sorted(alarms, key=lambda a: -a["growth"])
+
+
+def load_expected_sizes(path: Optional[Path] = None) -> Dict[str, Tuple[int, int]]:
+    """Parse the expected_size ranges ("30-35 ASNs") from small_as_sets.json."""
+    path = path or Path(__file__).parent / "small_as_sets.json"
+    with open(path) as f:
+        data = json.load(f)
+    expected = {}
+    for entry in data.get("sets", []):
+        numbers = [int(n) for n in re.findall(r'\d+', entry.get("expected_size", ""))]
+        if numbers:
+            expected[entry["name"]] = (min(numbers), max(numbers))
+    return expected
+
+
+def check_expected_sizes(index: SketchIndex, expected: Dict[str, Tuple[int, int]],
+                         tolerance: float = 2.0) -> List[Dict]:
+    """AS-SETs whose estimate is more than `tolerance` times the expected maximum."""
+    findings = []
+    for name, (low, high) in expected.items():
+        estimate = index.estimate(name)
+        if estimate is not None and estimate > tolerance * high:
+            findings.append({"asset": name, "expected": f"{low}-{high}",
+                             "estimate": estimate})
+    return findings
+
+
+if __name__ == "__main__":
+    from irr_fetcher import ASSET
+    from synthetic_registry import synthetic_registry
+
+    print("AS-SET Cardinality Sketches")
+    print("=" * 70)
+
+    registry = synthetic_registry(5000)
+    graph = ASSetGraph.from_objects(registry.values())
+    index = SketchIndex(graph)
+    before = index.snapshot()
+
+    for name in ("AS-SYN0", "AS-SYN100", "AS-SYN4000"):
+        exact = len(graph.closure(name, max_depth=len(graph)))
+        print(f"{name}: estimate {index.estimate(name)}, exact {exact}")
+
+    print("\nLeak: AS-SYN4000 starts nesting a 20k-ASN full-table set ...")
+    graph.add_object(ASSET("AS-FULLTABLE", [f"AS{n}" for n in range(100000, 120000)], "TEST"))
+    leaked = registry["AS-SYN4000"]
+    graph.add_object(ASSET(leaked.name, leaked.members + ["AS-FULLTABLE"], leaked.source))
+    after = index.snapshot()
+    assert after == SketchIndex(graph).snapshot()
+
+    alarms = growth_alarms(before, after)
+    print(f"{len(alarms)} growth alarms, top 3:")
+    for alarm in alarms[:3]:
+        print(f"  {alarm['asset']}: {alarm['previous']} -> {alarm['current']} "
+              f"(x{alarm['growth']})")
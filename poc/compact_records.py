@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Memory-Compact IRR and RASA Records
+
+ASSET and the RASA dataclasses in rasa_validator carry a per-instance
+__dict__ and keep members as "AS123" strings that every expansion
+re-classifies with is_asn(). For registry-scale data (a million AS-SETs)
+that is most of the memory and a good share of the CPU.
+
+The records here are tuple-backed (NamedTuple: no __dict__, no per-field
+object headers beyond the tuple) and store members pre-classified:
+
+- ASNs as a sorted array('I') of uint32 values,
+- AS-SET names as sorted array('I') of IDs from the shared NameTable,
+- RASA flags and propagation scopes as plain bools.
+
+The loaders build them straight from member strings (compact_asset), from
+existing objects (from_asset / from_content) or from a whole rasa_db
+(load_rasa_db). Records convert back to the original types for code that
+has not moved over.
+"""
+
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from asn_set import ASN_TYPECODE, ASNSet
+from asset_names import NAMES, NameTable, canonical_asset_name
+from irr_fetcher import ASSET, is_asn, split_members
+from rasa_validator import (
+    AuthorizedEntry, DelegationToken, PropagationScope, RasaAuthContent,
+    RasaAuthFlags, RasaFlags, RasaSetContent,
+)
+
+
+ID_TYPECODE = 'I'
+
+
+def _sorted_asns(asns: Iterable[int]) -> array:
+    return array(ASN_TYPECODE, sorted(set(asns)))
+
+
+def _sorted_ids(names: Iterable[str], table: NameTable) -> array:
+    return array(ID_TYPECODE, sorted({table.id(name) for name in names}))
+
+
+class CompactASSET(NamedTuple):
+    """AS-SET object with members split into ASN values and nested set IDs."""
+    name_id: int
+    asns: array
+    nested: array
+    source: str
+
+    @property
+    def name(self) -> str:
+        return NAMES.name(self.name_id)
+
+    @property
+    def nested_names(self) -> List[str]:
+        return [NAMES.name(set_id) for set_id in self.nested]
+
+    def asn_set(self) -> ASNSet:
+        return ASNSet.from_sorted(self.asns)
+
+    def to_asset(self) -> ASSET:
+        members = [f"AS{asn}" for asn in self.asns] + self.nested_names
+        return ASSET(name=self.name, members=members, source=self.source)
+
+    @classmethod
+    def from_asset(cls, asset: ASSET) -> "CompactASSET":
+        return compact_asset(asset.name, asset.members, asset.source)
+
+
+def compact_asset(name: str, members: Iterable[str], source: str) -> CompactASSET:
+    """
+    Build a CompactASSET directly from WHOIS member strings.
+
+    IDs come from the shared NAMES table, which the records resolve names
+    through.
+    """
+    asns, nested = split_members(ASSET(name, members, source))
+    return CompactASSET(NAMES.id(name), _sorted_asns(asns),
+                        _sorted_ids(nested, NAMES), sys.intern(source))
+
+
+def load_registry(objects: Iterable[ASSET]) -> Dict[int, CompactASSET]:
+    """Compact records keyed by name ID (the objects can be a generator)."""
+    registry = {}
+    for asset in objects:
+        record = compact_asset(asset.name, asset.members, asset.source)
+        registry[record.name_id] = record
+    return registry
+
+
+class CompactAuthorizedEntry(NamedTuple):
+    set_id: int
+    direct_only: bool = False
+
+    @classmethod
+    def from_content(cls, entry: AuthorizedEntry) -> "CompactAuthorizedEntry":
+        return cls(NAMES.id(entry.asSetName),
+                   entry.propagation == PropagationScope.DIRECT_ONLY)
+
+    def to_content(self) -> AuthorizedEntry:
+        scope = PropagationScope.DIRECT_ONLY if self.direct_only else PropagationScope.UNRESTRICTED
+        return AuthorizedEntry(NAMES.name(self.set_id), scope)
+
+
+class CompactRasaSet(NamedTuple):
+    set_id: int
+    containing_as: int
+    members: array
+    nested: array
+    irr_source: Optional[str] = None
+    do_not_inherit: bool = False
+    authoritative: bool = False
+    not_before: str = ""
+    not_after: str = ""
+    version: int = 0
+
+    @classmethod
+    def from_content(cls, content: RasaSetContent) -> "CompactRasaSet":
+        return cls(NAMES.id(content.asSetName), content.containingAS,
+                   _sorted_asns(content.members), _sorted_ids(content.nestedSets, NAMES),
+                   content.irrSource, content.flags.doNotInherit,
+                   content.flags.authoritative, content.notBefore,
+                   content.notAfter, content.version)
+
+    def to_content(self) -> RasaSetContent:
+        return RasaSetContent(
+            version=self.version, asSetName=NAMES.name(self.set_id),
+            containingAS=self.containing_as, members=list(self.members),
+            nestedSets=[NAMES.name(set_id) for set_id in self.nested],
+            irrSource=self.irr_source,
+            flags=RasaFlags(self.do_not_inherit, self.authoritative),
+            notBefore=self.not_before, notAfter=self.not_after)
+
+
+class CompactRasaAuth(NamedTuple):
+    authorized_as: Optional[int]
+    authorized_set: Optional[int]
+    authorized_in: Tuple[CompactAuthorizedEntry, ...]
+    strict_mode: bool = False
+    not_before: str = ""
+    not_after: str = ""
+    version: int = 0
+
+    @classmethod
+    def from_content(cls, content: RasaAuthContent) -> "CompactRasaAuth":
+        authorized_set = (NAMES.id(content.authorizedSet)
+                          if content.authorizedSet is not None else None)
+        return cls(content.authorizedAS, authorized_set,
+                   tuple(CompactAuthorizedEntry.from_content(e) for e in content.authorizedIn),
+                   content.flags.strictMode, content.notBefore, content.notAfter,
+                   content.version)
+
+    def to_content(self) -> RasaAuthContent:
+        authorized_set = (NAMES.name(self.authorized_set)
+                          if self.authorized_set is not None else None)
+        return RasaAuthContent(
+            version=self.version, authorizedAS=self.authorized_as,
+            authorizedSet=authorized_set,
+            authorizedIn=[entry.to_content() for entry in self.authorized_in],
+            flags=RasaAuthFlags(self.strict_mode),
+            notBefore=self.not_before, notAfter=self.not_after)
+
+
+class CompactDelegationToken(NamedTuple):
+    delegated_to: str
+    scope: array
+    not_before: str
+    not_after: str
+    issued_by: int
+
+    @classmethod
+    def from_content(cls, token: DelegationToken) -> "CompactDelegationToken":
+        return cls(sys.intern(token.delegatedTo), _sorted_ids(token.scope, NAMES),
+                   token.notBefore, token.notAfter, token.issuedBy)
+
+    def to_content(self) -> DelegationToken:
+        return DelegationToken(self.delegated_to,
+                               [NAMES.name(set_id) for set_id in self.scope],
+                               self.not_before, self.not_after, self.issued_by)
+
+
+def compact_rasa_record(obj: Any) -> Any:
+    """Compact form of a RasaSetContent, RasaAuthContent or DelegationToken."""
+    if isinstance(obj, RasaSetContent):
+        return CompactRasaSet.from_content(obj)
+    if isinstance(obj, RasaAuthContent):
+        return CompactRasaAuth.from_content(obj)
+    if isinstance(obj, DelegationToken):
+        return CompactDelegationToken.from_content(obj)
+    raise TypeError(f"Not a RASA record: {type(obj).__name__}")
+
+
+def load_rasa_db(rasa_db: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact copy of a rasa_db (or delegation_db), keys canonicalized."""
+    return {_canonical_key(key): compact_rasa_record(obj) for key, obj in rasa_db.items()}
+
+
+def _canonical_key(key: str) -> str:
+    """Canonical rasa_db key; AS-SET names are interned, ASN keys are not."""
+    key = canonical_asset_name(key)
+    return key if is_asn(key) else NAMES.canonical(key)
+
+
+def _traced(build) -> Tuple[Any, float, float]:
+    """Run build() under tracemalloc; return (result, MB, seconds)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size / 1024 / 1024, elapsed
+
+
+def benchmark(n_sets: int = 20000, n_auths: int = 10000) -> None:
+    """Memory of dataclass vs compact records on a synthetic registry."""
+    from synthetic_registry import iter_synthetic_objects
+
+    print(f"Synthetic registry: {n_sets} AS-SETs")
+    registry, size, elapsed = _traced(
+        lambda: {a.name: a for a in iter_synthetic_objects(n_sets, asn_pool=400000)})
+    print(f"  ASSET dataclasses: {size:8.1f} MB ({elapsed:.1f}s)")
+    del registry
+
+    compact, size, elapsed = _traced(
+        lambda: load_registry(iter_synthetic_objects(n_sets, asn_pool=400000)))
+    print(f"  CompactASSET:      {size:8.1f} MB ({elapsed:.1f}s, includes name table)")
+    del compact
+
+    print(f"\n{n_auths} RASA-AUTH objects with 3 authorizedIn entries each")
+
+    def auths():
+        return {
+            f"AS{asn}": RasaAuthContent(
+                authorizedAS=asn,
+                authorizedIn=[AuthorizedEntry(f"AS-SYN{(asn * k) % n_sets}") for k in (1, 2, 3)],
+                notBefore="2025-01-01T00:00:00Z", notAfter="2026-01-01T00:00:00Z")
+            for asn in range(1, n_auths + 1)
+        }
+
+    rasa_db, size, _ = _traced(auths)
+    print(f"  RasaAuthContent:   {size:8.1f} MB")
+    _, size, _ = _traced(lambda: load_rasa_db(rasa_db))
+    print(f"  CompactRasaAuth:   {size:8.1f} MB")
+
+
+if __name__ == "__main__":
+    print("Memory-Compact IRR and RASA Records")
+    print("=" * 70)
+    record = compact_asset("AS-Example", ["AS15169", "as-sub", "AS36040", "AS15169"], "RADB")
+    print(f"{record.name}: asns={list(record.asns)} nested={record.nested_names}")
+    print(f"round trip: {record.to_asset()}\n")
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Concurrent RASA Validation
+
+RASAValidator appends to self.log on every check and keeps an optional
+shared DecisionCache, so one instance cannot serve a thread pool or an
+HTTP server: requests interleave their log entries, and nothing says
+which snapshot a multi-step request saw.
+
+ConcurrentValidator applies read-copy-update over compiled snapshots:
+
+- read:   every request takes `snapshots.current` once and uses only that
+          immutable RasaSnapshot, with no locks
+- copy:   update() compiles the new rasa_db/delegation_db aside, under a
+          writer lock, including the NumPy form of the AuthIndex, so no
+          reader ever compiles anything
+- update: the finished snapshot is installed with one reference swap;
+          requests already running finish on the snapshot they started with
+
+Nothing on the read path is shared and mutable. session() returns a
+RASAValidator pinned to the current snapshot with its own log (one per
+request), and the one-shot checks below log nothing. AS-SET names from
+requests are looked up without registering them (AuthIndex.set_id() maps
+unknown names to UNKNOWN_SET), in checks and sessions alike; only nested
+AS-SETs named by IRR objects fetched during an expansion are registered,
+like any stored object's members. The IRR provider given for expansions
+is shared and must itself be safe to call from several threads.
+
+check_members_auth() does its work in np.searchsorted over whole arrays,
+which releases the GIL, so batch checks scale with threads on a multi-core
+machine; scalar checks are bound by the GIL and do not.
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from decision_log import DecisionLog, reason_text
+from irr_fetcher import ASSET
+from rasa_index import AuthReason
+from rasa_snapshot import RasaSnapshot, SnapshotHolder, compile_snapshot
+from rasa_validator import RASAValidator
+
+try:
+    import numpy as np
+    import rasa_batch
+except ImportError:
+    np = None
+
+
+class ConcurrentValidator:
+    """Thread-safe RASA checks over RCU-published snapshots."""
+
+    def __init__(self, rasa_db: Dict[str, Any], delegation_db: Optional[Dict[str, Any]] = None,
+                 provider: Optional[Callable[[str], Optional[ASSET]]] = None):
+        self.rasa_db = rasa_db
+        self.delegation_db = delegation_db or {}
+        self.provider = provider
+        # Serializes writers only; readers never take it
+        self._writer = threading.Lock()
+        self.snapshots = SnapshotHolder(self._prepare(
+            compile_snapshot(rasa_db, delegation_db=self.delegation_db)))
+
+    @staticmethod
+    def _prepare(snapshot: RasaSnapshot) -> RasaSnapshot:
+        """Build everything readers could otherwise build lazily."""
+        if np is not None:
+            rasa_batch.compiled(snapshot.auth)
+        return snapshot
+
+    @property
+    def snapshot(self) -> RasaSnapshot:
+        return self.snapshots.current
+
+    def update(self, rasa_db: Optional[Dict[str, Any]] = None,
+               delegation_db: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+        """Compile new data (default: the current dicts) and publish it."""
+        with self._writer:
+            if rasa_db is not None:
+                self.rasa_db = rasa_db
+            if delegation_db is not None:
+                self.delegation_db = delegation_db
+            snapshot = self._prepare(compile_snapshot(
+                self.rasa_db, self.snapshots.current.table, self.delegation_db))
+            self.snapshots.install(snapshot)
+        return snapshot
+
+    def session(self, log: Any = "ring") -> RASAValidator:
+        """
+        A RASAValidator for one request: pinned to the current snapshot,
+        with its own decision log and no decision cache.
+        """
+        return RASAValidator(self.rasa_db, self.delegation_db, log=log,
+                             provider=self.provider, snapshot=self.snapshots.current)
+
+    def check_member_auth(self, asn: int, asset_name: str) -> Tuple[bool, str]:
+        """RASAValidator.check_member_auth without a log."""
+        auth = self.snapshots.current.auth
+        decision = auth.member(asn, auth.set_id(asset_name))
+        return decision.authorized, reason_text(AuthReason.of(decision), decision.direct_only)
+
+    def check_members_auth(self, asns: Any, asset_name: str) -> "rasa_batch.BatchAuthResult":
+        """Vectorized member check against the current snapshot (requires NumPy)."""
+        if np is None:
+            raise ImportError("check_members_auth requires NumPy")
+        return rasa_batch.compiled(self.snapshots.current.auth).check_members_auth(asns, asset_name)
+
+    def validate_delegations(self, objects: Iterable[Tuple[Any, str]],
+                             when: Optional[float] = None) -> List[Tuple[bool, str]]:
+        return self.session("off").validate_delegations(objects, when)
+
+    def expand(self, asset_name: str, max_depth: int = 10,
+               log: Any = "off") -> Tuple[Set[int], DecisionLog]:
+        """Expand asset_name in a new session; returns its ASNs and log."""
+        return self.session(log).expand(asset_name, max_depth)
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    from rasa_validator import PropagationScope, create_rasa_auth
+
+    print("Concurrent RASA Validation")
+    print("=" * 70)
+
+    n_asns = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    policies = [f"AS{64500 + i}:AS-CUSTOMERS" for i in range(10)]
+    rasa_db = {
+        f"AS{asn}": create_rasa_auth(
+            asn=asn, strict_mode=asn % 5 == 0,
+            authorized_in=[(policies[(asn + k) % len(policies)], PropagationScope.UNRESTRICTED)
+                           for k in range(3)])
+        for asn in range(1, n_asns + 1, 2)
+    }
+    validator = ConcurrentValidator(rasa_db)
+
+    # Per-request logs: concurrent sessions never see each other's entries
+    def logged_request(i: int) -> int:
+        session = validator.session("ring")
+        for asn in range(1, 101):
+            session.check_member_auth(asn, policies[i % len(policies)])
+        return len(list(session.log))
+
+    with ThreadPoolExecutor(8) as pool:
+        sizes = set(pool.map(logged_request, range(64)))
+    print(f"64 concurrent sessions x 100 checks: log sizes {sizes}")
+
+    # Requests keep their snapshot while a writer publishes new ones
+    stop = threading.Event()
+    seen_versions: Set[int] = set()
+
+    def reader() -> None:
+        while not stop.is_set():
+            session = validator.session("off")
+            version = session.snapshot.version
+            session.check_member_auth(1, policies[0])
+            assert session.snapshot.version == version
+            seen_versions.add(version)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(3):
+        validator.update()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f"4 readers during 3 updates saw versions {sorted(seen_versions)}")
+
+    closure = list(range(1, n_asns + 1))
+    requests_per_run = 32
+    chunk = max(1, n_asns // requests_per_run)
+
+    def scalar_request(i: int) -> int:
+        policy = policies[i % len(policies)]
+        lo = (i * chunk) % n_asns + 1
+        return sum(validator.check_member_auth(asn, policy)[0] for asn in range(lo, lo + chunk))
+
+    def batch_request(i: int) -> int:
+        return int(validator.check_members_auth(closure_array, policies[i % len(policies)]).mask.sum())
+
+    def throughput(request: Callable[[int], int], threads: int, checks_per_request: int) -> float:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(request, range(requests_per_run)))
+        return requests_per_run * checks_per_request / (time.perf_counter() - start)
+
+    print(f"\nthroughput, {n_asns // 2} RASA-AUTH objects, {os.cpu_count()} CPU(s):")
+    if np is not None:
+        closure_array = np.array(closure, dtype=np.int64)
+        print(f"  {'threads':>7} {'scalar checks/s':>16} {'batch checks/s':>16}")
+        for threads in (1, 2, 4, 8):
+            scalar = throughput(scalar_request, threads, chunk)
+            batch = throughput(batch_request, threads, n_asns)
+            print(f"  {threads:>7} {scalar:>16,.0f} {batch:>16,.0f}")
+    else:
+        print(f"  {'threads':>7} {'scalar checks/s':>16}   (batch path needs NumPy)")
+        for threads in (1, 2, 4, 8):
+            print(f"  {threads:>7} {throughput(scalar_request, threads, chunk):>16,.0f}")
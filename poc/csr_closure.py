@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Vectorized Bulk Transitive Closure over CSR Arrays
+
+Computes the closure of every AS-SET in a registry at once, for analytics
+over whole registries where per-set expand_asset() recursion is too slow.
+
+The AS-SET graph is encoded as two CSR (compressed sparse row) adjacency
+structures over interned integer IDs:
+
+    set_indptr / set_indices   AS-SET -> nested AS-SET edges
+    asn_indptr / asn_indices   AS-SET -> member ASN edges
+
+Closures are computed for batches of roots with level-synchronous BFS in
+which each level is a handful of NumPy gathers over (root, set) pairs,
+instead of Python recursion per node. Depth follows the "bfs" semantics
+of irr_fetcher; max_depth=None means unbounded (plain reachability).
+
+Requires NumPy.
+"""
+
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from asn_set import ASN_TYPECODE, ASNSet
+from asset_names import canonical_asset_name
+from irr_fetcher import ASSET, split_members
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("csr_closure requires NumPy (pip install numpy)")
+
+
+def _gather(indptr, indices, rows, nodes):
+    """
+    Expand (row, node) pairs along CSR edges.
+
+    Returns (rows, targets) with one pair per edge leaving each node.
+    """
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    total = int(degrees.sum())
+    if not total:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    targets = indices[np.repeat(starts, degrees) + offsets]
+    return np.repeat(rows, degrees), targets
+
+
+class CSRGraph:
+    """AS-SET graph as CSR arrays over interned integer IDs."""
+
+    def __init__(self, set_names: List[str], n_objects: int, asn_values,
+                 set_indptr, set_indices, asn_indptr, asn_indices):
+        _require_numpy()
+        # IDs below n_objects are fetched objects; the rest are referenced
+        # but unknown AS-SETs (leaf nodes).
+        self.set_names = set_names
+        self.n_objects = n_objects
+        self.set_ids: Dict[str, int] = {name: i for i, name in enumerate(set_names)}
+        self.asn_values = asn_values
+        self.set_indptr = set_indptr
+        self.set_indices = set_indices
+        self.asn_indptr = asn_indptr
+        self.asn_indices = asn_indices
+
+    def set_id(self, name: str) -> Optional[int]:
+        """ID of an AS-SET (any spelling), or None if the graph does not mention it."""
+        set_id = self.set_ids.get(name)
+        return set_id if set_id is not None else self.set_ids.get(canonical_asset_name(name))
+
+    @classmethod
+    def from_objects(cls, objects: Iterable[ASSET]) -> "CSRGraph":
+        """Encode fetched AS-SET objects. Unknown nested sets become leaf nodes."""
+        _require_numpy()
+        # One row per AS-SET, keyed by canonical name like split_members()'
+        # nested names: of duplicates (e.g. the same set from two sources,
+        # or two spellings) the first object wins
+        parsed = []
+        set_ids: Dict[str, int] = {}
+        for asset in objects:
+            name = canonical_asset_name(asset.name)
+            if name not in set_ids:
+                set_ids[name] = len(parsed)
+                parsed.append((name, *split_members(asset)))
+        set_names = [name for name, _, _ in parsed]
+        n_objects = len(set_names)
+        for _, _, nested in parsed:
+            for child in nested:
+                if child not in set_ids:
+                    set_ids[child] = len(set_names)
+                    set_names.append(child)
+
+        asn_values = np.unique(np.fromiter(
+            (asn for _, asns, _ in parsed for asn in asns), dtype=np.int64
+        )).astype(np.uint32)
+
+        n_sets = len(set_names)
+        set_degree = np.zeros(n_sets + 1, dtype=np.int64)
+        asn_degree = np.zeros(n_sets + 1, dtype=np.int64)
+        set_edges = []
+        asn_edges = []
+        for name, asns, nested in parsed:
+            i = set_ids[name]
+            unique_asns = sorted(set(asns))
+            unique_sets = sorted({set_ids[child] for child in nested})
+            asn_degree[i + 1] = len(unique_asns)
+            set_degree[i + 1] = len(unique_sets)
+            asn_edges.append(unique_asns)
+            set_edges.append(unique_sets)
+
+        set_indices = np.fromiter((j for edges in set_edges for j in edges), dtype=np.int64)
+        asn_members = np.fromiter((a for edges in asn_edges for a in edges), dtype=np.int64)
+        asn_indices = np.searchsorted(asn_values, asn_members).astype(np.int64)
+
+        return cls(set_names, n_objects, asn_values, np.cumsum(set_degree), set_indices,
+                   np.cumsum(asn_degree), asn_indices)
+
+    @classmethod
+    def from_graph(cls, graph) -> "CSRGraph":
+        """Encode an ASSetGraph."""
+        objects = (
+            ASSET(name, [f"AS{asn}" for asn in graph.asns[name]] + sorted(graph.children[name]),
+                  graph.sources[name])
+            for name in graph.names()
+        )
+        return cls.from_objects(objects)
+
+    @property
+    def n_sets(self) -> int:
+        return len(self.set_names)
+
+    @property
+    def n_asns(self) -> int:
+        return len(self.asn_values)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.asn_values, self.set_indptr, self.set_indices,
+                                       self.asn_indptr, self.asn_indices))
+
+
+@dataclass
+class BulkClosures:
+    """
+    Closures of many AS-SETs as flat arrays.
+
+    sizes[i] is the closure size of roots[i]; with memberships kept, the
+    ASN IDs of roots[i] are asn_ids[indptr[i]:indptr[i+1]], sorted.
+    """
+    graph: CSRGraph
+    roots: "np.ndarray"
+    sizes: "np.ndarray"
+    indptr: Optional["np.ndarray"] = None
+    asn_ids: Optional["np.ndarray"] = None
+
+    def _row(self, name: str) -> int:
+        set_id = self.graph.set_id(name)
+        if set_id is None:
+            raise KeyError(name)
+        row = int(np.searchsorted(self.roots, set_id))
+        if row == len(self.roots) or self.roots[row] != set_id:
+            raise KeyError(name)
+        return row
+
+    def closure(self, name: str) -> ASNSet:
+        """Closure of one root as an ASNSet."""
+        if self.indptr is None:
+            raise ValueError("Memberships were not kept (keep_members=False)")
+        row = self._row(name)
+        ids = self.asn_ids[self.indptr[row]:self.indptr[row + 1]]
+        values = array(ASN_TYPECODE)
+        values.frombytes(self.graph.asn_values[ids].astype(np.uint32).tobytes())
+        return ASNSet.from_sorted(values)
+
+    def size_of(self, name: str) -> int:
+        return int(self.sizes[self._row(name)])
+
+
+def _closure_batch(graph: CSRGraph, roots, max_depth: Optional[int]) -> Tuple:
+    """Return (rows, asn_ids) membership pairs for one batch of roots, deduplicated."""
+    n_sets = graph.n_sets
+    batch = len(roots)
+    visited = np.zeros(batch * n_sets, dtype=bool)
+
+    rows = np.arange(batch, dtype=np.int64)
+    nodes = roots.astype(np.int64)
+    visited[rows * n_sets + nodes] = True
+    expanded_rows = []
+    expanded_nodes = []
+
+    level = 0
+    while len(rows) and (max_depth is None or level < max_depth):
+        expanded_rows.append(rows)
+        expanded_nodes.append(nodes)
+        if max_depth is not None and level + 1 >= max_depth:
+            break
+        child_rows, children = _gather(graph.set_indptr, graph.set_indices, rows, nodes)
+        keys = np.unique(child_rows * n_sets + children)
+        keys = keys[~visited[keys]]
+        visited[keys] = True
+        rows, nodes = keys // n_sets, keys % n_sets
+        level += 1
+
+    if not expanded_rows or not graph.n_asns:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    member_rows, asn_ids = _gather(graph.asn_indptr, graph.asn_indices,
+                                   np.concatenate(expanded_rows),
+                                   np.concatenate(expanded_nodes))
+    keys = np.unique(member_rows * graph.n_asns + asn_ids)
+    return keys // graph.n_asns, keys % graph.n_asns
+
+
+def compute_closures(graph: CSRGraph, roots: Optional[Iterable[str]] = None,
+                     max_depth: Optional[int] = None, batch_size: int = 256,
+                     keep_members: bool = True) -> BulkClosures:
+    """
+    Compute closures for roots (default: every AS-SET object in the graph).
+
+    batch_size bounds the visited bitmap at batch_size * n_sets bytes.
+    With keep_members=False only the size array is kept.
+    """
+    _require_numpy()
+    if roots is None:
+        root_ids = np.arange(graph.n_objects, dtype=np.int64)
+    else:
+        root_ids = []
+        for name in roots:
+            set_id = graph.set_id(name)
+            if set_id is None:
+                raise KeyError(name)
+            root_ids.append(set_id)
+        root_ids = np.unique(np.array(root_ids, dtype=np.int64))
+
+    sizes = np.zeros(len(root_ids), dtype=np.int64)
+    member_chunks = []
+    for start in range(0, len(root_ids), batch_size):
+        batch = root_ids[start:start + batch_size]
+        rows, asn_ids = _closure_batch(graph, batch, max_depth)
+        sizes[start:start + len(batch)] = np.bincount(rows, minlength=len(batch))
+        if keep_members:
+            member_chunks.append(asn_ids)
+
+    result = BulkClosures(graph=graph, roots=root_ids, sizes=sizes)
+    if keep_members:
+        result.indptr = np.concatenate(([0], np.cumsum(sizes)))
+        result.asn_ids = (np.concatenate(member_chunks) if member_chunks
+                          else np.empty(0, dtype=np.int64))
+    return result
+
+
+def benchmark(n_sets: int = 5000, max_depth: int = 10) -> None:
+    """
+    Compare bulk CSR closures with per-set recursive expand_asset().
+
+    Timing is against the default recursive mode; correctness is checked
+    against expand_asset(mode="bfs"), whose depth semantics the CSR engine
+    implements exactly.
+    """
+    from irr_fetcher import expand_asset
+    from synthetic_registry import registry_fetcher, synthetic_registry
+
+    registry = synthetic_registry(n_sets)
+    fetch = registry_fetcher(registry)
+    print(f"Synthetic registry: {n_sets} AS-SETs, max_depth={max_depth}")
+
+    start = time.perf_counter()
+    graph = CSRGraph.from_objects(registry.values())
+    encode_time = time.perf_counter() - start
+    print(f"  CSR encoding:           {encode_time:.3f}s "
+          f"({graph.n_sets} sets, {graph.n_asns} ASNs, {graph.nbytes() / 1024:.0f} KB)")
+
+    start = time.perf_counter()
+    bulk = compute_closures(graph, max_depth=max_depth)
+    bulk_time = time.perf_counter() - start
+    print(f"  Bulk CSR closures:      {bulk_time:.3f}s "
+          f"({int(bulk.sizes.sum())} memberships, largest {int(bulk.sizes.max())} ASNs)")
+
+    start = time.perf_counter()
+    for name in registry:
+        expand_asset(name, max_depth, fetch=fetch)
+    recursive_time = time.perf_counter() - start
+    print(f"  Recursive expand_asset: {recursive_time:.3f}s")
+    print(f"  Speedup:                {recursive_time / bulk_time:.1f}x")
+
+    mismatches = sum(
+        1 for name in registry
+        if bulk.closure(name) != expand_asset(name, max_depth, mode="bfs", fetch=fetch)[0]
+    )
+    print(f"  Closures differing from bfs reference: {mismatches}")
+
+
+if __name__ == "__main__":
+    _require_numpy()
+    print("Vectorized Bulk Transitive Closure")
+    print("=" * 70)
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+
+    # Object names and references in any case resolve to one row
+    mixed = CSRGraph.from_objects([ASSET("AS-Root", ["AS1", "as-child"], "TEST"),
+                                   ASSET("AS-Child", ["AS2"], "TEST")])
+    mixed_closures = compute_closures(mixed, ["as-root"])
+    assert list(mixed_closures.closure("AS-ROOT")) == [1, 2]
+    print(f"\nMixed-case registry: AS-Root -> {list(mixed_closures.closure('as-root'))}")
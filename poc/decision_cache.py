@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Authorization Decision Cache
+
+The same (ASN, AS-SET) pairs are checked over and over: once per peer
+policy that references the AS-SET, again for every vendor output, and in
+the peer-lock pass. DecisionCache remembers the outcome of each member
+check - authorized flag, reason code, reason text, propagation - so a
+repeated check skips the index lookups and the reason formatting.
+
+Keys are (asn, set_id, snapshot_version). Attached to a SnapshotHolder,
+the cache empties itself whenever a new snapshot is installed; the
+version in the key also keeps a check still running on the previous
+snapshot from filling the cache with stale answers for the new one.
+
+The cache holds at most maxsize decisions and evicts the oldest
+insertion first. Hits do not reorder entries (an LRU move-to-end costs
+more than the index lookup it would save), so a hit is one dict probe.
+It counts hits, misses, evictions and invalidations; evictions and
+invalidations are counted under the lock, while hits and misses are
+counted without it and may undercount when several threads look up at
+once.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from rasa_snapshot import SnapshotHolder
+
+
+class CachedDecision(NamedTuple):
+    authorized: bool
+    reason_text: str
+    reason: int         # AuthReason
+    direct_only: bool
+
+
+@dataclass
+class CacheStats:
+    """Cache counters; hits and misses are approximate under concurrency."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 3)}
+
+
+class DecisionCache:
+    """Bounded cache of member authorization decisions per snapshot version."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Tuple[int, int, int], CachedDecision]" = OrderedDict()
+        # Serializes inserts and evictions; lookups do not take it
+        self._lock = threading.Lock()
+
+    def get(self, asn: int, set_id: int, version: int) -> Optional[CachedDecision]:
+        # Lock-free: concurrent increments may be lost, so the counts are approximate
+        decision = self._entries.get((asn, set_id, version))
+        if decision is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return decision
+
+    def put(self, asn: int, set_id: int, version: int, decision: CachedDecision) -> None:
+        with self._lock:
+            entries = self._entries
+            entries[(asn, set_id, version)] = decision
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, *_) -> None:
+        """Drop every entry (called when a new snapshot is installed)."""
+        with self._lock:
+            self._entries = OrderedDict()
+            self.stats.invalidations += 1
+
+    def attach(self, holder: SnapshotHolder) -> "DecisionCache":
+        """Invalidate on every snapshot installed in holder."""
+        holder.subscribe(self.invalidate)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+if __name__ == "__main__":
+    from rasa_validator import PropagationScope, RASAValidator, create_rasa_auth
+
+    print("Authorization Decision Cache")
+    print("=" * 70)
+
+    n_asns = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    policies = [f"AS{64500 + i}:AS-CUSTOMERS" for i in range(5)]
+    rasa_db = {
+        f"AS{asn}": create_rasa_auth(
+            asn=asn, strict_mode=asn % 3 == 0,
+            authorized_in=[(policies[(asn + k) % 5], PropagationScope.UNRESTRICTED)
+                           for k in range(2)])
+        for asn in range(1, n_asns + 1)
+    }
+    # Every policy is checked once per vendor output (Juniper, Cisco,
+    # BIRD) and once more in the peer-lock pass
+    passes = 4
+
+    def run(validator: RASAValidator) -> float:
+        start = time.perf_counter()
+        for _ in range(passes):
+            for policy in policies:
+                for asn in range(1, n_asns + 1):
+                    validator.check_member_auth(asn, policy)
+        return time.perf_counter() - start
+
+    plain = RASAValidator(rasa_db, log="off")
+    cached = RASAValidator(rasa_db, log="off", decision_cache=DecisionCache(maxsize=200000))
+    plain_time = run(plain)
+    cached_time = run(cached)
+    checks = passes * len(policies) * n_asns
+    print(f"{checks} member checks ({passes} passes over {len(policies)} policies)")
+    print(f"  index lookups:  {plain_time:.2f}s")
+    print(f"  decision cache: {cached_time:.2f}s  {cached.decision_cache.stats.as_dict()}")
+
+    cached.reload()
+    print(f"\nafter reload (snapshot v{cached.snapshot.version}): "
+          f"{len(cached.decision_cache)} entries, {cached.decision_cache.stats.as_dict()}")
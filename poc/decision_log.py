@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Bounded RASA Decision Logs
+
+RASAValidator.log used to be a list that got a freshly built dict, with a
+formatted reason string, on every authorization check and was never
+cleared, so a long-running validator grew without bound.
+
+The validator now writes to a sink that stores each decision as a few
+small fields:
+
+    kind      member check, nested-set check or expansion action
+    subject   ASN (member checks), nested AS-SET or action subject
+    set       AS-SET checked against, or the action's second name
+    code      AuthReason, or the action code
+    severity  Severity (none, warning, security_event)
+
+AS-SET names are kept as references to the canonical strings the
+validator already holds, so names that are not in the shared NameTable
+(e.g. AS-SETs without RASA data) are logged without registering them.
+Expansion actions are a code plus up to two names; the message text
+comes from ACTIONS when rendered.
+
+Sinks:
+
+- NullLog ("off"):       records nothing; the validator skips logging
+                         entirely, so a check costs only its lookups.
+- RingLog ("ring"):      the last N decisions in a deque (the default).
+- ColumnarLog ("columnar"): decisions as rows of typed arrays and name
+                         columns, trimmed to the most recent `capacity`
+                         rows in chunks.
+
+Iterating a sink renders the same dicts the validator used to append, so
+existing `for entry in validator.log` code works unchanged; the strings
+are only built at that point.
+"""
+
+import sys
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from rasa_index import AuthReason
+
+
+MEMBER = 0
+NESTED = 1
+NESTED_RASA_SET = 2   # nested check where the key holds a RASA-SET
+ACTION = 3
+ENTRY = 4             # arbitrary dict appended by other code
+
+
+class Severity(IntEnum):
+    NONE = 0
+    WARNING = 1
+    SECURITY_EVENT = 2
+
+
+SEVERITY = {
+    AuthReason.NO_AUTH: Severity.NONE,
+    AuthReason.AUTHORIZED: Severity.NONE,
+    AuthReason.REJECTED_NOT_LISTED: Severity.WARNING,
+    AuthReason.REJECTED_STRICT: Severity.SECURITY_EVENT,
+}
+
+_SEVERITY_NAMES = {Severity.WARNING: "warning", Severity.SECURITY_EVENT: "security_event"}
+
+_REASONS = {
+    AuthReason.NO_AUTH: "No RASA-AUTH (default allow)",
+    AuthReason.REJECTED_NOT_LISTED: "REJECTED: not in authorizedIn",
+    AuthReason.REJECTED_STRICT: "REJECTED: strictMode=TRUE, not authorized",
+}
+
+# Expansion actions: (action, subject key, second name key, message)
+ACTIONS: Tuple[Tuple[str, str, Optional[str], Optional[str]], ...] = (
+    ("circular_reference", "asset", None, "Circular reference detected, skipping"),
+    ("max_depth", "asset", None, "Maximum depth reached"),
+    ("reuse_closure", "asset", None, "Authorized closure already computed"),
+    ("authoritative_rasa", "asset", None, "Using authoritative RASA-SET, ignoring IRR"),
+    ("merge_rasa", "asset", None, "Merging RASA-SET with IRR data"),
+    ("irr_only", "asset", None, "No RASA-SET found, using IRR data"),
+    ("do_not_inherit", "nested_set", None, "doNotInherit set, including reference only"),
+    ("expand_nested", "nested_set", "parent", None),
+)
+ACTION_CODES = {action[0]: code for code, action in enumerate(ACTIONS)}
+
+
+def reason_text(reason: int, direct_only: bool = False, rasa_set: bool = False) -> str:
+    """The validator's human-readable reason for a decision."""
+    if reason == AuthReason.AUTHORIZED:
+        return "Authorized (DIRECT_ONLY)" if direct_only else "Authorized (UNRESTRICTED)"
+    if rasa_set and reason == AuthReason.NO_AUTH:
+        return "No RASA-AUTH for AS-SET (default allow)"
+    return _REASONS[reason]
+
+
+# (kind, subject, set, code, severity, direct_only). subject is the ASN for
+# MEMBER rows and a name otherwise (the dict itself for ENTRY rows); set
+# is a name or None.
+Record = Tuple[int, Any, Optional[str], int, int, bool]
+
+
+class DecisionLog(ABC):
+    """Base sink: compact records in, rendered dicts out."""
+
+    enabled = True
+
+    def member(self, asn: int, asset: str, reason: int, direct_only: bool = False) -> None:
+        self._add((MEMBER, asn, asset, reason, SEVERITY[reason], direct_only))
+
+    def nested(self, nested_set: str, parent_set: str, reason: int,
+               direct_only: bool = False, rasa_set: bool = False) -> None:
+        kind = NESTED_RASA_SET if rasa_set else NESTED
+        self._add((kind, nested_set, parent_set, reason, SEVERITY[reason], direct_only))
+
+    def action(self, action: str, subject: str, other: Optional[str] = None) -> None:
+        """Record an expansion action (see ACTIONS)."""
+        self._add((ACTION, subject, other, ACTION_CODES[action], 0, False))
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Record an arbitrary dict (the log used to be a list of dicts)."""
+        self._add((ENTRY, entry, None, 0, 0, False))
+
+    @abstractmethod
+    def _add(self, record: Record) -> None:
+        """Store one record."""
+
+    @abstractmethod
+    def records(self) -> Iterator[Record]:
+        """Stored records, oldest first."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every record."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of records kept."""
+
+    @staticmethod
+    def render(record: Record) -> Dict[str, Any]:
+        """The dict the validator used to append for this record."""
+        kind, subject, set_name, code, severity, direct_only = record
+        if kind == ENTRY:
+            return subject
+        if kind == ACTION:
+            action, subject_key, other_key, message = ACTIONS[code]
+            entry = {"action": action, subject_key: subject}
+            if other_key is not None:
+                entry[other_key] = set_name
+            if message is not None:
+                entry["message"] = message
+            return entry
+        if kind == MEMBER:
+            entry = {"asn": subject, "asset": set_name}
+        else:
+            entry = {"nested_set": subject, "parent_set": set_name}
+        entry["authorized"] = code <= AuthReason.AUTHORIZED
+        entry["reason"] = reason_text(code, direct_only, kind == NESTED_RASA_SET)
+        if severity:
+            entry["severity"] = _SEVERITY_NAMES[severity]
+        return entry
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.render(record) for record in self.records())
+
+    def query(self, severity: Severity = Severity.NONE) -> Iterator[Dict[str, Any]]:
+        """Rendered decisions at or above a severity (actions only at NONE)."""
+        return (self.render(record) for record in self.records()
+                if record[4] >= severity)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of logged checks per AuthReason."""
+        counts = dict.fromkeys((reason.name for reason in AuthReason), 0)
+        for kind, _, _, code, _, _ in self.records():
+            if kind < ACTION:
+                counts[AuthReason(code).name] += 1
+        return counts
+
+
+class NullLog(DecisionLog):
+    """Logging off."""
+
+    enabled = False
+
+    def _add(self, record: Record) -> None:
+        pass
+
+    def records(self) -> Iterator[Record]:
+        return iter(())
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class RingLog(DecisionLog):
+    """The most recent `capacity` decisions."""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._ring: deque = deque(maxlen=capacity)
+
+    def _add(self, record: Record) -> None:
+        self._ring.append(record)
+
+    def records(self) -> Iterator[Record]:
+        return iter(list(self._ring))
+
+    def clear(self) -> None:
+        self._ring.clear()
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+
+class ColumnarLog(DecisionLog):
+    """
+    The most recent `capacity` decisions (None: all) as rows of columns.
+
+    Rows past the capacity are dropped a quarter-capacity at a time, so
+    trimming costs O(1) per decision on average.
+    """
+
+    def __init__(self, capacity: Optional[int] = 1000000):
+        self.capacity = capacity
+        self._limit = capacity + max(capacity // 4, 1) if capacity is not None else None
+        self.clear()
+
+    def clear(self) -> None:
+        self.kind = array('B')
+        self.asn = array('q')
+        self.subject: List[Optional[str]] = []
+        self.set_name: List[Optional[str]] = []
+        self.code = array('B')
+        self.severity = array('B')
+        self.direct_only = array('B')
+        # Absolute row -> dict for ENTRY rows
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        # Rows trimmed so far (absolute row of self.kind[0])
+        self._dropped = 0
+
+    def _columns(self) -> tuple:
+        return (self.kind, self.asn, self.subject, self.set_name,
+                self.code, self.severity, self.direct_only)
+
+    def _add(self, record: Record) -> None:
+        kind, subject, set_name, code, severity, direct_only = record
+        if kind == MEMBER:
+            self.asn.append(subject)
+            subject = None
+        else:
+            self.asn.append(0)
+            if kind == ENTRY:
+                self.entries[self._dropped + len(self.kind)] = subject
+                subject = None
+        self.kind.append(kind)
+        self.subject.append(subject)
+        self.set_name.append(set_name)
+        self.code.append(code)
+        self.severity.append(severity)
+        self.direct_only.append(direct_only)
+        if self._limit is not None and len(self.kind) > self._limit:
+            self._trim()
+
+    def _trim(self) -> None:
+        drop = len(self.kind) - self.capacity
+        for column in self._columns():
+            del column[:drop]
+        self._dropped += drop
+        if self.entries:
+            self.entries = {row: entry for row, entry in self.entries.items()
+                            if row >= self._dropped}
+
+    def _first(self) -> int:
+        """Index of the oldest row within the capacity."""
+        if self.capacity is None:
+            return 0
+        return max(len(self.kind) - self.capacity, 0)
+
+    def records(self) -> Iterator[Record]:
+        first = self._first()
+        columns = zip(*(column[first:] for column in self._columns()))
+        row = self._dropped + first
+        for kind, asn, subject, set_name, code, severity, direct_only in columns:
+            if kind == MEMBER:
+                subject = asn
+            elif kind == ENTRY:
+                subject = self.entries[row]
+            yield kind, subject, set_name, code, severity, bool(direct_only)
+            row += 1
+
+    def __len__(self) -> int:
+        return len(self.kind) - self._first()
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns (name columns count one reference per row)."""
+        return sum(column.itemsize * len(column) if isinstance(column, array)
+                   else 8 * len(column) for column in self._columns())
+
+
+LOG_MODES = ("off", "ring", "columnar")
+
+
+def make_log(mode: Union[str, DecisionLog, None] = "ring") -> DecisionLog:
+    """A sink for a mode name ("off", "ring", "columnar") or an existing sink."""
+    if isinstance(mode, DecisionLog):
+        return mode
+    if mode is None or mode == "off":
+        return NullLog()
+    if mode == "ring":
+        return RingLog()
+    if mode == "columnar":
+        return ColumnarLog()
+    raise ValueError(f"Unknown log mode {mode!r}; expected one of {LOG_MODES}")
+
+
+if __name__ == "__main__":
+    import decision_log
+    from rasa_validator import PropagationScope, RASAValidator, create_rasa_auth
+
+    print("Bounded RASA Decision Logs")
+    print("=" * 70)
+
+    n_checks = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    target = "AS2914:AS-GLOBAL"
+    rasa_db = {
+        f"AS{asn}": create_rasa_auth(
+            asn=asn, strict_mode=asn % 5 == 0,
+            authorized_in=[(target, PropagationScope.UNRESTRICTED)] if asn % 2 else [])
+        for asn in range(1, 10001)
+    }
+    print(f"{n_checks} member checks against {len(rasa_db)} RASA-AUTH objects\n")
+
+    def run(validator: RASAValidator, legacy: Optional[list] = None) -> None:
+        for i in range(n_checks):
+            asn = i % 20000
+            authorized, reason = validator.check_member_auth(asn, target)
+            if legacy is not None:
+                # What check_member_auth appended before the sinks
+                entry = {"asn": asn, "asset": target, "authorized": authorized,
+                         "reason": reason}
+                if not authorized:
+                    entry["severity"] = "security_event" if "strictMode" in reason else "warning"
+                legacy.append(entry)
+
+    # The validator's sinks are decision_log's classes, not this script's
+    modes = ("list", "off", "ring", "columnar", decision_log.ColumnarLog(capacity=n_checks // 10))
+    for mode in modes:
+        validator = RASAValidator(rasa_db, log="off" if mode == "list" else mode)
+        legacy = [] if mode == "list" else None
+        tracemalloc.start()
+        start = time.perf_counter()
+        run(validator, legacy)
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        label = "list of dicts" if legacy is not None else type(validator.log).__name__
+        if getattr(validator.log, "capacity", None) is not None:
+            label += f"({validator.log.capacity})"
+        kept = len(legacy) if legacy is not None else len(validator.log)
+        print(f"  {label:20s} {elapsed:6.2f}s  {size / 1024 / 1024:7.1f} MB  {kept} entries kept")
+        del legacy
+
+    validator = RASAValidator(rasa_db, log="columnar")
+    for asn in (1, 2, 10, 20001):
+        validator.check_member_auth(asn, target)
+    print("\nRendered on query:")
+    for entry in validator.log:
+        print(f"  {entry}")
+    print(f"security events: {list(validator.log.query(Severity.SECURITY_EVENT))}")
+    print(f"counts: {validator.log.counts()}")
+
+    validator.expand_with_rasa(target, [1, 3], ["AS-CUSTOMERS"])
+    print("\nExpansion actions:")
+    for entry in list(validator.log)[-4:]:
+        print(f"  {entry}")
+
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Indexed Delegation Token Validation
+
+validate_delegation() used to build a "containingAS:signer" key per call,
+take datetime.utcnow().isoformat() every time and compare the token's
+notBefore/notAfter to it as strings. String order only matches time order
+while every timestamp has the same format: "2025-06-01T00:00:00Z",
+"2025-06-01T02:00:00+02:00" and a naive isoformat() do not compare
+correctly.
+
+DelegationIndex parses every token once:
+
+    (containing AS, delegate) -> DelegationGrant(scope set IDs, not_before, not_after)
+
+with validity as epoch seconds (naive timestamps are UTC, as written by
+utcnow(); a missing bound is open) and scope names interned in the shared
+NameTable. A token whose notBefore/notAfter cannot be parsed gets an empty
+window, so it never validates, and one without an issuer or delegate is
+skipped; both are listed in `errors` instead of failing the whole load.
+check() is then a dict lookup and two float comparisons, and check_many()
+validates a whole repository's (object, signer) pairs against one clock
+reading.
+"""
+
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from asset_names import NAMES, NameTable
+
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """Epoch seconds for an ISO 8601 timestamp; naive means UTC. Raises ValueError."""
+    if not value:
+        return default
+    if not isinstance(value, str):
+        raise ValueError(f"Not an ISO 8601 timestamp: {value!r}")
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class DelegationGrant(NamedTuple):
+    """One parsed delegation token."""
+    containing_as: int
+    delegate: str
+    scope: frozenset        # AS-SET IDs
+    not_before: float
+    not_after: float
+
+    def valid_at(self, when: float) -> bool:
+        return self.not_before <= when <= self.not_after
+
+
+# Validity of a token whose notBefore/notAfter could not be parsed
+INVALID_WINDOW = (float("inf"), float("-inf"))
+
+
+class DelegationIndex:
+    """Delegation tokens by (containing AS, delegate), parsed once."""
+
+    def __init__(self, table: NameTable = NAMES):
+        self.table = table
+        self.grants: Dict[Tuple[int, str], DelegationGrant] = {}
+        self.by_delegate: Dict[str, List[DelegationGrant]] = {}
+        # (delegation_db key, problem) for tokens that were skipped or invalidated
+        self.errors: List[Tuple[str, str]] = []
+        # delegation_db key -> the grant it produced
+        self._keys: Dict[str, Tuple[int, str]] = {}
+
+    @classmethod
+    def from_delegation_db(cls, delegation_db: Dict[str, Any],
+                           table: NameTable = NAMES) -> "DelegationIndex":
+        index = cls(table)
+        for key, token in delegation_db.items():
+            index.add(key, token)
+        return index
+
+    def add(self, key: str, token: Any) -> None:
+        """Index a delegation_db entry keyed "containingAS:delegate"."""
+        if not token:
+            return
+        containing, _, delegate = key.partition(":")
+        if containing.isdigit() and delegate:
+            containing_as = int(containing)
+        else:
+            containing_as, delegate = _token_field(token, "issuedBy"), _token_field(token, "delegatedTo")
+        if not isinstance(containing_as, int) or not isinstance(delegate, str) or not delegate:
+            self.errors.append((key, "missing issuedBy or delegatedTo"))
+            return
+        names = _token_field(token, "scope") or ()
+        scope = frozenset(name if isinstance(name, int) else self.table.id(name)
+                          for name in names if name)
+        try:
+            window = (parse_time(_token_field(token, "notBefore"), float("-inf")),
+                      parse_time(_token_field(token, "notAfter"), float("inf")))
+        except ValueError as e:
+            self.errors.append((key, f"invalid validity period: {e}"))
+            window = INVALID_WINDOW
+        grant = DelegationGrant(containing_as, sys.intern(delegate), scope, *window)
+        if (containing_as, delegate) not in self.grants:
+            self.grants[(containing_as, delegate)] = grant
+            self.by_delegate.setdefault(delegate, []).append(grant)
+            self._keys[key] = (containing_as, delegate)
+
+    def updated(self, changes: Dict[str, Any]) -> "DelegationIndex":
+        """
+        A new index with changes applied (delegation_db key -> token, or
+        None to remove it); unchanged grants are shared. Keys are assumed
+        to name distinct grants, as "containingAS:delegate" keys do.
+        """
+        index = DelegationIndex(self.table)
+        index.grants.update(self.grants)
+        # add() appends to these lists, so they are copied
+        index.by_delegate.update((delegate, list(grants))
+                                 for delegate, grants in self.by_delegate.items())
+        index._keys.update(self._keys)
+        index.errors = [(key, problem) for key, problem in self.errors if key not in changes]
+        for key, token in changes.items():
+            grant = index.grants.pop(index._keys.pop(key, None), None)
+            if grant is not None:
+                remaining = [g for g in index.by_delegate[grant.delegate] if g is not grant]
+                if remaining:
+                    index.by_delegate[grant.delegate] = remaining
+                else:
+                    del index.by_delegate[grant.delegate]
+            index.add(key, token)
+        return index
+
+    def grant(self, containing_as: int, delegate: str) -> Optional[DelegationGrant]:
+        return self.grants.get((containing_as, delegate))
+
+    def check(self, containing_as: int, signer_id: str,
+              when: Optional[float] = None) -> Tuple[bool, str]:
+        """May signer_id publish for containing_as at `when` (default now)?"""
+        if signer_id == f"AS{containing_as}":
+            return True, "Directly published by AS-SET owner"
+        grant = self.grants.get((containing_as, signer_id))
+        if grant is None:
+            return False, f"No delegation token found for {signer_id} to publish for AS{containing_as}"
+        if not grant.valid_at(time.time() if when is None else when):
+            if (grant.not_before, grant.not_after) == INVALID_WINDOW:
+                return False, "Delegation token has an invalid validity period"
+            return False, "Delegation token expired"
+        return True, f"Valid delegation from AS{containing_as} to {signer_id}"
+
+    def check_many(self, pairs: Iterable[Tuple[Optional[int], str]],
+                   when: Optional[float] = None) -> List[Tuple[bool, str]]:
+        """check() for many (containing AS, signer) pairs at one instant."""
+        when = time.time() if when is None else when
+        unknown = (False, "Unknown RASA object type")
+        return [self.check(containing_as, signer_id, when) if containing_as is not None else unknown
+                for containing_as, signer_id in pairs]
+
+    def in_scope(self, containing_as: int, delegate: str, asset_name: str) -> bool:
+        """Whether the delegate's token covers asset_name."""
+        grant = self.grants.get((containing_as, delegate))
+        set_id = self.table.get_id(asset_name)
+        return grant is not None and set_id is not None and set_id in grant.scope
+
+    def __len__(self) -> int:
+        return len(self.grants)
+
+
+# CompactDelegationToken spells the DelegationToken fields in snake_case
+_COMPACT_FIELDS = {"issuedBy": "issued_by", "delegatedTo": "delegated_to",
+                   "notBefore": "not_before", "notAfter": "not_after"}
+
+
+def _token_field(token: Any, field: str) -> Any:
+    if isinstance(token, dict):
+        return token.get(field)
+    if hasattr(token, field):
+        return getattr(token, field)
+    return getattr(token, _COMPACT_FIELDS.get(field, field), None)
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    from rasa_validator import DelegationToken, RASAValidator, create_rasa_set
+
+    print("Indexed Delegation Token Validation")
+    print("=" * 70)
+
+    now = datetime.utcnow()
+    token = DelegationToken("AS-SET-MGMT", ["AS2914:AS-GLOBAL"],
+                            notBefore=(now - timedelta(hours=1)).isoformat() + "Z",
+                            notAfter=(now + timedelta(hours=1)).astimezone(
+                                timezone(timedelta(hours=-5))).isoformat(),
+                            issuedBy=2914)
+    print(f"token valid {token.notBefore} .. {token.notAfter}")
+    as_strings = not (now.isoformat() < token.notBefore or now.isoformat() > token.notAfter)
+    grant = DelegationIndex.from_delegation_db({"2914:AS-SET-MGMT": token}).grant(2914, "AS-SET-MGMT")
+    print(f"  string comparison says valid: {as_strings}")
+    print(f"  parsed interval says valid:   {grant.valid_at(time.time())}")
+
+    broken = DelegationIndex.from_delegation_db({
+        "2914:AS-SET-MGMT": DelegationToken("AS-SET-MGMT", ["AS2914:AS-GLOBAL"],
+                                            notBefore="yesterday", notAfter="", issuedBy=2914),
+        "3356-tooling": {"issuedBy": 3356, "scope": ["AS3356:AS-CUSTOMERS"]},
+    })
+    print(f"  malformed tokens: {broken.errors}")
+    print(f"  {broken.check(2914, 'AS-SET-MGMT')}")
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    delegation_db = {
+        f"{asn}:AS-SET-MGMT{asn % 10}": DelegationToken(
+            f"AS-SET-MGMT{asn % 10}", [f"AS{asn}:AS-CUSTOMERS"],
+            notBefore=(now - timedelta(days=1)).isoformat(),
+            notAfter=(now + timedelta(days=asn % 3 - 1)).isoformat(), issuedBy=asn)
+        for asn in range(1, n + 1)
+    }
+    # Most objects are signed by their delegate, some by another service
+    objects = [(create_rasa_set(f"AS{asn}:AS-CUSTOMERS", asn, []),
+                f"AS-SET-MGMT{asn % 10 if asn % 4 else asn % 7}")
+               for asn in range(1, n + 1)]
+
+    def string_check(obj: Any, signer_id: str) -> Tuple[bool, str]:
+        # What validate_delegation did before the index
+        key = f"{obj.containingAS}:{signer_id}"
+        tok = delegation_db.get(key)
+        if not tok:
+            return False, f"No delegation token found for {signer_id} to publish for AS{obj.containingAS}"
+        now_str = datetime.utcnow().isoformat()
+        if now_str < tok.notBefore or now_str > tok.notAfter:
+            return False, "Delegation token expired"
+        return True, f"Valid delegation from AS{obj.containingAS} to {signer_id}"
+
+    validator = RASAValidator({}, delegation_db, log="off")
+    start = time.perf_counter()
+    strings = [string_check(obj, signer) for obj, signer in objects]
+    string_time = time.perf_counter() - start
+    start = time.perf_counter()
+    single = [validator.validate_delegation(obj, signer) for obj, signer in objects]
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = validator.validate_delegations(objects)
+    batch_time = time.perf_counter() - start
+    assert batch == single == strings
+    valid = sum(ok for ok, _ in batch)
+    print(f"\n{n} objects, {len(delegation_db)} tokens: {valid} valid")
+    print(f"  ISO string comparison:          {string_time * 1000:7.1f} ms")
+    print(f"  validate_delegation per object: {single_time * 1000:7.1f} ms")
+    print(f"  validate_delegations batch:     {batch_time * 1000:7.1f} ms")
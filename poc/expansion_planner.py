@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Cost-Based AS-SET Expansion Planner
+
+Picks the cheapest correct way to expand each root AS-SET:
+
+- local_closure:    closure from the in-memory ASSetGraph snapshot; only
+                    when every reachable object in the snapshot is fresh.
+- client_bfs:       level-by-level fetches with the batch expander, using
+                    the WHOIS cache where it is fresh.
+- server_recursion: one IRRd !i query (fetch_asset_recursive).
+- bgpq4:            one uncached bgpq4 run (rasa_pipeline.bgpq4_expand);
+                    IRRPipeline's file cache never expires, so it would
+                    bypass the freshness the plan was costed on.
+
+server_recursion and bgpq4 expand without a depth limit, so they are only
+correct when the snapshot shows every reachable AS-SET within max_depth
+(and nothing reachable is missing from the snapshot). An executor returns
+None when its query fails; the plan then falls back to client_bfs rather
+than reporting an empty closure.
+
+Costs are estimated from the last known snapshot: objects and depth from
+the graph, closure size from the cardinality sketches (or the memoized
+closure), and cache freshness per object. Each execution records the
+predicted against the actual cost, and a per-strategy correction factor
+learned from those records scales later predictions.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from asn_set import ASNSet
+from asset_graph import ASSetGraph
+from asset_names import canonical_asset_name
+from batch_expander import expand_assets_batch
+from irr_cache import is_fresh
+from irr_fetcher import ASSET, fetch_asset, fetch_asset_recursive
+
+
+STRATEGIES = ("local_closure", "client_bfs", "server_recursion", "bgpq4")
+
+
+@dataclass
+class CostModel:
+    """Unit costs in seconds."""
+    rtt_seconds: float = 0.15           # one WHOIS round trip
+    cache_hit_seconds: float = 0.001    # one cached object read
+    object_cpu_seconds: float = 20e-6   # parse/merge one object in Python
+    asn_cpu_seconds: float = 0.2e-6     # merge one ASN into a closure
+    asn_transfer_seconds: float = 2e-6  # receive one ASN from a server
+    process_seconds: float = 0.3        # start a bgpq4 process
+    bgpq4_pipelining: int = 10          # bgpq4 queries in flight
+    workers: int = 1                    # client_bfs fetch threads
+
+
+@dataclass
+class RootProfile:
+    """What the snapshot knows about a root AS-SET."""
+    root: str
+    objects: int = 0
+    missing: int = 0
+    stale: int = 0
+    depth: Optional[int] = None
+    estimated_size: int = 0
+    memoized: bool = False
+
+    def complete_within(self, max_depth: int) -> bool:
+        """
+        Whether an unbounded expansion equals one limited to max_depth.
+
+        Only provable from a complete and fresh snapshot: a stale object
+        may since nest deeper than the snapshot shows.
+        """
+        return (self.depth is not None and not self.missing and not self.stale
+                and self.depth < max_depth)
+
+
+@dataclass
+class Plan:
+    root: str
+    max_depth: int
+    strategy: str
+    predicted_seconds: float
+    costs: Dict[str, float] = field(default_factory=dict)
+    profile: Optional[RootProfile] = None
+
+
+@dataclass
+class PlanRecord:
+    """One executed plan with its predicted and actual cost."""
+    root: str
+    strategy: str
+    predicted_seconds: float
+    actual_seconds: float
+    result_size: int
+
+    @property
+    def ratio(self) -> float:
+        return self.actual_seconds / self.predicted_seconds if self.predicted_seconds else 0.0
+
+
+class ExpansionPlanner:
+    """Chooses and runs the cheapest correct expansion strategy per root."""
+
+    def __init__(self, graph: ASSetGraph, sketches=None,
+                 cost_model: Optional[CostModel] = None,
+                 server_recursion: bool = False, bgpq4: bool = False,
+                 fresh: Callable[[str], bool] = is_fresh,
+                 fetch: Callable[[str], Optional[ASSET]] = fetch_asset,
+                 executors: Optional[Dict[str, Callable[[str, int], Optional[Set[int]]]]] = None):
+        """
+        Args:
+            graph: last known snapshot of the registry
+            sketches: optional SketchIndex for closure size estimates
+            server_recursion: whether the IRR server supports !i
+            bgpq4: whether bgpq4 is installed
+            fresh: whether an AS-SET's cached object is within TTL
+            executors: strategy -> callable(root, max_depth), overriding the
+                       built-in ones (e.g. for other servers or tests);
+                       returning None marks a failed query
+        """
+        self.graph = graph
+        self.sketches = sketches
+        self.cost_model = cost_model or CostModel()
+        self.available = {"local_closure", "client_bfs"}
+        if server_recursion:
+            self.available.add("server_recursion")
+        if bgpq4:
+            self.available.add("bgpq4")
+        self.fresh = fresh
+        self.fetch = fetch
+        self.executors = {
+            "local_closure": lambda root, depth: self.graph.closure(root, depth),
+            "client_bfs": self._client_bfs,
+            "server_recursion": lambda root, depth: fetch_asset_recursive(root),
+            "bgpq4": self._bgpq4,
+        }
+        self.executors.update(executors or {})
+        self.correction: Dict[str, float] = {strategy: 1.0 for strategy in STRATEGIES}
+        self.history: List[PlanRecord] = []
+
+    # -- estimation -----------------------------------------------------------
+
+    def profile(self, root: str, max_depth: int) -> RootProfile:
+        """Walk the snapshot from root (unbounded) and summarize it."""
+        graph = self.graph
+        root = graph.name_table.lookup(root) or canonical_asset_name(root)
+        profile = RootProfile(root)
+        if root not in graph:
+            profile.missing = 1
+            return profile
+
+        depths = {root: 0}
+        frontier = deque([root])
+        direct_asns = 0
+        while frontier:
+            name = frontier.popleft()
+            level = depths[name]
+            if name not in graph:
+                profile.missing += 1
+                continue
+            profile.objects += 1
+            profile.depth = max(profile.depth or 0, level)
+            if not self.fresh(name):
+                profile.stale += 1
+            direct_asns += len(graph.asns[name])
+            for child in graph.children[name]:
+                if child not in depths:
+                    depths[child] = level + 1
+                    frontier.append(child)
+
+        cached = graph.cached_closure(root, max_depth)
+        profile.memoized = cached is not None
+        estimate = self.sketches.estimate(root) if self.sketches is not None else None
+        if cached is not None:
+            profile.estimated_size = len(cached)
+        elif estimate is not None:
+            profile.estimated_size = estimate
+        else:
+            profile.estimated_size = direct_asns
+        return profile
+
+    def costs(self, profile: RootProfile, max_depth: int) -> Dict[str, float]:
+        """Predicted seconds for every available strategy that is correct here."""
+        model = self.cost_model
+        objects = max(profile.objects + profile.missing, 1)
+        size = profile.estimated_size
+        merge = objects * model.object_cpu_seconds + size * model.asn_cpu_seconds
+        costs = {}
+
+        if profile.objects and not profile.stale and not profile.missing:
+            costs["local_closure"] = 0.0 if profile.memoized else merge
+
+        fetched = profile.stale + profile.missing if profile.objects else objects
+        cached = objects - fetched
+        costs["client_bfs"] = (fetched * model.rtt_seconds / max(model.workers, 1)
+                               + cached * model.cache_hit_seconds + merge)
+
+        if profile.complete_within(max_depth):
+            costs["server_recursion"] = model.rtt_seconds + size * model.asn_transfer_seconds
+            costs["bgpq4"] = (model.process_seconds
+                              + objects * model.rtt_seconds / model.bgpq4_pipelining
+                              + size * model.asn_transfer_seconds)
+
+        return {strategy: cost * self.correction[strategy]
+                for strategy, cost in costs.items() if strategy in self.available}
+
+    def plan(self, root: str, max_depth: int = 5) -> Plan:
+        profile = self.profile(root, max_depth)
+        costs = self.costs(profile, max_depth)
+        strategy = min(costs, key=costs.get)
+        return Plan(profile.root, max_depth, strategy, costs[strategy], costs, profile)
+
+    # -- execution ------------------------------------------------------------
+
+    def execute(self, plan: Plan) -> ASNSet:
+        """
+        Run a plan, record its actual cost and update the correction factor.
+
+        A failed query (executor returned None) is not an empty closure: the
+        root is expanded again with client_bfs, which is always correct.
+        """
+        start = time.perf_counter()
+        asns = self.executors[plan.strategy](plan.root, plan.max_depth)
+        elapsed = time.perf_counter() - start
+        if asns is None:
+            if plan.strategy == "client_bfs":
+                raise LookupError(f"client_bfs failed to expand {plan.root}")
+            fallback = Plan(plan.root, plan.max_depth, "client_bfs",
+                            plan.costs["client_bfs"], plan.costs, plan.profile)
+            return self.execute(fallback)
+        result = asns if isinstance(asns, ASNSet) else ASNSet(asns)
+
+        record = PlanRecord(plan.root, plan.strategy, plan.predicted_seconds,
+                            elapsed, len(result))
+        self.history.append(record)
+        if plan.predicted_seconds > 0:
+            # Exponential moving average of actual/uncorrected prediction
+            uncorrected = plan.predicted_seconds / self.correction[plan.strategy]
+            observed = elapsed / uncorrected
+            self.correction[plan.strategy] = 0.7 * self.correction[plan.strategy] + 0.3 * observed
+        return result
+
+    def expand(self, root: str, max_depth: int = 5) -> ASNSet:
+        """Plan and execute the cheapest correct expansion of root."""
+        return self.execute(self.plan(root, max_depth))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per strategy: runs, mean predicted/actual seconds and correction."""
+        summary = {}
+        for strategy in STRATEGIES:
+            records = [r for r in self.history if r.strategy == strategy]
+            if records:
+                summary[strategy] = {
+                    "runs": len(records),
+                    "predicted_seconds": sum(r.predicted_seconds for r in records) / len(records),
+                    "actual_seconds": sum(r.actual_seconds for r in records) / len(records),
+                    "correction": round(self.correction[strategy], 3),
+                }
+        return summary
+
+    def _client_bfs(self, root: str, max_depth: int) -> ASNSet:
+        batch = expand_assets_batch([root], max_depth, fetch=self.fetch,
+                                    workers=self.cost_model.workers)
+        return batch.results[root][0]
+
+    def _bgpq4(self, root: str, max_depth: int) -> Optional[Set[int]]:
+        from rasa_pipeline import bgpq4_expand
+        return bgpq4_expand(root)
+
+
+if __name__ == "__main__":
+    from cardinality_sketch import SketchIndex
+    from synthetic_registry import registry_fetcher, synthetic_registry
+
+    print("Cost-Based AS-SET Expansion Planner")
+    print("=" * 70)
+
+    # Simulated IRR: 2 ms per fetched object, cache freshness toggled per run
+    registry = synthetic_registry(3000)
+    lookup = registry_fetcher(registry)
+
+    def slow_fetch(name: str) -> Optional[ASSET]:
+        time.sleep(0.002)
+        return lookup(name)
+
+    def server_recursion(root: str, max_depth: int) -> Set[int]:
+        time.sleep(0.002)
+        return graph.closure(root, max_depth=len(graph))
+
+    graph = ASSetGraph.from_objects(registry.values())
+    model = CostModel(rtt_seconds=0.002)
+    roots = ["AS-SYN371", "AS-SYN119", "AS-SYN525", "AS-SYN2900"]
+
+    for label, fresh in (("cold cache", lambda name: False), ("fresh snapshot", lambda name: True)):
+        planner = ExpansionPlanner(graph, SketchIndex(graph), model, server_recursion=True,
+                                   fresh=fresh, fetch=slow_fetch,
+                                   executors={"server_recursion": server_recursion})
+        print(f"\n{label}:")
+        for root in roots:
+            plan = planner.plan(root, max_depth=5)
+            planner.execute(plan)
+            record = planner.history[-1]
+            options = ", ".join(f"{s}={c * 1000:.1f}ms" for s, c in sorted(plan.costs.items()))
+            print(f"  {root:11s} depth={plan.profile.depth} objects={plan.profile.objects:4d} "
+                  f"-> {plan.strategy:16s} predicted {record.predicted_seconds * 1000:6.1f}ms "
+                  f"actual {record.actual_seconds * 1000:6.1f}ms")
+            print(f"  {'':11s} options: {options}")
+
+    print("\nPredicted vs actual by strategy:")
+    for strategy, row in planner.summary().items():
+        print(f"  {strategy:16s} runs={row['runs']} predicted={row['predicted_seconds'] * 1000:.2f}ms "
+              f"actual={row['actual_seconds'] * 1000:.2f}ms correction={row['correction']}")
+
+    # A failed !i query falls back to client_bfs instead of an empty closure
+    planner = ExpansionPlanner(graph, SketchIndex(graph), model, server_recursion=True,
+                               fresh=lambda name: True, fetch=lookup,
+                               executors={"server_recursion": lambda root, depth: None})
+    plan = next(candidate for candidate in (planner.plan(root, max_depth=5) for root in roots)
+                if "server_recursion" in candidate.costs)
+    plan = Plan(plan.root, plan.max_depth, "server_recursion",
+                plan.costs["server_recursion"], plan.costs, plan.profile)
+    asns = planner.execute(plan)
+    assert planner.history[-1].strategy == "client_bfs"
+    assert set(asns) == set(graph.closure(plan.root, 5)), "fallback must match the closure"
+    print(f"\n{plan.root}: failed {plan.strategy} -> client_bfs fallback, {len(asns)} ASNs")
@@ -9,6 +9,7 @@ Result: NTT rejects Google routes from peers unless direct
 import json
 import os
 from typing import Set
+from asn_set import sorted_asns
 from irr_fetcher import expand_asset
 
 
@@ -20,7 +21,7 @@ def generate_peerlock_config(peer_asn: int, blocked_asns: Set[int], description:
         f"as-path-group AS{peer_asn}-peerlock {{",
     ]
     
-    for asn in sorted(blocked_asns):
+    for asn in sorted_asns(blocked_asns):
         lines.append(f'    as-path block-{asn} ".* {asn} .*";')
     
     lines.extend([
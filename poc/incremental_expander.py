@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Incremental AS-SET Re-expansion
+
+Keeps the closures of a set of root AS-SETs current as IRR objects change.
+
+Given the objects that changed (from a cache refresh, a serial change or
+a journal), the expander updates the graph, follows reverse dependency
+edges from each changed object to the roots that include it, and
+recomputes only those roots. Untouched sub-closures stay memoized in the
+graph, so a refresh cycle costs in proportion to the change rather than
+the registry size.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from asn_set import ASNSet
+from asset_graph import ASSetGraph
+from asset_names import canonical_asset_name
+from irr_fetcher import ASSET, fetch_asset, split_members
+
+
+@dataclass
+class ClosureDelta:
+    """ASN changes of one root's closure."""
+    root: str
+    added: ASNSet
+    removed: ASNSet
+
+
+@dataclass
+class RefreshStats:
+    """Work done by one incremental refresh."""
+    objects_changed: int = 0
+    roots_total: int = 0
+    roots_recomputed: int = 0
+    roots_changed: int = 0
+    elapsed_seconds: float = 0.0
+
+
+@dataclass
+class RefreshResult:
+    deltas: Dict[str, ClosureDelta] = field(default_factory=dict)
+    stats: RefreshStats = field(default_factory=RefreshStats)
+
+
+class IncrementalExpander:
+    """Maintains root closures over an ASSetGraph under object changes."""
+
+    def __init__(self, graph: ASSetGraph, roots: Iterable[str], max_depth: int = 5):
+        self.graph = graph
+        self.max_depth = max_depth
+        self.closures: Dict[str, ASNSet] = {}
+        for root in roots:
+            self.add_root(root)
+
+    def _key(self, name: str) -> str:
+        """Canonical spelling of name, without registering it."""
+        return self.graph.name_table.lookup(name) or canonical_asset_name(name)
+
+    def add_root(self, root: str) -> ASNSet:
+        root = self._key(root)
+        closure = self.graph.closure(root, self.max_depth)
+        self.closures[root] = closure
+        return closure
+
+    def remove_root(self, root: str) -> None:
+        self.closures.pop(self._key(root), None)
+
+    def affected_roots(self, changed: Iterable[str]) -> List[str]:
+        """Roots whose closure may depend on any of the changed AS-SETs."""
+        affected = set()
+        for name in changed:
+            name = self._key(name)
+            if name in self.closures:
+                affected.add(name)
+            affected.update(
+                root for root in self.graph.ancestors(name, self.max_depth)
+                if root in self.closures
+            )
+        return sorted(affected)
+
+    def apply_changes(self, changed: Mapping[str, Optional[ASSET]]) -> RefreshResult:
+        """
+        Apply changed objects and re-expand only the affected roots.
+
+        Args:
+            changed: AS-SET name -> new object, or None if it was deleted
+
+        Returns:
+            RefreshResult with a ClosureDelta per root whose closure changed
+        """
+        start = time.monotonic()
+        result = RefreshResult()
+        result.stats.objects_changed = len(changed)
+        result.stats.roots_total = len(self.closures)
+
+        # Reverse edges are read before the update so removed links still
+        # lead to the roots that lose members.
+        affected = set(self.affected_roots(changed))
+        for name, asset in changed.items():
+            if asset is None:
+                self.graph.remove_object(name)
+            else:
+                self.graph.add_object(asset)
+        affected.update(self.affected_roots(changed))
+
+        for root in sorted(affected):
+            old = self.closures[root]
+            new = self.graph.closure(root, self.max_depth)
+            self.closures[root] = new
+            result.stats.roots_recomputed += 1
+            if new != old:
+                result.deltas[root] = ClosureDelta(root, new - old, old - new)
+
+        result.stats.roots_changed = len(result.deltas)
+        result.stats.elapsed_seconds = time.monotonic() - start
+        return result
+
+    def refresh(self, names: Iterable[str],
+                fetch: Callable[[str], Optional[ASSET]] = fetch_asset) -> RefreshResult:
+        """Re-fetch the named AS-SETs and apply whatever changed."""
+        changed = {}
+        for name in names:
+            asset = fetch(name)
+            if asset is None:
+                if name in self.graph:
+                    changed[name] = None
+                continue
+            if not self._unchanged(asset):
+                changed[name] = asset
+        return self.apply_changes(changed)
+
+    def _unchanged(self, asset: ASSET) -> bool:
+        name = self.graph.name_table.lookup(asset.name)
+        if name not in self.graph.asns:
+            return False
+        asns, nested = split_members(asset)
+        return (set(asns) == self.graph.asns[name]
+                and set(nested) == self.graph.children[name])
+
+
+if __name__ == "__main__":
+    import random
+
+    print("Incremental AS-SET Re-expansion")
+    print("=" * 70)
+
+    # Synthetic registry: 2000 customer sets nested under 200 peer roots
+    random.seed(7)
+    registry = {}
+    for i in range(2000):
+        name = f"AS-CUST{i}"
+        registry[name] = ASSET(name, [f"AS{64512 + i}", f"AS{100000 + i}"], "TEST")
+    customers = sorted(registry)
+    for p in range(200):
+        name = f"AS-PEER{p}"
+        nested = random.sample(customers, 40) if p else ["AS-CUST0"]
+        registry[name] = ASSET(name, nested, "TEST")
+
+    graph = ASSetGraph.from_objects(registry.values())
+    roots = [f"AS-PEER{p}" for p in range(200)]
+
+    start = time.monotonic()
+    expander = IncrementalExpander(graph, roots)
+    print(f"Initial expansion of {len(roots)} roots: {time.monotonic() - start:.3f}s")
+
+    changed = {"AS-CUST0": ASSET("AS-CUST0", ["AS64512", "AS65000"], "TEST")}
+    result = expander.apply_changes(changed)
+
+    print(f"\nChanged objects:   {result.stats.objects_changed}")
+    print(f"Roots recomputed:  {result.stats.roots_recomputed} of {result.stats.roots_total}")
+    print(f"Roots changed:     {result.stats.roots_changed}")
+    print(f"Refresh time:      {result.stats.elapsed_seconds:.4f}s")
+    for root, delta in list(result.deltas.items())[:5]:
+        print(f"  {root}: +{list(delta.added)} -{list(delta.removed)}")
+
+    # IRR objects and references come in any case; the graph keys canonically
+    mixed = {"As-Mixed-Root": ASSET("As-Mixed-Root", ["AS1", "as-mixed-child"], "TEST"),
+             "AS-Mixed-Child": ASSET("AS-Mixed-Child", ["AS2"], "TEST")}
+    mixed_expander = IncrementalExpander(ASSetGraph.from_objects(mixed.values()), ["as-mixed-root"])
+    assert list(mixed_expander.closures["AS-MIXED-ROOT"]) == [1, 2]
+    mixed["AS-Mixed-Child"] = ASSET("AS-Mixed-Child", ["AS2", "AS3"], "TEST")
+    delta = mixed_expander.refresh(mixed, fetch=mixed.get).deltas["AS-MIXED-ROOT"]
+    assert list(delta.added) == [3] and not delta.removed
+    assert not mixed_expander.refresh(mixed, fetch=mixed.get).deltas
+    print(f"\nMixed-case refresh: AS-MIXED-ROOT +{list(delta.added)}")
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+from asset_names import canonical_asset_name
+
 
 # Use absolute path based on this file's location
 CACHE_DIR = Path(__file__).parent / "cache" / "irr"
@@ -15,8 +17,8 @@ CACHE_TTL_HOURS = 24
 
 
 def get_cache_key(asset_name: str, server: str) -> str:
-    """Generate cache key for asset query."""
-    key = f"{server}:{asset_name}"
+    """Generate cache key for asset query (same key for every spelling of the name)."""
+    key = f"{server}:{canonical_asset_name(asset_name)}"
     return hashlib.md5(key.encode()).hexdigest()
 
 
@@ -48,6 +50,16 @@ def get_cached(asset_name: str, server: str = "whois.radb.net") -> Optional[Dict
         return None
 
 
+def is_fresh(asset_name: str, server: str = "whois.radb.net") -> bool:
+    """Whether a cache entry exists and is within TTL (file mtime, no parse)."""
+    cache_path = get_cache_path(asset_name, server)
+    try:
+        age = datetime.now().timestamp() - cache_path.stat().st_mtime
+    except OSError:
+        return False
+    return age <= CACHE_TTL_HOURS * 3600
+
+
 def set_cached(asset_name: str, server: str, data: Dict[str, Any]) -> None:
     """Cache WHOIS result."""
     cache_path = get_cache_path(asset_name, server)
@@ -1,11 +1,36 @@
 #!/usr/bin/env python3
-"""Common IRR fetcher with caching support."""
+"""
+Common IRR fetcher with caching support.
+
+Depth semantics
+---------------
+expand_asset() has two modes:
+
+- "dfs" (default, original behaviour): a depth-first walk that shares one
+  seen set across the whole walk and decrements max_depth along the path.
+  An AS-SET first reached through a deep path is never re-expanded through
+  a shallower one, so the result can depend on member order.
+- "bfs": shortest-depth semantics. The root is at depth 0 and every other
+  AS-SET is at its shortest nesting distance from the root. An AS-SET is
+  expanded iff its depth is below max_depth. The result is the union of the
+  ASN members of all expanded AS-SETs, and nested_sets holds every AS-SET
+  referenced by an expanded AS-SET. The result is a function of
+  (asset_name, max_depth) and the registry only, independent of member
+  order, so it can be memoized under that key.
+
+The batch expander, iter_expand_asset() and ASSetGraph.closure() all use
+the "bfs" semantics.
+"""
 
 import subprocess
 import re
-from typing import Set, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+import time
+from collections import deque
+from typing import Set, List, Optional, Tuple, Iterator, Callable, Any
+from dataclasses import dataclass, asdict, field
 from irr_cache import get_cached, set_cached
+from asn_set import ASNBitmap
+from asset_names import NAMES, canonical_asset_name
 
 
 @dataclass
@@ -15,12 +40,79 @@ class ASSET:
     source: str
 
 
+@dataclass
+class ExpansionBudget:
+    """
+    Resource limits for one expansion, plus a record of where it was cut.
+
+    Any limit left as None is unlimited. max_asns counts distinct ASNs.
+    A budget object tracks usage, so use a fresh one per expansion.
+    """
+    max_objects: Optional[int] = None
+    max_asns: Optional[int] = None
+    max_seconds: Optional[float] = None
+    objects: int = 0
+    exceeded: Optional[str] = None
+    cut: List[str] = field(default_factory=list)
+    started: Optional[float] = None
+    _asns: ASNBitmap = field(default_factory=ASNBitmap, repr=False)
+
+    @property
+    def truncated(self) -> bool:
+        return self.exceeded is not None
+
+    @property
+    def asns(self) -> int:
+        return len(self._asns)
+
+    def charge_object(self) -> Optional[str]:
+        """Account for one object fetch; return the exhausted budget name, if any."""
+        if self.exceeded:
+            return self.exceeded
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        if self.max_seconds is not None and now - self.started > self.max_seconds:
+            self.exceeded = "max_seconds"
+        elif self.max_objects is not None and self.objects >= self.max_objects:
+            self.exceeded = "max_objects"
+        else:
+            self.objects += 1
+        return self.exceeded
+
+    def charge_asn(self, asn: int) -> Optional[str]:
+        """Account for one ASN; return the exhausted budget name, if any."""
+        if self.exceeded:
+            return self.exceeded
+        if asn in self._asns:
+            return None
+        if self.max_asns is not None and len(self._asns) >= self.max_asns:
+            self.exceeded = "max_asns"
+            return self.exceeded
+        self._asns.add(asn)
+        return None
+
+
+@dataclass
+class ExpansionResult:
+    """Expansion result that says whether, where and why it was truncated."""
+    asns: Set[int]
+    nested_sets: Set[str]
+    log: List[dict]
+    truncated: bool = False
+    budget: Optional[str] = None
+    cut: List[str] = field(default_factory=list)
+
+
 def fetch_asset(asset_name: str, server: str = "whois.radb.net") -> Optional[ASSET]:
     """Fetch AS-SET from IRR with caching."""
+    # Canonical spelling for the cache key, not interned: the name may come
+    # from a request. Names are interned only from fetched members.
+    asset_name = canonical_asset_name(asset_name)
     # Check cache first
     cached = get_cached(asset_name, server)
     if cached:
-        return ASSET(**cached)
+        return ASSET(**{**cached, 'name': asset_name})
     
     try:
         result = subprocess.run(
@@ -64,6 +156,35 @@ def fetch_asset(asset_name: str, server: str = "whois.radb.net") -> Optional[ASS
         return None
 
 
+def fetch_asset_recursive(asset_name: str, server: str = "whois.radb.net") -> Optional[Set[int]]:
+    """
+    Expand an AS-SET server-side with the IRRd !i query.
+
+    One round trip instead of one per nested AS-SET, but the server applies
+    no depth limit. Returns None if the query fails or the set is unknown.
+    """
+    asset_name = canonical_asset_name(asset_name)
+    try:
+        result = subprocess.run(
+            ["whois", "-h", server, f"!i{asset_name},1"],
+            capture_output=True, text=True, timeout=30
+        )
+    except Exception as e:
+        print(f"Error expanding {asset_name} on {server}: {e}")
+        return None
+
+    lines = result.stdout.split('\n')
+    # A<length> precedes the data; D (not found) and F (error) carry none
+    if result.returncode != 0 or not lines[0].startswith('A'):
+        return None
+    asns = set()
+    for line in lines[1:]:
+        if line.startswith('C'):
+            break
+        asns.update(int(member[2:]) for member in line.split() if is_asn(member))
+    return asns
+
+
 def parse_members(member_str: str) -> List[str]:
     """Parse member list from WHOIS format."""
     members = []
@@ -74,19 +195,80 @@ def parse_members(member_str: str) -> List[str]:
     return members
 
 
+_ASN_RE = re.compile(r'^AS\d+$')
+# RFC 2622 as-set names, including hierarchical ones (AS2914:AS-US)
+_ASSET_NAME_RE = re.compile(r'^(AS\d+:)*AS-[A-Z0-9_-]+(:(AS\d+|AS-[A-Z0-9_-]+))*$')
+
+
 def is_asn(member: str) -> bool:
     """Check if member is an ASN (AS12345) not an AS-SET."""
-    return bool(re.match(r'^AS\d+$', member))
+    return _ASN_RE.match(member) is not None
+
+
+def is_asset_name(name: str) -> bool:
+    """Check if a canonical name is a syntactically valid AS-SET name."""
+    return _ASSET_NAME_RE.match(name) is not None
+
+
+def iter_members(asset: ASSET) -> Iterator[Tuple[str, Any]]:
+    """
+    An AS-SET's members in order, as ("asn", 12345) or ("nested_set", name).
+
+    Members are matched case-insensitively; nested names come back
+    canonical and interned in NAMES. Anything that is not an ASN or a
+    valid AS-SET name (e.g. attribute lines that leaked into the member
+    list) is dropped without being interned.
+    """
+    for member in asset.members:
+        if is_asn(member):
+            yield "asn", int(member[2:])
+            continue
+        name = canonical_asset_name(member)
+        if is_asn(name):
+            yield "asn", int(name[2:])
+        elif is_asset_name(name):
+            yield "nested_set", NAMES.canonical(name)
+
+
+def split_members(asset: ASSET) -> Tuple[List[int], List[str]]:
+    """Split an AS-SET's members into (asns, nested_set_names) as iter_members() reads them."""
+    asns = []
+    nested = []
+    for kind, value in iter_members(asset):
+        (asns if kind == "asn" else nested).append(value)
+    return asns, nested
+
+
+EXPANSION_MODES = ("dfs", "bfs")
 
 
 def expand_asset(asset_name: str, max_depth: int = 5, 
-                seen: Set[str] = None) -> Tuple[Set[int], Set[str], List[dict]]:
+                seen: Set[str] = None,
+                budget: Optional[ExpansionBudget] = None,
+                mode: str = "dfs",
+                fetch: Optional[Callable[[str], Optional[ASSET]]] = None
+                ) -> Tuple[Set[int], Set[str], List[dict]]:
     """
     Recursively expand AS-SET to get all ASNs.
     Returns (asns, nested_sets, log).
+
+    mode selects the depth semantics described in the module docstring;
+    use "bfs" when results are cached or compared across runs. fetch
+    replaces fetch_asset(), e.g. to expand from an in-memory registry.
+
+    With a budget, expansion stops once a limit is hit: the AS-SETs that
+    were skipped or only partly expanded are logged as "budget_exceeded"
+    and recorded in budget.cut.
     """
+    if mode == "bfs":
+        return expand_asset_bfs(asset_name, max_depth, budget, fetch)
+    if mode != "dfs":
+        raise ValueError(f"Unknown expansion mode: {mode!r}")
+    
     if seen is None:
         seen = set()
+        # Nested names come back canonical; compare the root the same way
+        asset_name = canonical_asset_name(asset_name)
     
     if asset_name in seen:
         return set(), set(), [{"asset": asset_name, "action": "circular_skip"}]
@@ -96,7 +278,12 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     
     seen.add(asset_name)
     
-    asset = fetch_asset(asset_name)
+    if budget is not None and budget.charge_object():
+        budget.cut.append(asset_name)
+        return set(), set(), [{"asset": asset_name, "action": "budget_exceeded",
+                               "budget": budget.exceeded}]
+    
+    asset = (fetch or fetch_asset)(asset_name)
     if not asset:
         return set(), set(), [{"asset": asset_name, "action": "not_found"}]
     
@@ -104,15 +291,131 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     nested_sets = set()
     log = [{"asset": asset_name, "source": asset.source, "action": "expanded"}]
     
-    for member in asset.members:
-        if is_asn(member):
-            asns.add(int(member[2:]))
-        elif member.startswith('AS'):
+    for kind, member in iter_members(asset):
+        if kind == "asn":
+            asn = member
+            if budget is not None and budget.charge_asn(asn):
+                budget.cut.append(asset_name)
+                log.append({"asset": asset_name, "action": "budget_exceeded",
+                            "budget": budget.exceeded})
+                break
+            asns.add(asn)
+        else:
             nested_sets.add(member)
             # Recursively expand
-            sub_asns, sub_sets, sub_log = expand_asset(member, max_depth - 1, seen)
+            sub_asns, sub_sets, sub_log = expand_asset(member, max_depth - 1, seen, budget,
+                                                       fetch=fetch)
             asns.update(sub_asns)
             nested_sets.update(sub_sets)
             log.extend(sub_log)
     
     return asns, nested_sets, log
+
+
+def expand_asset_bfs(asset_name: str, max_depth: int = 5,
+                     budget: Optional[ExpansionBudget] = None,
+                     fetch: Optional[Callable[[str], Optional[ASSET]]] = None
+                     ) -> Tuple[Set[int], Set[str], List[dict]]:
+    """
+    Expand AS-SET with order-independent shortest-depth semantics.
+    Returns (asns, nested_sets, log) like expand_asset().
+    """
+    asns = set()
+    nested_sets = set()
+    log = []
+    for kind, value in iter_expand_asset(asset_name, max_depth,
+                                         fetch=fetch or fetch_asset, budget=budget):
+        if kind == "asn":
+            asns.add(value)
+        elif kind == "nested_set":
+            nested_sets.add(value)
+        else:
+            if value["action"] == "circular_skip":
+                nested_sets.add(value["asset"])
+            log.append(value)
+    return asns, nested_sets, log
+
+
+def expand_asset_budgeted(asset_name: str, budget: ExpansionBudget,
+                          max_depth: int = 5, mode: str = "dfs") -> ExpansionResult:
+    """
+    Expand an AS-SET under a budget and report truncation explicitly.
+
+    The caller decides whether a truncated result is usable; result.budget
+    names the limit that was hit and result.cut the AS-SETs that were cut.
+    """
+    asns, nested_sets, log = expand_asset(asset_name, max_depth, budget=budget, mode=mode)
+    return ExpansionResult(
+        asns=asns,
+        nested_sets=nested_sets,
+        log=log,
+        truncated=budget.truncated,
+        budget=budget.exceeded,
+        cut=list(budget.cut)
+    )
+
+
+def iter_expand_asset(asset_name: str, max_depth: int = 5, dedup: bool = True,
+                      fetch: Callable[[str], Optional[ASSET]] = fetch_asset,
+                      budget: Optional[ExpansionBudget] = None
+                      ) -> Iterator[Tuple[str, Any]]:
+    """
+    Stream the expansion of an AS-SET as it is discovered.
+
+    Yields (kind, value) events in BFS order:
+        ("asn", 12345)            member ASN
+        ("nested_set", "AS-FOO")  nested AS-SET reference
+        ("log", {...})            same entries expand_asset() puts in its log
+
+    Nothing is accumulated: memory is the BFS frontier, the names of
+    visited AS-SETs (needed to stop on cycles) and, with dedup=True, an
+    ASNBitmap so each ASN is yielded once. Depth follows the "bfs"
+    semantics in the module docstring.
+
+    With a budget, the stream ends with a ("log", {"action": "budget_exceeded"})
+    event once a limit is hit, and the unexpanded frontier is in budget.cut.
+    """
+    asset_name = canonical_asset_name(asset_name)
+    frontier = deque([(asset_name, 0)])
+    seen = {asset_name}
+    seen_asns = ASNBitmap() if dedup else None
+
+    while frontier:
+        name, depth = frontier.popleft()
+
+        if depth >= max_depth:
+            yield "log", {"asset": name, "action": "max_depth"}
+            continue
+
+        if budget is not None and budget.charge_object():
+            budget.cut.append(name)
+            budget.cut.extend(pending for pending, _ in frontier)
+            yield "log", {"asset": name, "action": "budget_exceeded",
+                          "budget": budget.exceeded}
+            return
+
+        asset = fetch(name)
+        if not asset:
+            yield "log", {"asset": name, "action": "not_found"}
+            continue
+
+        yield "log", {"asset": name, "source": asset.source, "action": "expanded"}
+
+        for kind, member in iter_members(asset):
+            if kind == "asn":
+                asn = member
+                if budget is not None and budget.charge_asn(asn):
+                    budget.cut.append(name)
+                    budget.cut.extend(pending for pending, _ in frontier)
+                    yield "log", {"asset": name, "action": "budget_exceeded",
+                                  "budget": budget.exceeded}
+                    return
+                if seen_asns is None or seen_asns.add(asn):
+                    yield "asn", asn
+            else:
+                if member in seen:
+                    yield "log", {"asset": member, "action": "circular_skip"}
+                    continue
+                seen.add(member)
+                yield "nested_set", member
+                frontier.append((member, depth + 1))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+IRR Providers
+
+Every expander here takes a fetch= callable returning an ASSET (or None).
+The providers below are such callables, with one interface for the
+places AS-SET objects come from:
+
+- LiveProvider:   WHOIS queries via fetch_asset() (which also fills the cache)
+- CacheProvider:  the local WHOIS cache only, optionally falling back to
+                  another provider on a miss or stale entry
+- DumpProvider:   an RPSL database dump (e.g. radb.db.gz) loaded into memory
+- MockProvider:   in-memory objects, for scenarios and benchmarks
+
+Names are canonicalized before lookup, and each provider counts requests
+and misses.
+"""
+
+import gzip
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+from asset_names import NAMES, canonical_asset_name
+from irr_cache import get_cached
+from irr_fetcher import ASSET, fetch_asset, parse_members
+
+
+class IRRProvider(ABC):
+    """Source of AS-SET objects; call it like fetch_asset(name)."""
+
+    def __init__(self):
+        self.requests = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, name: str) -> Optional[ASSET]:
+        """Object for a canonical AS-SET name, or None."""
+
+    def __call__(self, name: str) -> Optional[ASSET]:
+        self.requests += 1
+        # Looked up, not registered: the name may come from a request
+        asset = self.get(NAMES.lookup(name) or canonical_asset_name(name))
+        if asset is None:
+            self.misses += 1
+        return asset
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "misses": self.misses}
+
+
+class LiveProvider(IRRProvider):
+    """WHOIS queries against an IRR server."""
+
+    def __init__(self, server: str = "whois.radb.net"):
+        super().__init__()
+        self.server = server
+
+    def get(self, name: str) -> Optional[ASSET]:
+        return fetch_asset(name, self.server)
+
+
+class CacheProvider(IRRProvider):
+    """Objects from the WHOIS cache, with an optional fallback for misses."""
+
+    def __init__(self, server: str = "whois.radb.net",
+                 fallback: Optional[IRRProvider] = None):
+        super().__init__()
+        self.server = server
+        self.fallback = fallback
+
+    def get(self, name: str) -> Optional[ASSET]:
+        cached = get_cached(name, self.server)
+        if cached:
+            return ASSET(**{**cached, 'name': name})
+        return self.fallback(name) if self.fallback is not None else None
+
+
+class MockProvider(IRRProvider):
+    """In-memory AS-SET objects, with an optional simulated round trip."""
+
+    def __init__(self, objects: Union[Dict[str, Iterable[str]], Iterable[ASSET]] = (),
+                 source: str = "MOCK", latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.objects: Dict[str, ASSET] = {}
+        if isinstance(objects, dict):
+            for name, members in objects.items():
+                self.add(ASSET(name, list(members), source))
+        else:
+            for asset in objects:
+                self.add(asset)
+
+    def add(self, asset: ASSET) -> None:
+        name = NAMES.canonical(asset.name)
+        self.objects[name] = ASSET(name, asset.members, asset.source)
+
+    def get(self, name: str) -> Optional[ASSET]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.objects.get(name)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+def _strip_comment(value: str) -> str:
+    """An attribute value without its end-of-line "#" comment (RFC 2622)."""
+    return value.split("#", 1)[0].strip()
+
+
+def iter_rpsl_assets(lines: Iterable[str]) -> Iterator[ASSET]:
+    """as-set objects from RPSL text (objects separated by blank lines)."""
+    attrs: List[List[str]] = []
+
+    def finish() -> Optional[ASSET]:
+        if not attrs or attrs[0][0] != "as-set":
+            return None
+        name = attrs[0][1].strip()
+        members: List[str] = []
+        source = "UNKNOWN"
+        for key, value in attrs:
+            if key == "members":
+                members.extend(parse_members(value))
+            elif key == "source":
+                source = value.strip()
+        return ASSET(name, members, source)
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\n")
+        if not line.strip():
+            asset = finish()
+            if asset is not None:
+                yield asset
+            attrs = []
+        elif line[0] in "#%":
+            continue
+        elif line[0] in " \t+":
+            # Continuation of the previous attribute
+            if attrs:
+                attrs[-1][1] += "," + _strip_comment(line[1:])
+        elif ":" in line:
+            key, value = line.split(":", 1)
+            attrs.append([key.strip().lower(), _strip_comment(value)])
+    asset = finish()
+    if asset is not None:
+        yield asset
+
+
+class DumpProvider(MockProvider):
+    """AS-SET objects from an RPSL database dump."""
+
+    @classmethod
+    def from_file(cls, path: str) -> "DumpProvider":
+        """Load a dump file (.gz is decompressed on the fly)."""
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt", encoding="latin-1") as f:
+            return cls.from_lines(f)
+
+    @classmethod
+    def from_lines(cls, lines: Union[TextIO, Iterable[str]]) -> "DumpProvider":
+        return cls(iter_rpsl_assets(lines))
+
+
+if __name__ == "__main__":
+    from rasa_validator import (
+        PropagationScope, RASAValidator, RasaFlags, create_rasa_auth, create_rasa_set,
+    )
+
+    print("IRR Providers")
+    print("=" * 70)
+
+    dump = DumpProvider.from_lines("""\
+as-set:     AS-EXAMPLE
+descr:      Example customers
+members:    AS64496, AS64497,  # transit customers
+            AS-example-sub
+source:     RADB  # mirrored
+
+as-set:     AS-EXAMPLE-SUB
+members:    AS64498
++           AS64499
+source:     RADB
+""".splitlines())
+    print(f"dump: {sorted(dump.objects)}")
+    print(f"  {dump('as-example')}")
+
+    # A diamond: two customer sets share one large downstream set
+    mock = MockProvider({
+        "AS-TRANSIT": ["AS-CUST-A", "AS-CUST-B", "AS64500"],
+        "AS-CUST-A": ["AS64501", "AS-SHARED"],
+        "AS-CUST-B": ["AS64502", "AS-SHARED", "AS-TRANSIT"],
+        "AS-SHARED": [f"AS{asn}" for asn in range(65000, 65100)] + ["AS-LEAF"],
+        "AS-LEAF": ["AS64503"],
+    })
+    rasa_db = {
+        "AS65001": create_rasa_auth(asn=65001, strict_mode=True,
+                                    authorized_in=[("AS-OTHER", PropagationScope.UNRESTRICTED)]),
+        "AS-CUST-B": create_rasa_set("AS-CUST-B", 64502, [64510],
+                                     flags=RasaFlags(doNotInherit=False)),
+    }
+    validator = RASAValidator(rasa_db, provider=mock)
+    asns, log = validator.expand("AS-TRANSIT", max_depth=10)
+    print(f"\nAS-TRANSIT: {len(asns)} authorized ASNs, {mock.requests} provider requests "
+          f"for {len(mock)} objects")
+    for entry in log.query():
+        if entry.get("action") in ("reuse_closure", "circular_reference") or not entry.get("authorized", True):
+            print(f"  {entry}")
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 
 import subprocess
-import re
 import difflib
 from typing import Set, Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from irr_cache import get_cached, set_cached
+from asn_set import sorted_asns
+from asset_names import canonical_asset_name
+from irr_fetcher import iter_members
 
 
 @dataclass
@@ -64,14 +66,12 @@ def parse_members(member_str: str) -> List[str]:
     return members
 
 
-def is_asn(member: str) -> bool:
-    return bool(re.match(r'^AS\d+$', member))
-
-
 def expand_asset(asset_name: str, max_depth: int = 5, 
                 seen: Set[str] = None) -> Tuple[Set[int], Set[str], List[dict]]:
     if seen is None:
         seen = set()
+        # Nested names come back canonical; compare the root the same way
+        asset_name = canonical_asset_name(asset_name)
     
     if asset_name in seen:
         return set(), set(), [{"asset": asset_name, "action": "circular_skip"}]
@@ -89,10 +89,10 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     nested_sets = set()
     log = [{"asset": asset_name, "source": asset.source, "action": "expanded"}]
     
-    for member in asset.members:
-        if is_asn(member):
-            asns.add(int(member[2:]))
-        elif member.startswith('AS'):
+    for kind, member in iter_members(asset):
+        if kind == "asn":
+            asns.add(member)
+        else:
             nested_sets.add(member)
             sub_asns, sub_sets, sub_log = expand_asset(member, max_depth - 1, seen)
             asns.update(sub_asns)
@@ -127,7 +127,7 @@ def generate_peer_config(peer_name: str, peer_asn: int, allowed_asns: Set[int])
         f"as-path-group AS{peer_asn}-customers {{",
     ])
     
-    for asn in sorted(allowed_asns):
+    for asn in sorted_asns(allowed_asns):
         lines.append(f'    as-path AS{peer_asn}-customers-{asn} ".* {asn} .*";')
     
     lines.append("}")
@@ -144,7 +144,7 @@ def generate_peerlock_config(peer_name: str, peer_asn: int, blocked_asns: Set[in
         f"as-path-group AS{peer_asn}-peerlock {{",
     ]
     
-    for asn in sorted(blocked_asns):
+    for asn in sorted_asns(blocked_asns):
         lines.append(f'    as-path block-google-{asn} ".* {asn} .*";')
     
     lines.extend([
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Lazy AS-SET Membership Queries
+
+"Is AS X reachable from AS-SET Y within depth D?" without expanding Y.
+
+Validating a single route only needs a yes/no answer, but expand_asset()
+would materialize the whole closure (100k ASNs for the largest sets).
+LazyClosureView answers `asn in view` with two short-circuiting searches
+run in lock-step over an ASSetGraph:
+
+- down: BFS from the root, stopping at the first AS-SET that lists the
+  ASN. Sub-closures the graph already memoized are answered in place.
+- up: BFS over the reverse index from the AS-SETs that list the ASN,
+  stopping when it reaches the root.
+
+Whichever finishes first answers the query. Depth follows the "bfs"
+semantics of irr_fetcher: the ASN is a member iff some AS-SET listing it
+is fewer than max_depth nesting steps from the root.
+"""
+
+import operator
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from asset_graph import ASSetGraph
+from asset_names import canonical_asset_name
+
+
+@dataclass
+class MembershipAnswer:
+    """Result of a lazy membership query."""
+    asn: int
+    member: bool
+    method: str
+    objects_touched: int
+
+
+class LazyClosureView:
+    """Membership view of an AS-SET closure that never materializes it."""
+
+    def __init__(self, graph: ASSetGraph, root: str, max_depth: int = 5):
+        self.graph = graph
+        self.root = graph.name_table.lookup(root) or canonical_asset_name(root)
+        self.max_depth = max_depth
+        self.last: Optional[MembershipAnswer] = None
+        self.objects_touched = 0
+
+    def __contains__(self, asn) -> bool:
+        try:
+            asn = operator.index(asn)   # int, bool, numpy integers, like ASNSet
+        except TypeError:
+            return False
+        return self.query(asn).member
+
+    def query(self, asn: int) -> MembershipAnswer:
+        """Answer whether asn is in the closure and how much work it took."""
+        answer = self._query(asn)
+        self.last = answer
+        self.objects_touched += answer.objects_touched
+        return answer
+
+    def _query(self, asn: int) -> MembershipAnswer:
+        graph = self.graph
+        if self.max_depth <= 0 or self.root not in graph:
+            return MembershipAnswer(asn, False, "empty", 0)
+
+        cached = graph.cached_closure(self.root, self.max_depth)
+        if cached is not None:
+            return MembershipAnswer(asn, asn in cached, "closure", 1)
+
+        if not graph.direct_containers(asn):
+            return MembershipAnswer(asn, False, "index", 0)
+
+        searches = [("down", self._search_down(asn)), ("up", self._search_up(asn))]
+        touched = 0
+        while True:
+            for method, search in searches:
+                result = next(search)
+                touched += 1
+                if result is not None:
+                    return MembershipAnswer(asn, result, method, touched)
+
+    def _search_down(self, asn: int) -> Iterator[Optional[bool]]:
+        """BFS from the root; yields None per object touched, then the answer."""
+        graph = self.graph
+        frontier = deque([(self.root, 0)])
+        seen = {self.root}
+        while frontier:
+            name, depth = frontier.popleft()
+            if asn in graph.asns.get(name, ()):
+                yield True
+            cached = graph.cached_closure(name, self.max_depth - depth)
+            if cached is not None:
+                if asn in cached:
+                    yield True
+                yield None
+                continue
+            if depth + 1 < self.max_depth:
+                for child in graph.children.get(name, ()):
+                    if child not in seen and child in graph:
+                        seen.add(child)
+                        frontier.append((child, depth + 1))
+            yield None
+        while True:
+            yield False
+
+    def _search_up(self, asn: int) -> Iterator[Optional[bool]]:
+        """BFS up the reverse index from the ASN's direct containers."""
+        graph = self.graph
+        frontier = deque((name, 0) for name in graph.direct_containers(asn))
+        seen = set(graph.direct_containers(asn))
+        while frontier:
+            name, distance = frontier.popleft()
+            if name == self.root:
+                yield True
+            if distance + 1 < self.max_depth:
+                for parent in graph.parents.get(name, ()):
+                    if parent not in seen:
+                        seen.add(parent)
+                        frontier.append((parent, distance + 1))
+            yield None
+        while True:
+            yield False
+
+
+if __name__ == "__main__":
+    from irr_fetcher import ASSET
+
+    print("Lazy AS-SET Membership Queries")
+    print("=" * 70)
+
+    # Synthetic registry: a root with 500 customer sets of 200 ASNs each
+    registry = [ASSET("AS2914:AS-GLOBAL", [f"AS-CUST{i}" for i in range(500)], "TEST")]
+    for i in range(500):
+        registry.append(ASSET(f"AS-CUST{i}",
+                              [f"AS{100000 + i * 200 + j}" for j in range(200)], "TEST"))
+    registry[-1].members.append("AS15169:AS-GOOGLE")
+    registry.append(ASSET("AS15169:AS-GOOGLE", ["AS15169", "AS36040"], "RADB"))
+
+    graph = ASSetGraph.from_objects(registry)
+    view = LazyClosureView(graph, "AS2914:AS-GLOBAL", max_depth=5)
+
+    for asn in (15169, 100000 + 450 * 200, 64999):
+        answer = view.query(asn)
+        print(f"AS{asn}: member={answer.member} via {answer.method}, "
+              f"touched {answer.objects_touched} objects")
+
+    print(f"\nFull closure would hold {len(graph.closure('AS2914:AS-GLOBAL'))} ASNs")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Inverted Peer-Lock Index
+
+get_peer_lock_sets() and RASAFilter.get_peer_lock_list() answer "in which
+AS-SETs did this ASN ask for directOnly propagation?" by scanning the
+ASN's authorizedIn. Peer-lock generation needs the reverse - for an
+AS-SET, every ASN that marked it directOnly - and answering that from the
+forward lookup means asking every ASN with a RASA-AUTH, once per peer.
+
+PeerLockIndex is built in one pass over an AuthIndex:
+
+    by_set   AS-SET ID -> sorted array of ASNs that marked it directOnly
+    by_asn   ASN -> canonical names of its directOnly AS-SETs (authorizedIn order)
+
+Both directions are then a dict lookup, and the batch calls do work
+proportional to what they return:
+
+    lock_lists(asns)               ASN -> its directOnly AS-SETs
+    peer_lock_lists(asset, peers)  peer -> the locked ASNs to reject on that
+                                   peer's session (every ASN locked in the
+                                   AS-SET except the peer itself)
+
+Results are fresh lists; the index's own arrays are never handed out.
+
+compile_snapshot() builds one per snapshot; peer_locks(index) builds and
+caches one for a bare AuthIndex, like rasa_batch.compiled().
+"""
+
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from asn_set import ASN_TYPECODE
+from rasa_index import AuthIndex
+
+_EMPTY = array(ASN_TYPECODE)
+
+
+class PeerLockIndex:
+    """directOnly authorizations by AS-SET and by ASN."""
+
+    def __init__(self, index: AuthIndex):
+        self.table = index.table
+        by_set: Dict[int, List[int]] = {}
+        self.by_asn: Dict[int, Tuple[str, ...]] = {}
+        for asn, record in index.asns.items():
+            locked = [set_id for set_id, direct_only in record.authorized_in.items() if direct_only]
+            if not locked:
+                continue
+            self.by_asn[asn] = tuple(self.table.name(set_id) for set_id in locked)
+            for set_id in locked:
+                by_set.setdefault(set_id, []).append(asn)
+        self.by_set: Dict[int, array] = {set_id: array(ASN_TYPECODE, sorted(asns))
+                                         for set_id, asns in by_set.items()}
+
+    def _locked(self, asset_name: str) -> array:
+        set_id = self.table.get_id(asset_name)
+        return self.by_set.get(set_id, _EMPTY) if set_id is not None else _EMPTY
+
+    def locked_asns(self, asset_name: str) -> List[int]:
+        """ASNs that marked asset_name directOnly, ascending."""
+        return self._locked(asset_name).tolist()
+
+    def lock_sets(self, asn: int) -> List[str]:
+        """AS-SETs in which the ASN is authorized with propagation directOnly."""
+        return list(self.by_asn.get(asn, ()))
+
+    def lock_lists(self, asns: Optional[Iterable[int]] = None) -> Dict[int, List[str]]:
+        """lock_sets() for each ASN (default: every ASN with a lock); ASNs without one are left out."""
+        by_asn = self.by_asn
+        if asns is None:
+            return {asn: list(names) for asn, names in by_asn.items()}
+        return {asn: list(by_asn[asn]) for asn in asns if asn in by_asn}
+
+    def peer_lock_lists(self, asset_name: str, peers: Iterable[int]) -> Dict[int, List[int]]:
+        """
+        For each peer, the ASNs locked in asset_name that must be rejected
+        on that peer's session, ascending. A locked ASN's own session is
+        exempt.
+        """
+        locked = self._locked(asset_name)
+        everyone = locked.tolist()
+        result = {}
+        for peer in peers:
+            pos = bisect_left(locked, peer)
+            if pos < len(locked) and locked[pos] == peer:
+                result[peer] = everyone[:pos] + everyone[pos + 1:]
+            else:
+                result[peer] = everyone[:]
+        return result
+
+    def __len__(self) -> int:
+        return len(self.by_asn)
+
+
+def peer_locks(index: AuthIndex) -> PeerLockIndex:
+    """PeerLockIndex for an AuthIndex, rebuilt only when the index changed."""
+    return index.derived("peer_locks", PeerLockIndex)
+
+
+if __name__ == "__main__":
+    from rasa_validator import PropagationScope, RASAValidator, create_rasa_auth
+
+    print("Inverted Peer-Lock Index")
+    print("=" * 70)
+
+    n_asns = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_peers = 200
+    target = "AS2914:AS-GLOBAL"
+    rasa_db = {}
+    for asn in range(1, n_asns + 1):
+        authorized = [(f"AS-PEER{(asn + k) % 1000}",
+                       PropagationScope.DIRECT_ONLY if (asn + k) % 11 == 0 else PropagationScope.UNRESTRICTED)
+                      for k in range(10)]
+        authorized.append((target, PropagationScope.DIRECT_ONLY if asn % 50 == 0
+                           else PropagationScope.UNRESTRICTED))
+        rasa_db[f"AS{asn}"] = create_rasa_auth(asn=asn, authorized_in=authorized)
+    validator = RASAValidator(rasa_db, log="off")
+    locks = validator.snapshot.peer_locks
+    peers = list(range(50, 50 * n_peers + 1, 50))
+    print(f"{n_asns} RASA-AUTH objects, {len(locks)} ASNs with directOnly entries, "
+          f"{len(locks.locked_asns(target))} locked in {target}")
+
+    # What peer-lock generation had to do: ask every ASN, for every peer
+    start = time.perf_counter()
+    scanned = {}
+    for peer in peers:
+        scanned[peer] = [asn for asn in range(1, n_asns + 1)
+                         if asn != peer and target in validator.get_peer_lock_sets(asn)]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = validator.peer_lock_lists(target, peers)
+    index_time = time.perf_counter() - start
+    assert indexed == scanned
+    print(f"\nper-peer lock lists for {len(peers)} peers:")
+    print(f"  forward lookup per ASN per peer: {scan_time * 1000:9.1f} ms")
+    print(f"  inverted index:                  {index_time * 1000:9.1f} ms")
+
+    start = time.perf_counter()
+    lists = validator.get_peer_lock_lists()
+    print(f"  every ASN's lock list ({len(lists)} ASNs): {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"  AS50: {lists[50]}")
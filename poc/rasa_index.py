@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Indexed RASA-AUTH Lookups
+
+Checking whether an ASN may appear in an AS-SET used to build an
+f"AS{asn}" key, fetch the RASA-AUTH object and scan its authorizedIn list
+comparing strings. Over a 100k-ASN closure against RASA-AUTH objects with
+long authorizedIn lists, that scan dominates filtering.
+
+AuthIndex is built once when the RASA data is loaded. It maps integer
+ASNs (and interned AS-SET IDs, for nested-set authorizations) to an
+AuthRecord holding strictMode and a dict from authorized AS-SET ID to its
+propagation scope, so every check is two dict lookups:
+
+    index.member(asn, set_id) -> AuthDecision(has_auth, authorized, direct_only, strict)
+
+The index reads every RASA data shape in this repo: RasaAuthContent from
+rasa_validator, RASAAuth from rasa_pipeline, the plain dicts used by
+real_pipeline and rasa_poc_cached, and CompactRasaAuth records.
+"""
+
+import sys
+import threading
+import time
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from asset_names import NAMES, NameTable, canonical_asset_name
+from irr_fetcher import is_asn
+
+
+class AuthRecord(NamedTuple):
+    """One RASA-AUTH object: strictMode and authorized AS-SET ID -> directOnly."""
+    strict: bool
+    authorized_in: Mapping[int, bool]
+
+
+class AuthDecision(NamedTuple):
+    """Answer to one authorization check."""
+    has_auth: bool      # a RASA-AUTH object exists for the member
+    authorized: bool
+    direct_only: bool   # propagation of the matching authorizedIn entry
+    strict: bool
+
+    @property
+    def propagation(self) -> str:
+        """Propagation scope name as in rasa_validator.PropagationScope."""
+        return "DIRECT_ONLY" if self.direct_only else "UNRESTRICTED"
+
+
+NO_AUTH = AuthDecision(has_auth=False, authorized=True, direct_only=False, strict=False)
+
+# set_id() of a name that was never registered: no RASA object mentions
+# that AS-SET, so it is listed nowhere and has no RASA-AUTH of its own
+UNKNOWN_SET = -1
+
+
+class AuthReason(IntEnum):
+    """Compact reason codes for authorization decisions."""
+    NO_AUTH = 0             # no RASA-AUTH, default allow
+    AUTHORIZED = 1
+    REJECTED_NOT_LISTED = 2
+    REJECTED_STRICT = 3
+
+    @classmethod
+    def of(cls, decision: AuthDecision) -> "AuthReason":
+        if not decision.has_auth:
+            return cls.NO_AUTH
+        if decision.authorized:
+            return cls.AUTHORIZED
+        return cls.REJECTED_STRICT if decision.strict else cls.REJECTED_NOT_LISTED
+
+
+def _auth_entries(obj: Any) -> Optional[Tuple[bool, Iterator[Tuple[Any, bool]]]]:
+    """(strict, [(set name or ID, direct_only)]) for any RASA-AUTH shape, else None."""
+    if isinstance(obj, dict):
+        entries = obj.get("authorizedIn") or []
+        strict = bool(obj.get("strictMode"))
+    elif hasattr(obj, "authorized_in"):
+        # CompactRasaAuth: entries already carry set IDs
+        return obj.strict_mode, ((e.set_id, e.direct_only) for e in obj.authorized_in)
+    elif hasattr(obj, "authorizedIn"):
+        entries = obj.authorizedIn or []
+        flags = getattr(obj, "flags", None)
+        strict = bool(getattr(flags, "strictMode", False) or getattr(obj, "strictMode", False))
+    else:
+        return None
+
+    def pairs():
+        for entry in entries:
+            if isinstance(entry, dict):
+                yield entry.get("asSetName"), entry.get("propagation") == "directOnly"
+            else:
+                yield entry.asSetName, getattr(entry.propagation, "name", "") == "DIRECT_ONLY"
+
+    return strict, pairs()
+
+
+class AuthIndex:
+    """
+    O(1) RASA-AUTH lookups by integer ASN and interned AS-SET ID.
+
+    from_rasa_db() returns a frozen index: asns and sets are read-only
+    views, and add() raises, so structures derived from it (the NumPy
+    form, the peer-lock index) cannot go stale under a snapshot.
+    """
+
+    def __init__(self, table: NameTable = NAMES):
+        self.table = table
+        self._asns: Dict[int, AuthRecord] = {}
+        self._sets: Dict[int, AuthRecord] = {}
+        self.asns: Mapping[int, AuthRecord] = MappingProxyType(self._asns)
+        self.sets: Mapping[int, AuthRecord] = MappingProxyType(self._sets)
+        # AS-SET keys that hold a RASA-SET rather than a RASA-AUTH
+        self._rasa_sets: Set[int] = set()
+        self.frozen = False
+        # Bumped on every change, so compiled forms can tell they are stale
+        self.version = 0
+        # Structures built from the index: key -> (version, structure)
+        self._derived: Dict[str, Tuple[int, Any]] = {}
+        self._derived_lock = threading.Lock()
+
+    @classmethod
+    def from_rasa_db(cls, rasa_db: Dict[str, Any], table: NameTable = NAMES) -> "AuthIndex":
+        index = cls(table)
+        for key, obj in rasa_db.items():
+            index.add(key, obj)
+        index.freeze()
+        return index
+
+    def freeze(self) -> None:
+        """Disallow further add() calls."""
+        self.frozen = True
+
+    def add(self, key: str, obj: Any) -> None:
+        """Index one rasa_db entry; the first entry for a key wins, as before."""
+        if self.frozen:
+            raise RuntimeError("AuthIndex is frozen; compile a new one from the updated rasa_db")
+        if not obj:
+            return
+        self.version += 1
+        # ASN keys are never registered; AS-SET keys are, when indexed
+        key = canonical_asset_name(key)
+        fields = _auth_entries(obj)
+        if fields is None:
+            if not is_asn(key):
+                self._rasa_sets.add(self.table.id(key))
+            return
+
+        strict, entries = fields
+        authorized_in: Dict[int, bool] = {}
+        for name, direct_only in entries:
+            if name is None:
+                continue
+            set_id = name if isinstance(name, int) else self.table.id(name)
+            authorized_in.setdefault(set_id, direct_only)
+        record = AuthRecord(strict, MappingProxyType(authorized_in))
+        if is_asn(key):
+            self._asns.setdefault(int(key[2:]), record)
+        else:
+            self._sets.setdefault(self.table.id(key), record)
+
+    def updated(self, changes: Dict[str, Any]) -> "AuthIndex":
+        """
+        A new frozen index with changes applied (rasa_db key -> object, or
+        None to remove it); the records of unchanged keys are shared. Keys
+        are assumed to be distinct once canonicalized.
+        """
+        index = AuthIndex(self.table)
+        index._asns.update(self._asns)
+        index._sets.update(self._sets)
+        index._rasa_sets.update(self._rasa_sets)
+        index.version = self.version
+        for key, obj in changes.items():
+            index._discard(key)
+            index.add(key, obj)
+        index.freeze()
+        return index
+
+    def _discard(self, key: str) -> None:
+        """Drop whatever a rasa_db key indexed (while building)."""
+        self.version += 1
+        key = canonical_asset_name(key)
+        if is_asn(key):
+            self._asns.pop(int(key[2:]), None)
+            return
+        set_id = self.table.get_id(key)
+        if set_id is not None:
+            self._sets.pop(set_id, None)
+            self._rasa_sets.discard(set_id)
+
+    def derived(self, key: str, build: Callable[["AuthIndex"], Any]) -> Any:
+        """
+        build(self), computed once per index version and cached under key
+        (e.g. the NumPy form in rasa_batch, the peer-lock index).
+        """
+        with self._derived_lock:
+            cached = self._derived.get(key)
+            if cached is None or cached[0] != self.version:
+                cached = (self.version, build(self))
+                self._derived[key] = cached
+        return cached[1]
+
+    def set_id(self, name: str) -> int:
+        """ID of an AS-SET name for member()/nested(); never registers it."""
+        set_id = self.table.get_id(name)
+        return UNKNOWN_SET if set_id is None else set_id
+
+    @staticmethod
+    def _decide(record: Optional[AuthRecord], set_id: int) -> AuthDecision:
+        if record is None:
+            return NO_AUTH
+        direct_only = record.authorized_in.get(set_id)
+        if direct_only is None:
+            return AuthDecision(True, False, False, record.strict)
+        return AuthDecision(True, True, direct_only, record.strict)
+
+    def member(self, asn: int, set_id: int) -> AuthDecision:
+        """May this ASN appear in the AS-SET with this ID?"""
+        return self._decide(self._asns.get(asn), set_id)
+
+    def nested(self, set_id: int, parent_id: int) -> AuthDecision:
+        """May the AS-SET set_id be nested in parent_id?"""
+        return self._decide(self._sets.get(set_id), parent_id)
+
+    def is_rasa_set(self, set_id: int) -> bool:
+        return set_id in self._rasa_sets
+
+    def direct_only_sets(self, asn: int) -> List[str]:
+        """AS-SETs in which the ASN is authorized with propagation directOnly."""
+        record = self._asns.get(asn)
+        if record is None:
+            return []
+        return [self.table.name(set_id)
+                for set_id, direct_only in record.authorized_in.items() if direct_only]
+
+
+if __name__ == "__main__":
+    from rasa_validator import PropagationScope, RASAValidator, create_rasa_auth
+
+    print("Indexed RASA-AUTH Lookups")
+    print("=" * 70)
+
+    n_asns = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sets_per_auth = 50
+    target = "AS2914:AS-GLOBAL"
+    rasa_db = {}
+    for asn in range(1, n_asns + 1):
+        authorized = [(f"AS-PEER{(asn + k) % 5000}", PropagationScope.UNRESTRICTED)
+                      for k in range(sets_per_auth)]
+        if asn % 10:
+            authorized.append((target, PropagationScope.DIRECT_ONLY if asn % 7 == 0
+                               else PropagationScope.UNRESTRICTED))
+        rasa_db[f"AS{asn}"] = create_rasa_auth(asn=asn, authorized_in=authorized,
+                                               strict_mode=asn % 3 == 0)
+    print(f"{n_asns} RASA-AUTH objects, {sets_per_auth}+ authorizedIn entries each")
+
+    start = time.perf_counter()
+    validator = RASAValidator(rasa_db)
+    print(f"  index build:       {time.perf_counter() - start:.2f}s")
+
+    def linear_check(asn: int, asset: str) -> bool:
+        # What check_member_auth did before the index
+        auth = rasa_db.get(f"AS{asn}")
+        key = canonical_asset_name(asset)
+        return any(canonical_asset_name(entry.asSetName) == key for entry in auth.authorizedIn)
+
+    start = time.perf_counter()
+    expected = [linear_check(asn, target) for asn in range(1, n_asns + 1)]
+    linear_time = time.perf_counter() - start
+
+    index = validator.auth_index
+    set_id = index.set_id(target)
+    start = time.perf_counter()
+    indexed = [index.member(asn, set_id).authorized for asn in range(1, n_asns + 1)]
+    index_time = time.perf_counter() - start
+
+    assert indexed == expected
+    print(f"  linear scan:       {linear_time:.3f}s")
+    print(f"  indexed lookups:   {index_time:.3f}s ({linear_time / index_time:.0f}x faster)")
+    print(f"  authorized:        {sum(indexed)} of {n_asns}")
@@ -12,6 +12,14 @@ from typing import Set, Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
+from asn_set import sorted_asns
+from peer_lock_index import peer_locks
+from rasa_batch import (
+    PROPAGATION_DIRECT_ONLY, PROPAGATION_NONE, PROPAGATION_UNRESTRICTED,
+    authorize_closure, decision_key,
+)
+from rasa_index import AuthIndex, AuthReason
+
 
 @dataclass
 class RASAAuth:
@@ -28,6 +36,21 @@ class RASAAuth:
             self.flags = {}
 
 
+def bgpq4_expand(asset: str, sources: str = "RIPE,NTT,RADB") -> Optional[Set[int]]:
+    """Expand AS-SET to member ASNs with one uncached bgpq4 run; None on failure."""
+    try:
+        result = subprocess.run(
+            ["bgpq4", "-S", sources, "-j", asset],
+            capture_output=True, text=True, timeout=30
+        )
+        if result.returncode == 0:
+            return set(json.loads(result.stdout).get("ASNs", []))
+        print(f"bgpq4 error: {result.stderr}", file=sys.stderr)
+    except Exception as e:
+        print(f"Error expanding {asset}: {e}", file=sys.stderr)
+    return None
+
+
 class IRRPipeline:
     """Fetches and expands AS-SETs using bgpq4."""
     
@@ -44,24 +67,13 @@ class IRRPipeline:
             with open(cache_file) as f:
                 return set(json.load(f))
         
-        try:
-            result = subprocess.run(
-                ["bgpq4", "-S", self.sources, "-j", asset],
-                capture_output=True, text=True, timeout=30
-            )
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                asns = set(data.get("ASNs", []))
-                # Cache result
-                with open(cache_file, 'w') as f:
-                    json.dump(list(asns), f)
-                return asns
-            else:
-                print(f"bgpq4 error: {result.stderr}", file=sys.stderr)
-        except Exception as e:
-            print(f"Error expanding {asset}: {e}", file=sys.stderr)
-        
-        return set()
+        asns = bgpq4_expand(asset, self.sources)
+        if asns is None:
+            return set()
+        # Cache result
+        with open(cache_file, 'w') as f:
+            json.dump(list(asns), f)
+        return asns
     
     def expand_asset_recursive(self, asset: str, max_depth: int = 10,
                                seen: Set[str] = None) -> Tuple[Set[int], Set[str]]:
@@ -89,35 +101,36 @@ class IRRPipeline:
         return asns, seen
 
 
+# (AuthReason, propagation) -> (is_authorized, reason)
+_REASONS = {
+    (AuthReason.NO_AUTH, PROPAGATION_NONE): (True, "No RASA-AUTH (default allow)"),
+    (AuthReason.AUTHORIZED, PROPAGATION_UNRESTRICTED): (True, "Authorized (unrestricted)"),
+    (AuthReason.AUTHORIZED, PROPAGATION_DIRECT_ONLY): (True, "Authorized (directOnly)"),
+    (AuthReason.REJECTED_NOT_LISTED, PROPAGATION_NONE): (False, "REJECTED: not in authorizedIn"),
+    (AuthReason.REJECTED_STRICT, PROPAGATION_NONE): (False, "REJECTED: strictMode=TRUE, not authorized"),
+}
+
+
 class RASAFilter:
     """Applies RASA authorization to filter AS-SET members."""
     
     def __init__(self, rasa_db: Dict[str, RASAAuth]):
         self.rasa_db = rasa_db
         self.log = []
+        self.auth_index = AuthIndex.from_rasa_db(rasa_db)
     
     def check_auth(self, asn: int, asset: str) -> Tuple[bool, str]:
         """
         Check if ASN is authorized to be in asset.
         Returns (is_authorized, reason).
         """
-        auth_key = f"AS{asn}"
-        auth_obj = self.rasa_db.get(auth_key)
-        
-        if not auth_obj:
-            return True, "No RASA-AUTH (default allow)"
-        
-        # Check if asset is in authorizedIn list
-        for entry in auth_obj.authorizedIn:
-            if entry.get("asSetName") == asset:
-                propagation = entry.get("propagation", "unrestricted")
-                return True, f"Authorized ({propagation})"
-        
-        # Not authorized
-        if auth_obj.strictMode:
-            return False, "REJECTED: strictMode=TRUE, not authorized"
-        
-        return False, "REJECTED: not in authorizedIn"
+        decision = self.auth_index.member(asn, self.auth_index.set_id(asset))
+        return _REASONS[decision_key(decision)]
+    
+    def check_members_auth(self, asns, asset: str):
+        """Vectorized check_auth over an ASN array (see rasa_batch; requires NumPy)."""
+        from rasa_batch import check_members_auth
+        return check_members_auth(self.auth_index, asns, asset)
     
     def filter_asset(self, asset: str, asns: Set[int]) -> Tuple[Set[int], List[dict]]:
         """
@@ -127,13 +140,14 @@ class RASAFilter:
         authorized = set()
         log = []
         
-        for asn in sorted(asns):
-            is_auth, reason = self.check_auth(asn, asset)
+        # The whole closure in one batch check (vectorized with NumPy)
+        for asn, reason, propagation in authorize_closure(self.auth_index, asns, asset):
+            is_auth, text = _REASONS[reason, propagation]
             log.append({
                 "asn": asn,
                 "asset": asset,
                 "authorized": is_auth,
-                "reason": reason
+                "reason": text
             })
             if is_auth:
                 authorized.add(asn)
@@ -145,18 +159,15 @@ class RASAFilter:
         Get list of AS-SETs where this ASN has propagation=directOnly.
         These are the AS-SETs that should only accept routes from direct sessions.
         """
-        auth_key = f"AS{asn}"
-        auth_obj = self.rasa_db.get(auth_key)
-        
-        if not auth_obj:
-            return []
-        
-        peer_lock_sets = []
-        for entry in auth_obj.authorizedIn:
-            if entry.get("propagation") == "directOnly":
-                peer_lock_sets.append(entry["asSetName"])
-        
-        return peer_lock_sets
+        return peer_locks(self.auth_index).lock_sets(asn)
+    
+    def get_peer_lock_lists(self, asns=None) -> Dict[int, List[str]]:
+        """get_peer_lock_list for many ASNs (default: every ASN with a directOnly entry)."""
+        return peer_locks(self.auth_index).lock_lists(asns)
+    
+    def peer_lock_lists(self, asset: str, peers) -> Dict[int, List[int]]:
+        """For each peer, the ASNs locked in asset to reject on that peer's session."""
+        return peer_locks(self.auth_index).peer_lock_lists(asset, peers)
 
 
 class JunOSGenerator:
@@ -171,7 +182,7 @@ class JunOSGenerator:
             return f"as-path-group {policy_name} {{\n    as-path {policy_name}-empty \"^$\";\n}}"
         
         lines = [f"as-path-group {policy_name} {{"]
-        for i, asn in enumerate(sorted(asns)):
+        for i, asn in enumerate(sorted_asns(asns)):
             lines.append(f'    as-path {policy_name}-{asn} ".* {asn} .*";')
         lines.append("}")
         return "\n".join(lines)
@@ -192,7 +203,7 @@ class JunOSGenerator:
         ]
         
         # Add as-path-group match
-        as_list = sorted(allowed_asns)
+        as_list = sorted_asns(allowed_asns)
         if as_list:
             lines.append(f"            as-path-group {peer_name}-asns;")
         
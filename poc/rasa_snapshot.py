@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Compiled RASA Policy Snapshots
+
+The validator used to work on the live rasa_db dict: every expansion
+looked the AS-SET up (case-insensitively), checked isinstance() on the
+object, read its flags and converted both the IRR and the RASA member
+lists to fresh sets to merge them.
+
+compile_snapshot() turns a rasa_db into an immutable RasaSnapshot once:
+
+- auth:  a frozen AuthIndex (RASA-AUTH by integer ASN and interned
+         AS-SET ID); add() raises, so peer_locks and the NumPy form
+         cached on it stay in step
+- sets:  RASA-SETs by AS-SET ID as SnapshotSet records, with members
+         packed in an array('I') (publication order), a frozenset of the
+         same ASNs for merging with IRR data, nested sets as IDs and
+         canonical names, and authoritative/doNotInherit as plain bools
+- delegations: a DelegationIndex of the delegation tokens
+- peer_locks:  a PeerLockIndex of directOnly authorizations, by AS-SET
+               and by ASN
+
+Each snapshot carries a version number from a process-wide counter.
+SnapshotHolder publishes the current snapshot: readers take
+`holder.current` once per operation and use it without locking (the
+snapshot never changes), and install() swaps in a newly compiled one with
+a single reference assignment, so a reload never blocks queries and a
+query never sees half of a reload.
+
+update_snapshot() applies a few changed rasa_db/delegation_db entries to
+an existing snapshot, compiling only those entries; everything else is
+shared with the previous snapshot.
+"""
+
+import itertools
+import sys
+import threading
+import time
+from array import array
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from asn_set import ASN_TYPECODE
+from asset_names import NAMES, NameTable, canonical_asset_name
+from delegation_index import DelegationIndex
+from irr_fetcher import is_asn
+from peer_lock_index import PeerLockIndex, peer_locks
+from rasa_index import AuthIndex
+
+
+class SnapshotSet(NamedTuple):
+    """One RASA-SET, compiled."""
+    set_id: int
+    containing_as: int
+    members: array                  # ASNs in publication order
+    member_set: FrozenSet[int]
+    nested: array                   # nested AS-SET IDs
+    nested_names: Tuple[str, ...]   # canonical names for the same IDs
+    authoritative: bool
+    do_not_inherit: bool
+
+    def merged_members(self, irr_members: Iterable[int]) -> set:
+        """IRR members merged with the RASA-SET members."""
+        return set(irr_members) | self.member_set
+
+    def merged_nested(self, irr_nested: Iterable[str]) -> set:
+        """IRR nested sets merged with the RASA-SET's (canonical names)."""
+        return set(irr_nested) | set(self.nested_names)
+
+
+def _compile_set(obj: Any, table: NameTable) -> Optional[SnapshotSet]:
+    """SnapshotSet for a RasaSetContent or CompactRasaSet, else None."""
+    if hasattr(obj, "nestedSets"):
+        set_id = table.id(obj.asSetName)
+        containing_as = obj.containingAS
+        members = obj.members
+        nested_ids = [table.id(name) for name in obj.nestedSets]
+        authoritative = obj.flags.authoritative
+        do_not_inherit = obj.flags.doNotInherit
+    elif hasattr(obj, "do_not_inherit"):
+        set_id = obj.set_id
+        containing_as = obj.containing_as
+        members = obj.members
+        nested_ids = list(obj.nested)
+        authoritative = obj.authoritative
+        do_not_inherit = obj.do_not_inherit
+    else:
+        return None
+    nested_ids = list(dict.fromkeys(nested_ids))
+    return SnapshotSet(
+        set_id, containing_as,
+        array(ASN_TYPECODE, dict.fromkeys(members)), frozenset(members),
+        array('I', nested_ids), tuple(table.name(i) for i in nested_ids),
+        bool(authoritative), bool(do_not_inherit))
+
+
+class RasaSnapshot(NamedTuple):
+    """Immutable, compiled view of a rasa_db."""
+    version: int
+    auth: AuthIndex
+    sets: Mapping[int, SnapshotSet]
+    table: NameTable = NAMES
+    delegations: Optional[DelegationIndex] = None
+    peer_locks: Optional[PeerLockIndex] = None
+
+    def rasa_set(self, name: str) -> Optional[SnapshotSet]:
+        """The RASA-SET published for an AS-SET (any spelling), if any."""
+        set_id = self.table.get_id(name)
+        return self.sets.get(set_id) if set_id is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "rasa_auth_asns": len(self.auth.asns),
+            "rasa_auth_sets": len(self.auth.sets),
+            "rasa_sets": len(self.sets),
+            "delegations": len(self.delegations) if self.delegations is not None else 0,
+            "delegation_errors": len(self.delegations.errors) if self.delegations is not None else 0,
+            "peer_lock_asns": len(self.peer_locks) if self.peer_locks is not None else 0,
+        }
+
+
+_versions = itertools.count(1)
+
+
+def compile_snapshot(rasa_db: Dict[str, Any], table: NameTable = NAMES,
+                     delegation_db: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+    """Compile a rasa_db (and delegation_db) into a new RasaSnapshot with the next version."""
+    sets: Dict[int, SnapshotSet] = {}
+    for key, obj in rasa_db.items():
+        if not obj or is_asn(canonical_asset_name(key)):
+            continue
+        compiled = _compile_set(obj, table)
+        if compiled is not None:
+            # Keyed by the rasa_db key, like the lookups were; first wins
+            sets.setdefault(table.id(key), compiled)
+    auth = AuthIndex.from_rasa_db(rasa_db, table)
+    delegations = DelegationIndex.from_delegation_db(delegation_db or {}, table)
+    return RasaSnapshot(next(_versions), auth, MappingProxyType(sets), table, delegations,
+                        peer_locks(auth))
+
+
+def update_snapshot(previous: RasaSnapshot, rasa_changes: Optional[Dict[str, Any]] = None,
+                    delegation_changes: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+    """
+    previous with changed entries applied (key -> object, or None for a
+    removed key), as a new RasaSnapshot with the next version.
+    """
+    table = previous.table
+    auth, sets, delegations = previous.auth, previous.sets, previous.delegations
+    if rasa_changes:
+        auth = auth.updated(rasa_changes)
+        patched = dict(sets)
+        for key, obj in rasa_changes.items():
+            if is_asn(canonical_asset_name(key)):
+                continue
+            set_id = table.get_id(key)
+            if set_id is not None:
+                patched.pop(set_id, None)
+            compiled = _compile_set(obj, table) if obj else None
+            if compiled is not None:
+                patched[table.id(key)] = compiled
+        sets = MappingProxyType(patched)
+    if delegation_changes:
+        delegations = (delegations or DelegationIndex(table)).updated(delegation_changes)
+    return RasaSnapshot(next(_versions), auth, sets, table, delegations,
+                        peer_locks(auth) if auth is not previous.auth else previous.peer_locks)
+
+
+class SnapshotHolder:
+    """Publishes the current RasaSnapshot; install() swaps it atomically."""
+
+    def __init__(self, snapshot: RasaSnapshot):
+        self._current = snapshot
+        # Serializes writers only; readers never take it
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[RasaSnapshot, RasaSnapshot], None]] = []
+
+    @property
+    def current(self) -> RasaSnapshot:
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def subscribe(self, listener: Callable[[RasaSnapshot, RasaSnapshot], None]) -> None:
+        """
+        Call listener(new, previous) after every install (e.g. cache
+        invalidation), outside the writer lock, so a listener may read
+        `current` or install again.
+        """
+        self._listeners.append(listener)
+
+    def install(self, snapshot: RasaSnapshot) -> RasaSnapshot:
+        """Make snapshot current and return the one it replaced."""
+        with self._lock:
+            previous = self._current
+            if snapshot.version <= previous.version:
+                raise ValueError(f"Snapshot version {snapshot.version} is not newer "
+                                 f"than the installed version {previous.version}")
+            self._current = snapshot
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(snapshot, previous)
+        return previous
+
+    def update(self, rasa_changes: Optional[Dict[str, Any]] = None,
+               delegation_changes: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+        """Install update_snapshot(current, ...); returns the new snapshot."""
+        with self._lock:
+            previous = self._current
+            snapshot = update_snapshot(previous, rasa_changes, delegation_changes)
+            self._current = snapshot
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(snapshot, previous)
+        return snapshot
+
+    def reload(self, rasa_db: Dict[str, Any],
+               delegation_db: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+        """
+        Compile rasa_db (and delegation_db) and install it; returns the new
+        snapshot. Compiles under the writer lock, so a concurrent reload() or
+        update() cannot install a newer version in between.
+        """
+        with self._lock:
+            previous = self._current
+            snapshot = compile_snapshot(rasa_db, previous.table, delegation_db)
+            self._current = snapshot
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(snapshot, previous)
+        return snapshot
+
+
+if __name__ == "__main__":
+    from rasa_validator import PropagationScope, RASAValidator, create_rasa_auth, create_rasa_set
+
+    print("Compiled RASA Policy Snapshots")
+    print("=" * 70)
+
+    n_sets = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rasa_db = {}
+    for i in range(n_sets):
+        name = f"AS{64500 + i}:AS-CUSTOMERS"
+        rasa_db[name] = create_rasa_set(name, 64500 + i, list(range(i, i + 50)),
+                                        nested_sets=[f"AS{64500 + i}:AS-SUB{k}" for k in range(5)])
+    for asn in range(0, n_sets + 50, 2):
+        rasa_db[f"AS{asn}"] = create_rasa_auth(
+            asn=asn, authorized_in=[(f"AS{64500 + asn}:AS-CUSTOMERS", PropagationScope.UNRESTRICTED)])
+
+    start = time.perf_counter()
+    snapshot = compile_snapshot(rasa_db)
+    print(f"compile {len(rasa_db)} objects: {time.perf_counter() - start:.2f}s -> {snapshot.stats()}")
+
+    validator = RASAValidator(rasa_db, log="off")
+    irr_members = list(range(40, 80))
+    start = time.perf_counter()
+    for i in range(n_sets):
+        validator.expand_with_rasa(f"AS{64500 + i}:AS-CUSTOMERS", irr_members, [])
+    print(f"{n_sets} expansions against the snapshot: {time.perf_counter() - start:.2f}s")
+
+    # Readers keep going while a writer swaps in reloaded snapshots
+    holder = validator.snapshots
+    stop = threading.Event()
+    reads = [0]
+
+    def reader():
+        while not stop.is_set():
+            current = holder.current
+            assert current.rasa_set("AS64500:AS-CUSTOMERS") is not None
+            reads[0] += 1
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    start = time.perf_counter()
+    for _ in range(3):
+        validator.reload(rasa_db)
+    reload_time = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    print(f"3 reloads in {reload_time:.2f}s while a reader did {reads[0]} lock-free reads; "
+          f"now at version {holder.version}")
+
+    # Concurrent writers: reloads and updates serialize instead of racing install()
+    small_db = {f"AS{64500 + i}:AS-CUSTOMERS": rasa_db[f"AS{64500 + i}:AS-CUSTOMERS"]
+                for i in range(100)}
+    small_db["AS0"] = rasa_db["AS0"]
+    small = SnapshotHolder(compile_snapshot(small_db))
+    writers = [threading.Thread(target=lambda: [small.reload(small_db) for _ in range(20)]),
+               threading.Thread(target=lambda: [small.update({"AS0": small_db["AS0"]})
+                                                for _ in range(20)])]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert small.version >= 40 and small.current.rasa_set("AS64500:AS-CUSTOMERS") is not None
+    print(f"40 concurrent reloads/updates installed in order, now at version {small.version}")
@@ -7,10 +7,17 @@ Implements the core RASA verification algorithms from the specification.
 """
 
 from dataclasses import dataclass, field
-from typing import Set, List, Dict, Optional, Tuple, Any
+from typing import AbstractSet, Set, List, Dict, Optional, Tuple, Any, Callable, FrozenSet, Iterable
 from datetime import datetime
 from enum import Enum
 
+from asset_names import canonical_asset_name
+from decision_cache import CachedDecision, DecisionCache
+from decision_log import DecisionLog, make_log, reason_text
+from irr_fetcher import ASSET, split_members
+from rasa_index import AuthIndex, AuthReason
+from rasa_snapshot import RasaSnapshot, SnapshotHolder, compile_snapshot
+
 
 class PropagationScope(Enum):
     """Propagation scope for AS-SET inclusion."""
@@ -77,7 +84,11 @@ class DelegationToken:
 class RASAValidator:
     """RASA object validator implementing the specification algorithms."""
     
-    def __init__(self, rasa_db: Dict[str, Any], delegation_db: Optional[Dict[str, Any]] = None):
+    def __init__(self, rasa_db: Dict[str, Any], delegation_db: Optional[Dict[str, Any]] = None,
+                 log: Any = "ring",
+                 provider: Optional[Callable[[str], Optional[ASSET]]] = None,
+                 decision_cache: Optional[DecisionCache] = None,
+                 snapshot: Optional[RasaSnapshot] = None):
         """
         Initialize validator with RASA database.
         
@@ -85,10 +96,52 @@ class RASAValidator:
             rasa_db: Dictionary mapping AS-SET names to RasaSetContent and
                     ASN strings (e.g., "AS12345") to RasaAuthContent
             delegation_db: Optional delegation token database
+            log: Decision log: "off", "ring" (the last 10000 decisions),
+                 "columnar" or a decision_log.DecisionLog instance
+            provider: IRR data for nested AS-SETs (an irr_providers
+                      provider or any fetch_asset-like callable); without
+                      one, nested sets expand from RASA data only
+            decision_cache: Optional DecisionCache for repeated member
+                            checks; emptied on reload
+            snapshot: Already compiled RASA data to use instead of
+                      compiling rasa_db (e.g. a per-request validator)
         """
         self.rasa_db = rasa_db
         self.delegation_db = delegation_db or {}
-        self.log: List[Dict] = []
+        self.log: DecisionLog = make_log(log)
+        if snapshot is None:
+            snapshot = compile_snapshot(rasa_db, delegation_db=self.delegation_db)
+        self.snapshots = SnapshotHolder(snapshot)
+        self.provider = provider
+        self.decision_cache = decision_cache
+        if decision_cache is not None:
+            decision_cache.attach(self.snapshots)
+
+    @property
+    def snapshot(self) -> RasaSnapshot:
+        """The compiled RASA data checks currently run against."""
+        return self.snapshots.current
+
+    @property
+    def auth_index(self) -> AuthIndex:
+        return self.snapshots.current.auth
+
+    def reload(self, rasa_db: Optional[Dict[str, Any]] = None,
+               delegation_db: Optional[Dict[str, Any]] = None) -> RasaSnapshot:
+        """
+        Compile rasa_db and delegation_db (default: the current ones, e.g.
+        after in-place changes) and swap them in. Checks already running
+        finish on the snapshot they started with.
+        """
+        if rasa_db is not None:
+            self.rasa_db = rasa_db
+        if delegation_db is not None:
+            self.delegation_db = delegation_db
+        return self.snapshots.reload(self.rasa_db, self.delegation_db)
+
+    def rebuild_index(self) -> None:
+        """Re-index rasa_db after it was modified in place."""
+        self.reload()
     
     def check_member_auth(self, asn: int, asset_name: str) -> Tuple[bool, str]:
         """
@@ -99,48 +152,38 @@ class RASAValidator:
         Returns:
             (is_authorized, reason)
         """
-        auth_key = f"AS{asn}"
-        auth_obj = self.rasa_db.get(auth_key)
-        
-        if not auth_obj:
-            self.log.append({
-                "asn": asn,
-                "asset": asset_name,
-                "authorized": True,
-                "reason": "No RASA-AUTH (default allow)"
-            })
-            return True, "No RASA-AUTH (default allow)"
-        
-        # Check if asset is in authorizedIn list
-        for entry in auth_obj.authorizedIn:
-            if entry.asSetName == asset_name:
-                self.log.append({
-                    "asn": asn,
-                    "asset": asset_name,
-                    "authorized": True,
-                    "reason": f"Authorized ({entry.propagation.name})"
-                })
-                return True, f"Authorized ({entry.propagation.name})"
-        
-        # Not authorized
-        if auth_obj.flags.strictMode:
-            self.log.append({
-                "asn": asn,
-                "asset": asset_name,
-                "authorized": False,
-                "reason": "REJECTED: strictMode=TRUE, not authorized",
-                "severity": "security_event"
-            })
-            return False, "REJECTED: strictMode=TRUE, not authorized"
+        snapshot = self.snapshots.current
+        return self._check_member(snapshot, asn, asset_name, snapshot.auth.set_id(asset_name))
+    
+    def _check_member(self, snapshot: RasaSnapshot, asn: int, asset_name: str,
+                      set_id: int) -> Tuple[bool, str]:
+        cache = self.decision_cache
+        if cache is not None:
+            cached = cache.get(asn, set_id, snapshot.version)
+            if cached is not None:
+                if self.log.enabled:
+                    self.log.member(asn, asset_name, cached.reason, cached.direct_only)
+                return cached.authorized, cached.reason_text
+        
+        decision = snapshot.auth.member(asn, set_id)
+        reason = AuthReason.of(decision)
+        if self.log.enabled:
+            self.log.member(asn, asset_name, reason, decision.direct_only)
+        text = reason_text(reason, decision.direct_only)
+        if cache is not None:
+            cache.put(asn, set_id, snapshot.version,
+                      CachedDecision(decision.authorized, text, reason, decision.direct_only))
+        return decision.authorized, text
+    
+    def check_members_auth(self, asns: Any, asset_name: str) -> Any:
+        """
+        Vectorized check_member_auth for a whole closure (requires NumPy).
         
-        self.log.append({
-            "asn": asn,
-            "asset": asset_name,
-            "authorized": False,
-            "reason": "REJECTED: not in authorizedIn",
-            "severity": "warning"
-        })
-        return False, "REJECTED: not in authorizedIn"
+        Returns a rasa_batch.BatchAuthResult with a boolean mask, AuthReason
+        codes and propagation per ASN. Nothing is appended to the log.
+        """
+        from rasa_batch import check_members_auth
+        return check_members_auth(self.auth_index, asns, asset_name)
     
     def check_asset_set_auth(self, nested_set: str, parent_set: str) -> Tuple[bool, str]:
         """
@@ -151,59 +194,23 @@ class RASAValidator:
         Returns:
             (is_authorized, reason)
         """
-        auth_key = nested_set
-        auth_obj = self.rasa_db.get(auth_key)
-        
-        if not auth_obj:
-            self.log.append({
-                "nested_set": nested_set,
-                "parent_set": parent_set,
-                "authorized": True,
-                "reason": "No RASA-AUTH (default allow)"
-            })
-            return True, "No RASA-AUTH (default allow)"
-        
-        # Check if this is a RasaAuthContent object (has authorizedIn)
-        if not hasattr(auth_obj, 'authorizedIn'):
-            # This is a RasaSetContent, not RasaAuthContent - default allow
-            self.log.append({
-                "nested_set": nested_set,
-                "parent_set": parent_set,
-                "authorized": True,
-                "reason": "No RASA-AUTH for AS-SET (default allow)"
-            })
-            return True, "No RASA-AUTH for AS-SET (default allow)"
-        
-        # Check if parent is in authorizedIn list
-        for entry in auth_obj.authorizedIn:
-            if entry.asSetName == parent_set:
-                self.log.append({
-                    "nested_set": nested_set,
-                    "parent_set": parent_set,
-                    "authorized": True,
-                    "reason": f"Authorized ({entry.propagation.name})"
-                })
-                return True, f"Authorized ({entry.propagation.name})"
-        
-        # Not authorized
-        if auth_obj.flags.strictMode:
-            self.log.append({
-                "nested_set": nested_set,
-                "parent_set": parent_set,
-                "authorized": False,
-                "reason": "REJECTED: strictMode=TRUE, not authorized",
-                "severity": "security_event"
-            })
-            return False, "REJECTED: strictMode=TRUE, not authorized"
-        
-        self.log.append({
-            "nested_set": nested_set,
-            "parent_set": parent_set,
-            "authorized": False,
-            "reason": "REJECTED: not in authorizedIn",
-            "severity": "warning"
-        })
-        return False, "REJECTED: not in authorizedIn"
+        index = self.auth_index
+        return self._check_nested(index, nested_set, parent_set,
+                                  index.set_id(nested_set), index.set_id(parent_set))
+    
+    def _check_nested(self, index: AuthIndex, nested_set: str, parent_set: str,
+                      set_id: int, parent_id: int) -> Tuple[bool, str]:
+        if index.is_rasa_set(set_id) and set_id not in index.sets:
+            # The key holds a RasaSetContent, not RasaAuthContent - default allow
+            if self.log.enabled:
+                self.log.nested(nested_set, parent_set, AuthReason.NO_AUTH, rasa_set=True)
+            return True, reason_text(AuthReason.NO_AUTH, rasa_set=True)
+        
+        decision = index.nested(set_id, parent_id)
+        reason = AuthReason.of(decision)
+        if self.log.enabled:
+            self.log.nested(nested_set, parent_set, reason, decision.direct_only)
+        return decision.authorized, reason_text(reason, decision.direct_only)
     
     def validate_delegation(self, rasa_obj: Any, signer_id: str) -> Tuple[bool, str]:
         """
@@ -214,31 +221,24 @@ class RASAValidator:
         Returns:
             (is_valid, reason)
         """
-        # Get the containing AS from the object
-        if isinstance(rasa_obj, RasaSetContent):
-            containing_as = rasa_obj.containingAS
-        elif isinstance(rasa_obj, RasaAuthContent):
-            containing_as = rasa_obj.authorizedAS
-        else:
+        containing_as = _containing_as(rasa_obj)
+        if containing_as is None:
             return False, "Unknown RASA object type"
-        
-        # Check if signer matches containing AS
-        if signer_id == f"AS{containing_as}":
-            return True, "Directly published by AS-SET owner"
-        
-        # Check for delegation token
-        token_key = f"{containing_as}:{signer_id}"
-        token = self.delegation_db.get(token_key)
-        
-        if not token:
-            return False, f"No delegation token found for {signer_id} to publish for AS{containing_as}"
-        
-        # Check token validity
-        now = datetime.utcnow().isoformat()
-        if now < token.notBefore or now > token.notAfter:
-            return False, "Delegation token expired"
-        
-        return True, f"Valid delegation from AS{containing_as} to {signer_id}"
+        return self.snapshots.current.delegations.check(containing_as, signer_id)
+    
+    def validate_delegations(self, objects: Iterable[Tuple[Any, str]],
+                             when: Optional[float] = None) -> List[Tuple[bool, str]]:
+        """
+        validate_delegation for every (rasa_obj, signer_id) pair, in one pass
+        against one clock reading (epoch seconds, default now).
+        """
+        delegations = self.snapshots.current.delegations
+        return delegations.check_many(((_containing_as(obj), signer_id)
+                                       for obj, signer_id in objects), when)
+    
+    def _action(self, action: str, subject: str, other: Optional[str] = None) -> None:
+        if self.log.enabled:
+            self.log.action(action, subject, other)
     
     def get_peer_lock_sets(self, asn: int) -> List[str]:
         """
@@ -246,125 +246,179 @@ class RASAValidator:
         
         These are the AS-SETs that should only accept routes from direct sessions.
         """
-        auth_key = f"AS{asn}"
-        auth_obj = self.rasa_db.get(auth_key)
-        
-        if not auth_obj:
-            return []
-        
-        peer_lock_sets = []
-        for entry in auth_obj.authorizedIn:
-            if entry.propagation == PropagationScope.DIRECT_ONLY:
-                peer_lock_sets.append(entry.asSetName)
-        
-        return peer_lock_sets
+        return self.snapshots.current.peer_locks.lock_sets(asn)
+    
+    def get_peer_lock_lists(self, asns: Optional[Iterable[int]] = None) -> Dict[int, List[str]]:
+        """get_peer_lock_sets for many ASNs (default: every ASN with a directOnly entry)."""
+        return self.snapshots.current.peer_locks.lock_lists(asns)
+    
+    def peer_lock_lists(self, asset_name: str, peers: Iterable[int]) -> Dict[int, List[int]]:
+        """
+        For each peer, the ASNs that marked asset_name directOnly and must be
+        rejected on that peer's session (see peer_lock_index).
+        """
+        return self.snapshots.current.peer_locks.peer_lock_lists(asset_name, peers)
+    
+    def expand(self, asset_name: str, max_depth: int = 10) -> Tuple[Set[int], DecisionLog]:
+        """Fetch asset_name from the provider and expand it with expand_with_rasa."""
+        authorized_asns, _ = self._expand(self.snapshots.current, asset_name, None, None,
+                                          max_depth, set(), {})
+        return set(authorized_asns), self.log
+    
+    def expand_many(self, asset_names: Iterable[str], max_depth: int = 10) -> Dict[str, Set[int]]:
+        """
+        Expand several roots (e.g. one per peer policy) sharing one memo, so
+        nested AS-SETs they have in common are validated once. Each root
+        gets its own copy of its closure.
+        """
+        snapshot = self.snapshots.current
+        memo: Dict[Tuple[str, int], FrozenSet[int]] = {}
+        return {name: set(self._expand(snapshot, name, None, None, max_depth, set(), memo)[0])
+                for name in asset_names}
+    
+    def _irr_data(self, snapshot: RasaSnapshot, asset_name: str) -> Tuple[List[int], List[str]]:
+        """IRR (asns, nested) for an AS-SET; not queried for authoritative RASA-SETs."""
+        rasa_set = snapshot.rasa_set(asset_name)
+        if self.provider is None or (rasa_set is not None and rasa_set.authoritative):
+            return [], []
+        asset = self.provider(asset_name)
+        return split_members(asset) if asset else ([], [])
     
     def expand_with_rasa(self, asset_name: str, irr_members: List[int], 
                         irr_nested: List[str], max_depth: int = 10,
-                        seen: Optional[Set[str]] = None) -> Tuple[Set[int], List[Dict]]:
+                        seen: Optional[Set[str]] = None,
+                        memo: Optional[Dict[Tuple[str, int], FrozenSet[int]]] = None
+                        ) -> Tuple[Set[int], DecisionLog]:
         """
         Expand AS-SET with RASA authorization.
         
         Implements the AS-SET expansion algorithm from Section 5.3.
+        Authorized nested AS-SETs are expanded recursively with IRR data
+        from self.provider.
+        
+        Each nested AS-SET's authorized closure depends only on the set
+        itself and the remaining depth (its members are checked against
+        it, and the parent only decides whether to descend), so closures
+        are memoized per (canonical AS-SET name, remaining depth) for the call, or
+        across calls that pass the same memo dict.
         
         Args:
             asset_name: Name of the AS-SET to expand
             irr_members: List of member ASNs from IRR
             irr_nested: List of nested AS-SETs from IRR
             max_depth: Maximum recursion depth
-            seen: Set of already-seen AS-SETs (for circular detection)
+            seen: AS-SETs on the current expansion path (for circular detection)
+            memo: Closures already computed, shared between calls
             
         Returns:
-            (authorized_asns, log_entries)
+            (authorized_asns, self.log)
+        """
+        snapshot = self.snapshots.current
+        authorized_asns, _ = self._expand(snapshot, asset_name, irr_members, irr_nested,
+                                          max_depth, seen if seen is not None else set(),
+                                          memo if memo is not None else {})
+        return authorized_asns, self.log
+    
+    def _expand(self, snapshot: RasaSnapshot, asset_name: str,
+                irr_members: Optional[Iterable[int]], irr_nested: Optional[Iterable[str]],
+                max_depth: int, seen: Set[str],
+                memo: Dict[Tuple[str, int], FrozenSet[int]]
+                ) -> Tuple[AbstractSet[int], FrozenSet[str]]:
+        """
+        Without IRR data (None), the set is looked up in memo or fetched
+        from the provider.
+        
+        Returns (authorized_asns, cut): cut holds the ancestors skipped as
+        circular references below this set, which make the result depend
+        on the path, so it is only memoized when cut is empty. Memoized
+        closures are frozen copies: a memo hit returns a frozenset that is
+        shared with every later hit, never a set a caller could mutate.
         """
-        if seen is None:
-            seen = set()
+        index = snapshot.auth
+        # Not registered: asset_name may come from a request
+        name = index.table.lookup(asset_name) or canonical_asset_name(asset_name)
         
         # Circular reference detection
-        if asset_name in seen:
-            self.log.append({
-                "action": "circular_reference",
-                "asset": asset_name,
-                "message": "Circular reference detected, skipping"
-            })
-            return set(), self.log
+        if name in seen:
+            self._action("circular_reference", asset_name)
+            return set(), frozenset((name,))
         
         if max_depth <= 0:
-            self.log.append({
-                "action": "max_depth",
-                "asset": asset_name,
-                "message": "Maximum depth reached"
-            })
-            return set(), self.log
+            self._action("max_depth", asset_name)
+            return set(), frozenset()
         
-        seen.add(asset_name)
+        set_id = index.set_id(name)
+        if irr_members is None:
+            closure = memo.get((name, max_depth))
+            if closure is not None:
+                self._action("reuse_closure", asset_name)
+                return closure, frozenset()
+            irr_members, irr_nested = self._irr_data(snapshot, name)
+        
+        seen.add(name)
         
         # Check for RASA-SET
-        rasa_set = self.rasa_db.get(asset_name)
-        if rasa_set and isinstance(rasa_set, RasaSetContent):
-            if rasa_set.flags.authoritative:
+        rasa_set = snapshot.sets.get(set_id)
+        if rasa_set is not None:
+            if rasa_set.authoritative:
                 # Use only RASA data, ignore IRR
-                self.log.append({
-                    "action": "authoritative_rasa",
-                    "asset": asset_name,
-                    "message": "Using authoritative RASA-SET, ignoring IRR"
-                })
+                self._action("authoritative_rasa", asset_name)
                 members = rasa_set.members
-                nested_sets = rasa_set.nestedSets
+                nested_sets = rasa_set.nested_names
             else:
                 # Merge RASA with IRR
-                self.log.append({
-                    "action": "merge_rasa",
-                    "asset": asset_name,
-                    "message": "Merging RASA-SET with IRR data"
-                })
-                members = list(set(irr_members) | set(rasa_set.members))
-                nested_sets = list(set(irr_nested) | set(rasa_set.nestedSets))
+                self._action("merge_rasa", asset_name)
+                members = rasa_set.merged_members(irr_members)
+                nested_sets = rasa_set.merged_nested(irr_nested)
         else:
             # No RASA, use IRR
-            self.log.append({
-                "action": "irr_only",
-                "asset": asset_name,
-                "message": "No RASA-SET found, using IRR data"
-            })
+            self._action("irr_only", asset_name)
             members = irr_members
             nested_sets = irr_nested
         
         # Filter members based on RASA-AUTH
         authorized_asns = set()
         for asn in members:
-            is_auth, reason = self.check_member_auth(asn, asset_name)
+            is_auth, reason = self._check_member(snapshot, asn, asset_name, set_id)
             if is_auth:
                 authorized_asns.add(asn)
         
         # Process nested AS-SETs
+        cut: FrozenSet[str] = frozenset()
         for nested_set in nested_sets:
             # Check if nested set is authorized
-            is_auth, reason = self.check_asset_set_auth(nested_set, asset_name)
+            nested_id = index.set_id(nested_set)
+            is_auth, reason = self._check_nested(index, nested_set, asset_name, nested_id, set_id)
             
             if not is_auth:
                 continue
             
             # Check doNotInherit flag
-            if rasa_set and isinstance(rasa_set, RasaSetContent) and rasa_set.flags.doNotInherit:
-                self.log.append({
-                    "action": "do_not_inherit",
-                    "nested_set": nested_set,
-                    "message": "doNotInherit set, including reference only"
-                })
+            if rasa_set is not None and rasa_set.do_not_inherit:
+                self._action("do_not_inherit", nested_set)
                 # Don't expand, just include the reference
                 continue
             
-            # Recursively expand nested set
-            # In real implementation, would fetch IRR data for nested set
-            # For POC, we assume nested sets have no further members
-            self.log.append({
-                "action": "expand_nested",
-                "nested_set": nested_set,
-                "parent": asset_name
-            })
-        
-        return authorized_asns, self.log
+            self._action("expand_nested", nested_set, asset_name)
+            closure, nested_cut = self._expand(snapshot, nested_set, None, None,
+                                               max_depth - 1, seen, memo)
+            authorized_asns |= closure
+            cut |= nested_cut
+        
+        seen.discard(name)
+        cut -= {name}
+        if not cut:
+            memo[(name, max_depth)] = frozenset(authorized_asns)
+        return authorized_asns, cut
+
+
+def _containing_as(rasa_obj: Any) -> Optional[int]:
+    """Containing AS of a RASA-SET or RASA-AUTH, None for other objects."""
+    if isinstance(rasa_obj, RasaSetContent):
+        return rasa_obj.containingAS
+    if isinstance(rasa_obj, RasaAuthContent):
+        return rasa_obj.authorizedAS
+    return None
 
 
 def create_rasa_set(name: str, containing_as: int, members: List[int],
@@ -438,3 +492,12 @@ if __name__ == "__main__":
     print("\nValidation log:")
     for entry in validator.log:
         print(f"  {entry}")
+    
+    # A shared memo keeps frozen copies, so callers may mutate their results
+    memo: Dict[Tuple[str, int], FrozenSet[int]] = {}
+    first, _ = validator.expand_with_rasa("AS2914:AS-GLOBAL", [], [], memo=memo)
+    first.add(65000)
+    assert all(65000 not in closure for closure in memo.values())
+    second, _ = validator.expand("AS2914:AS-GLOBAL")
+    assert isinstance(second, set) and 65000 not in second
+    print(f"\nTest 2: memoized closure of AS2914:AS-GLOBAL unchanged by callers: {sorted(second)}")
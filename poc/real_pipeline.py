@@ -5,11 +5,19 @@ Fetches actual AS-SETs and generates real JunOS configs.
 """
 
 import subprocess
-import re
 import sys
 from typing import Set, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+from asn_set import sorted_asns
+from asset_names import canonical_asset_name
+from irr_fetcher import iter_members
+from rasa_batch import (
+    PROPAGATION_DIRECT_ONLY, PROPAGATION_NONE, PROPAGATION_UNRESTRICTED,
+    authorize_closure, decision_key,
+)
+from rasa_index import AuthIndex, AuthReason
+
 
 @dataclass
 class ASSET:
@@ -71,11 +79,6 @@ def parse_members(member_str: str) -> List[str]:
     return members
 
 
-def is_asn(member: str) -> bool:
-    """Check if member is an ASN (AS12345) not an AS-SET."""
-    return bool(re.match(r'^AS\d+$', member))
-
-
 def expand_asset(asset_name: str, max_depth: int = 5, 
                 seen: Set[str] = None) -> Tuple[Set[int], Set[str], List[dict]]:
     """
@@ -84,6 +87,8 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     """
     if seen is None:
         seen = set()
+        # Nested names come back canonical; compare the root the same way
+        asset_name = canonical_asset_name(asset_name)
     
     if asset_name in seen:
         return set(), set(), [{"asset": asset_name, "action": "circular_skip"}]
@@ -101,10 +106,10 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     nested_sets = set()
     log = [{"asset": asset_name, "source": asset.source, "action": "expanded"}]
     
-    for member in asset.members:
-        if is_asn(member):
-            asns.add(int(member[2:]))
-        elif member.startswith('AS'):
+    for kind, member in iter_members(asset):
+        if kind == "asn":
+            asns.add(member)
+        else:
             nested_sets.add(member)
             # Recursively expand
             sub_asns, sub_sets, sub_log = expand_asset(member, max_depth - 1, seen)
@@ -115,33 +120,33 @@ def expand_asset(asset_name: str, max_depth: int = 5,
     return asns, nested_sets, log
 
 
+# (AuthReason, propagation) -> (is_authorized, reason)
+_REASONS = {
+    (AuthReason.NO_AUTH, PROPAGATION_NONE): (True, "No RASA (allow)"),
+    (AuthReason.AUTHORIZED, PROPAGATION_UNRESTRICTED): (True, "Authorized (unrestricted)"),
+    (AuthReason.AUTHORIZED, PROPAGATION_DIRECT_ONLY): (True, "Authorized (directOnly)"),
+    (AuthReason.REJECTED_NOT_LISTED, PROPAGATION_NONE): (False, "REJECTED (not authorized)"),
+    (AuthReason.REJECTED_STRICT, PROPAGATION_NONE): (False, "REJECTED (strictMode)"),
+}
+
+
 class RASAFilter:
     def __init__(self, rasa_db: Dict):
         self.rasa_db = rasa_db
+        self.auth_index = AuthIndex.from_rasa_db(rasa_db)
     
     def check_auth(self, asn: int, asset: str) -> Tuple[bool, str]:
-        key = f"AS{asn}"
-        auth = self.rasa_db.get(key)
-        
-        if not auth:
-            return True, "No RASA (allow)"
-        
-        for entry in auth.get("authorizedIn", []):
-            if entry.get("asSetName") == asset:
-                return True, f"Authorized ({entry.get('propagation', 'unrestricted')})"
-        
-        if auth.get("strictMode"):
-            return False, "REJECTED (strictMode)"
-        
-        return False, "REJECTED (not authorized)"
+        decision = self.auth_index.member(asn, self.auth_index.set_id(asset))
+        return _REASONS[decision_key(decision)]
     
     def filter_asns(self, asset: str, asns: Set[int]) -> Tuple[Set[int], List[dict]]:
         authorized = set()
         log = []
         
-        for asn in sorted(asns):
-            is_auth, reason = self.check_auth(asn, asset)
-            log.append({"asn": asn, "authorized": is_auth, "reason": reason})
+        # The whole closure in one batch check (vectorized with NumPy)
+        for asn, reason, propagation in authorize_closure(self.auth_index, asns, asset):
+            is_auth, text = _REASONS[reason, propagation]
+            log.append({"asn": asn, "authorized": is_auth, "reason": text})
             if is_auth:
                 authorized.add(asn)
         
@@ -153,7 +158,7 @@ def generate_junos_as_path(asns: Set[int], name: str) -> str:
         return f"as-path-group {name} {{\n    as-path {name}-empty \"^$\";\n}}"
     
     lines = [f"as-path-group {name} {{"]
-    for asn in sorted(asns):
+    for asn in sorted_asns(asns):
         lines.append(f'    as-path {name}-{asn} ".* {asn} .*";')
     lines.append("}")
     return "\n".join(lines)
@@ -162,7 +167,7 @@ def generate_junos_as_path(asns: Set[int], name: str) -> str:
 def generate_junos_peer_filter(peer_asn: int, allowed_asns: Set[int]) -> str:
     """Generate JunOS policy-statement for a peer."""
     name = f"AS{peer_asn}"
-    as_list = sorted(allowed_asns)
+    as_list = sorted_asns(allowed_asns)
     
     lines = [
         f"policy-statement {name}-in {{",
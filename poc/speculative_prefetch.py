@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Speculative Prefetch of Nested AS-SETs
+
+An expander only learns about a nested AS-SET after fetching its parent,
+so a deep AS-SET costs one round trip per level even with parallel
+fetches. AS-SET structures barely change between runs, though: the
+previous snapshot's graph already says which nested sets the root will
+need.
+
+SpeculativeFetcher wraps a fetch function. start(root) immediately
+submits fetches for the AS-SETs reachable from root in the previous graph
+(shallowest first, up to a budget) to a thread pool. The expander then
+calls the wrapper as its fetch= argument: prefetched objects are served
+from the pool, everything else is fetched on demand. finish() cancels
+prefetches that were never needed and reports precision, recall and the
+latency saved.
+
+Works with expand_asset(), iter_expand_asset(), plan_fetches() and
+expand_assets_batch(); anything that takes a fetch= callable.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from asset_graph import ASSetGraph
+from asset_names import canonical_asset_name
+from irr_fetcher import ASSET, expand_asset, fetch_asset
+
+
+Fetcher = Callable[[str], Optional[ASSET]]
+
+
+@dataclass
+class PrefetchStats:
+    """Outcome of one speculative prefetch run."""
+    prefetched: int = 0
+    used: int = 0
+    demanded: int = 0
+    wasted: int = 0
+    cancelled: int = 0
+    latency_saved_seconds: float = 0.0
+
+    @property
+    def precision(self) -> float:
+        """Share of prefetched objects the expander actually asked for."""
+        return self.used / self.prefetched if self.prefetched else 0.0
+
+    @property
+    def recall(self) -> float:
+        """Share of the expander's nested-set fetches that were prefetched."""
+        return self.used / self.demanded if self.demanded else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "prefetched": self.prefetched,
+            "used": self.used,
+            "demanded": self.demanded,
+            "wasted": self.wasted,
+            "cancelled": self.cancelled,
+            "precision": round(self.precision, 3),
+            "recall": round(self.recall, 3),
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+        }
+
+
+def predicted_fetches(previous: ASSetGraph, roots: Iterable[str],
+                      max_depth: int = 5, budget: int = 500) -> List[str]:
+    """
+    AS-SETs the previous graph says will be fetched, shallowest first.
+
+    Uses the expanders' depth rule (fetched while depth < max_depth) and
+    excludes the roots themselves, which are fetched anyway.
+    """
+    roots = [canonical_asset_name(root) for root in roots]
+    depths = {root: 0 for root in roots}
+    frontier = deque(roots)
+    predicted = []
+    while frontier and len(predicted) < budget:
+        name = frontier.popleft()
+        depth = depths[name]
+        if depth:
+            predicted.append(name)
+        if depth + 1 >= max_depth:
+            continue
+        for child in sorted(previous.children.get(name, ())):
+            if child not in depths:
+                depths[child] = depth + 1
+                frontier.append(child)
+    return predicted[:budget]
+
+
+class SpeculativeFetcher:
+    """fetch= wrapper that serves nested AS-SETs prefetched from the previous graph."""
+
+    def __init__(self, previous: ASSetGraph, fetch: Fetcher = fetch_asset,
+                 max_depth: int = 5, budget: int = 500, workers: int = 8):
+        self.previous = previous
+        self.fetch = fetch
+        self.max_depth = max_depth
+        self.budget = budget
+        self.stats = PrefetchStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures: Dict[str, Future] = {}
+        self._durations: Dict[str, float] = {}
+        self._used: Set[str] = set()
+        self._roots: Set[str] = set()
+        self._demanded: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SpeculativeFetcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.finish()
+
+    def start(self, *roots: str) -> int:
+        """Submit prefetches for the roots; returns how many were submitted."""
+        self._roots.update(canonical_asset_name(root) for root in roots)
+        submitted = 0
+        remaining = self.budget - len(self._futures)
+        for name in predicted_fetches(self.previous, roots, self.max_depth, remaining):
+            if name not in self._futures:
+                self._futures[name] = self._executor.submit(self._timed_fetch, name)
+                submitted += 1
+        self.stats.prefetched += submitted
+        return submitted
+
+    def _timed_fetch(self, name: str) -> Optional[ASSET]:
+        start = time.perf_counter()
+        try:
+            return self.fetch(name)
+        finally:
+            self._durations[name] = time.perf_counter() - start
+
+    def __call__(self, name: str) -> Optional[ASSET]:
+        name = canonical_asset_name(name)
+        with self._lock:
+            if name not in self._roots and name not in self._demanded:
+                self._demanded.add(name)
+                self.stats.demanded += 1
+            future = self._futures.get(name)
+            first_use = future is not None and name not in self._used
+            if first_use:
+                self._used.add(name)
+        if future is None:
+            return self.fetch(name)
+
+        start = time.perf_counter()
+        asset = future.result()
+        if first_use:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.stats.used += 1
+                self.stats.latency_saved_seconds += max(self._durations[name] - waited, 0.0)
+        return asset
+
+    def finish(self) -> PrefetchStats:
+        """Cancel unused prefetches, shut the pool down and return the stats."""
+        for name, future in self._futures.items():
+            if name in self._used:
+                continue
+            if future.cancel():
+                self.stats.cancelled += 1
+            else:
+                self.stats.wasted += 1
+        self._executor.shutdown(wait=True)
+        return self.stats
+
+
+def expand_with_prefetch(asset_name: str, previous: ASSetGraph, max_depth: int = 5,
+                         fetch: Fetcher = fetch_asset, budget: int = 500,
+                         workers: int = 8) -> Tuple[Tuple, PrefetchStats]:
+    """expand_asset(mode="bfs") with speculative prefetch; returns (result, stats)."""
+    with SpeculativeFetcher(previous, fetch, max_depth, budget, workers) as fetcher:
+        fetcher.start(asset_name)
+        result = expand_asset(asset_name, max_depth, mode="bfs", fetch=fetcher)
+    return result, fetcher.stats
+
+
+if __name__ == "__main__":
+    import random
+
+    from synthetic_registry import registry_fetcher, synthetic_registry
+
+    print("Speculative Prefetch of Nested AS-SETs")
+    print("=" * 70)
+
+    # Last run's snapshot, then 2% of objects change their nested sets
+    registry = synthetic_registry(3000)
+    previous = ASSetGraph.from_objects(registry.values())
+    rng = random.Random(3)
+    for name in rng.sample(sorted(registry), 60):
+        asset = registry[name]
+        members = [m for m in asset.members if not m.startswith("AS-")]
+        members.append(f"AS-SYN{rng.randrange(len(registry))}")
+        registry[name] = ASSET(name, members, asset.source)
+
+    lookup = registry_fetcher(registry)
+
+    def slow_fetch(name: str) -> Optional[ASSET]:
+        time.sleep(0.005)  # 5 ms round trip
+        return lookup(name)
+
+    for root in ("AS-SYN371", "AS-SYN119", "AS-SYN182"):
+        start = time.perf_counter()
+        plain = expand_asset(root, 5, mode="bfs", fetch=slow_fetch)
+        plain_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result, stats = expand_with_prefetch(root, previous, 5, fetch=slow_fetch)
+        prefetch_time = time.perf_counter() - start
+
+        assert result[0] == plain[0]
+        print(f"\n{root}: {len(plain[0])} ASNs")
+        print(f"  on-demand fetches:  {plain_time * 1000:6.1f} ms")
+        print(f"  with prefetch:      {prefetch_time * 1000:6.1f} ms")
+        print(f"  precision {stats.precision:.2f}, recall {stats.recall:.2f}, "
+              f"{stats.prefetched} prefetched, {stats.wasted + stats.cancelled} discarded, "
+              f"latency saved {stats.latency_saved_seconds * 1000:.1f} ms")
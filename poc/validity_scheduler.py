@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+RASA Validity-Window Scheduler
+
+Every RASA-SET, RASA-AUTH and delegation token carries notBefore and
+notAfter, but nothing acted on them: an object stayed in effect until the
+next full reload, however long ago it expired, and one that becomes valid
+tomorrow was either used early or ignored.
+
+ValidityScheduler parses every window once and keeps a min-heap of the
+upcoming boundaries (activation at notBefore, expiry just after
+notAfter). advance(now) pops only the boundaries that have passed, so the
+cost is proportional to the number of changes, not to the number of
+objects. The scheduler keeps the currently valid subset of each database
+(active_rasa_db / active_delegation_db) and reports every change as a
+ValidityEvent to its listeners. attach(validator) compiles the
+validator's snapshot from the active subsets once and then applies each
+batch of events with update_snapshot(), which compiles only the objects
+that changed (a full recompile costs O(objects) per boundary), and hands
+affected(events) - the AS-SETs and members whose filters need
+regenerating - to a re-filter callback.
+
+next_change() is the earliest time at which any generated configuration
+can become invalid. run() sleeps until each boundary and advances exactly
+then; a lock lets add() and remove() be called from other threads
+meanwhile (they wake run() to recompute its deadline), and listeners
+receive the batches in order.
+"""
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from delegation_index import INVALID_WINDOW, parse_time
+
+
+RASA = "rasa"
+DELEGATION = "delegation"
+
+ACTIVATE = "activate"
+EXPIRE = "expire"
+
+
+class ValidityEvent(NamedTuple):
+    when: float
+    kind: str       # ACTIVATE or EXPIRE
+    source: str     # RASA or DELEGATION
+    key: str        # rasa_db / delegation_db key
+    obj: Any
+
+
+def _field(obj: Any, field: str) -> Any:
+    """A field of a dict-shaped object or a dataclass; None if absent."""
+    if isinstance(obj, dict):
+        return obj.get(field)
+    return getattr(obj, field, None)
+
+
+def validity_window(obj: Any) -> Tuple[float, float]:
+    """
+    (not_before, not_after) epoch seconds for any RASA object or token;
+    INVALID_WINDOW (never valid) if either bound does not parse.
+    """
+    not_before = _field(obj, "notBefore") or _field(obj, "not_before")
+    not_after = _field(obj, "notAfter") or _field(obj, "not_after")
+    try:
+        return parse_time(not_before, float("-inf")), parse_time(not_after, float("inf"))
+    except ValueError:
+        return INVALID_WINDOW
+
+
+class ValidityScheduler:
+    """Activates and expires RASA objects at their validity boundaries."""
+
+    def __init__(self, rasa_db: Optional[Dict[str, Any]] = None,
+                 delegation_db: Optional[Dict[str, Any]] = None,
+                 now: Optional[float] = None):
+        self.now = time.time() if now is None else now
+        self.active: Dict[str, Dict[str, Any]] = {RASA: {}, DELEGATION: {}}
+        # (source, key) -> (obj, generation); heap entries of older
+        # generations are stale and skipped
+        self._objects: Dict[Tuple[str, str], Tuple[Any, int]] = {}
+        self._heap: List[Tuple[float, int, int, str, str, int]] = []
+        self._generations = itertools.count()
+        self._sequence = itertools.count()
+        self._listeners: List[Callable[[List[ValidityEvent]], None]] = []
+        # Guards the heap, the objects and the active subsets
+        self._lock = threading.RLock()
+        # Notified when the heap changes, so run() recomputes its deadline
+        self._changed = threading.Condition(self._lock)
+        for key, obj in (rasa_db or {}).items():
+            self.add(RASA, key, obj)
+        for key, token in (delegation_db or {}).items():
+            self.add(DELEGATION, key, token)
+
+    @property
+    def active_rasa_db(self) -> Dict[str, Any]:
+        return self.active[RASA]
+
+    @property
+    def active_delegation_db(self) -> Dict[str, Any]:
+        return self.active[DELEGATION]
+
+    def _push(self, when: float, kind: str, source: str, key: str, generation: int) -> None:
+        # At equal times expiries sort before activations (replacements)
+        priority = 0 if kind == EXPIRE else 1
+        heapq.heappush(self._heap, (when, priority, next(self._sequence), source, key, generation))
+
+    def add(self, source: str, key: str, obj: Any) -> None:
+        """
+        Load or replace an object; it is active now if within its window.
+        Listeners hear of the change if the active subset changed.
+        """
+        not_before, not_after = validity_window(obj)
+        with self._lock:
+            generation = next(self._generations)
+            self._objects[(source, key)] = (obj, generation)
+            active = self.active[source]
+            if not_before <= self.now <= not_after:
+                active[key] = obj
+                event = ValidityEvent(self.now, ACTIVATE, source, key, obj)
+            else:
+                previous = active.pop(key, None)
+                event = ValidityEvent(self.now, EXPIRE, source, key, previous) if previous else None
+            if self.now < not_before != float("inf"):
+                self._push(not_before, ACTIVATE, source, key, generation)
+            if not_after >= self.now and not_after != float("inf"):
+                self._push(not_after, EXPIRE, source, key, generation)
+            if event is not None:
+                self._notify([event])
+            self._changed.notify_all()
+
+    def remove(self, source: str, key: str) -> None:
+        with self._lock:
+            self._objects.pop((source, key), None)
+            obj = self.active[source].pop(key, None)
+            if obj is not None:
+                self._notify([ValidityEvent(self.now, EXPIRE, source, key, obj)])
+            self._changed.notify_all()
+
+    def wake(self) -> None:
+        """Make run() recompute its deadline and check its stop event."""
+        with self._lock:
+            self._changed.notify_all()
+
+    def advance(self, now: Optional[float] = None) -> List[ValidityEvent]:
+        """Apply every boundary up to now; notify listeners of the changes."""
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            self.now = max(self.now, now)
+            heap = self._heap
+            while heap and (heap[0][0] < now or (heap[0][0] == now and heap[0][1] == 1)):
+                when, priority, _, source, key, generation = heapq.heappop(heap)
+                current = self._objects.get((source, key))
+                if current is None or current[1] != generation:
+                    continue
+                obj = current[0]
+                if priority:
+                    self.active[source][key] = obj
+                    events.append(ValidityEvent(when, ACTIVATE, source, key, obj))
+                elif self.active[source].pop(key, None) is not None:
+                    events.append(ValidityEvent(when, EXPIRE, source, key, obj))
+            if events:
+                self._notify(events)
+        return events
+
+    def _notify(self, events: List[ValidityEvent]) -> None:
+        # Under the lock, so listeners see batches in the order they happened
+        for listener in self._listeners:
+            listener(events)
+
+    def next_change(self) -> Optional[float]:
+        """Earliest upcoming boundary (when current configs stop being valid)."""
+        with self._lock:
+            heap = self._heap
+            while heap:
+                _, _, _, source, key, generation = heap[0]
+                current = self._objects.get((source, key))
+                if current is not None and current[1] == generation:
+                    return heap[0][0]
+                heapq.heappop(heap)
+        return None
+
+    def subscribe(self, listener: Callable[[List[ValidityEvent]], None]) -> None:
+        """
+        Call listener(events) after each change. Listeners run under the
+        scheduler's (reentrant) lock, in order, so they may call add().
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def attach(self, validator: Any,
+               refilter: Optional[Callable[["Affected"], None]] = None) -> None:
+        """
+        Compile validator from the active objects now, then apply every
+        batch of events to its snapshot incrementally and pass
+        affected(events) to refilter.
+        """
+        def apply(events: List[ValidityEvent]) -> None:
+            changes: Dict[str, Dict[str, Any]] = {RASA: {}, DELEGATION: {}}
+            for event in events:
+                changes[event.source][event.key] = event.obj if event.kind == ACTIVATE else None
+            validator.snapshots.update(changes[RASA], changes[DELEGATION])
+            if refilter is not None:
+                refilter(affected(events))
+
+        with self._lock:
+            validator.reload(self.active_rasa_db, self.active_delegation_db)
+            self._listeners.append(apply)
+
+    def run(self, stop: threading.Event) -> None:
+        """
+        Advance at each boundary until stop is set. add() and remove() wake
+        it, so a new earlier boundary (or the first one) is not missed;
+        after setting stop, call wake() to end it without waiting for the
+        next boundary.
+        """
+        with self._changed:
+            while not stop.is_set():
+                upcoming = self.next_change()
+                if upcoming is not None and upcoming <= time.time():
+                    self.advance()
+                    continue
+                self._changed.wait(None if upcoming is None else upcoming - time.time())
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+
+class Affected(NamedTuple):
+    """What must be re-filtered after some events."""
+    sets: Set[str]          # AS-SETs whose RASA-SET or delegation changed
+    member_asns: Set[int]   # RASA-AUTH changed: every AS-SET containing them
+    member_sets: Set[str]   # RASA-AUTH for a nested AS-SET: every parent
+
+
+def affected(events: Iterable[ValidityEvent]) -> Affected:
+    """AS-SETs and members whose filters change with these events."""
+    result = Affected(set(), set(), set())
+    for event in events:
+        obj = event.obj
+        if event.source == DELEGATION:
+            result.sets.update(name for name in (_field(obj, "scope") or ())
+                               if isinstance(name, str))
+        elif _field(obj, "asSetName"):
+            result.sets.add(_field(obj, "asSetName"))               # RASA-SET
+        elif _field(obj, "authorizedAS") is not None:
+            result.member_asns.add(_field(obj, "authorizedAS"))     # RASA-AUTH for an ASN
+        elif _field(obj, "authorizedSet"):
+            result.member_sets.add(_field(obj, "authorizedSet"))    # RASA-AUTH for an AS-SET
+    return result
+
+
+if __name__ == "__main__":
+    from datetime import datetime, timezone
+
+    from rasa_validator import AuthorizedEntry, RASAValidator, RasaAuthContent
+
+    print("RASA Validity-Window Scheduler")
+    print("=" * 70)
+
+    def iso(epoch: float) -> str:
+        return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+    t0 = time.time()
+    target = "AS2914:AS-GLOBAL"
+
+    def auth(asn: int, start: float, end: float) -> RasaAuthContent:
+        return RasaAuthContent(authorizedAS=asn, authorizedIn=[AuthorizedEntry(target)],
+                               notBefore=iso(start), notAfter=iso(end))
+
+    rasa_db = {
+        "AS64496": auth(64496, t0 - 3600, t0 + 60),      # expires in a minute
+        "AS64497": auth(64497, t0 + 120, t0 + 86400),    # starts in two minutes
+        "AS64498": auth(64498, t0 - 3600, t0 + 86400),
+    }
+    validator = RASAValidator({}, log="off")
+    scheduler = ValidityScheduler(rasa_db, now=t0)
+    scheduler.attach(validator, refilter=lambda changed: print(f"  re-filter {changed}"))
+
+    def show(label: str) -> None:
+        states = {asn: validator.check_member_auth(asn, "AS-OTHER")[1] for asn in (64496, 64497, 64498)}
+        print(f"{label}: active={sorted(scheduler.active_rasa_db)}")
+        for asn, reason in states.items():
+            print(f"    AS{asn} in AS-OTHER: {reason}")
+
+    show("t0")
+    print(f"  next change in {scheduler.next_change() - t0:.0f}s")
+    for offset in (90, 150):
+        print(f"\nt0+{offset}s:")
+        events = scheduler.advance(t0 + offset)
+        print(f"  events {[(e.kind, e.key) for e in events]}")
+        show(f"t0+{offset}s")
+
+    # Dict-shaped objects and tokens, as loaded from JSON, are read the same way
+    changed = affected([
+        ValidityEvent(t0, EXPIRE, RASA, "AS64500", {"authorizedAS": 64500}),
+        ValidityEvent(t0, EXPIRE, RASA, "AS-X", {"asSetName": "AS64500:AS-X"}),
+        ValidityEvent(t0, ACTIVATE, DELEGATION, "t1", {"scope": ["AS64500:AS-Y"]}),
+    ])
+    assert changed == Affected({"AS64500:AS-X", "AS64500:AS-Y"}, {64500}, set()), changed
+    print(f"\naffected() on dict objects: sets={sorted(changed.sets)} "
+          f"member_asns={sorted(changed.member_asns)}")
+
+    # run() in the background: an add() from another thread wakes it, even
+    # with no boundary scheduled when it started waiting
+    live = ValidityScheduler()
+    activated = threading.Event()
+    live.subscribe(lambda events: any(e.kind == ACTIVATE for e in events) and activated.set())
+    stop = threading.Event()
+    runner = threading.Thread(target=live.run, args=(stop,))
+    runner.start()
+    time.sleep(0.05)
+    start = time.time()
+    live.add(RASA, "AS64499", auth(64499, start + 0.2, start + 3600))
+    assert activated.wait(5), "run() did not wake for a boundary added later"
+    print(f"\nrun(): AS64499 added from another thread, active after "
+          f"{time.time() - start:.2f}s (notBefore +0.20s)")
+    stop.set()
+    live.wake()
+    runner.join(5)
+    assert not runner.is_alive()
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    steps = 200
+    big = {f"AS{asn}": auth(asn, t0 + (asn % 997) * 10, t0 + 20000 + (asn % 991) * 10)
+           for asn in range(1, n + 1)}
+    windows = {key: validity_window(obj) for key, obj in big.items()}
+    start = time.perf_counter()
+    for step in range(steps):
+        now = t0 + step * 150
+        active = {key: obj for key, obj in big.items()
+                  if windows[key][0] <= now <= windows[key][1]}
+    rescan_time = time.perf_counter() - start
+
+    scheduler = ValidityScheduler(big, now=t0)
+    start = time.perf_counter()
+    changes = 0
+    for step in range(steps):
+        changes += len(scheduler.advance(t0 + step * 150))
+    heap_time = time.perf_counter() - start
+    assert set(scheduler.active_rasa_db) == set(active)
+    print(f"\n{n} objects, {steps} clock steps, {changes} boundary events")
+    print(f"  full rescan per step: {rescan_time * 1000:8.1f} ms")
+    print(f"  heap scheduler:       {heap_time * 1000:8.1f} ms")
+
+    # Keeping a validator in step: recompiling per batch vs applying the batch
+    sync_steps = 10
+    recompiled = RASAValidator({}, log="off")
+    full = ValidityScheduler(big, now=t0)
+    recompiled.reload(full.active_rasa_db)
+    full.subscribe(lambda _events: recompiled.reload(full.active_rasa_db))
+    incremental = RASAValidator({}, log="off")
+    scheduler = ValidityScheduler(big, now=t0)
+    scheduler.attach(incremental)
+    timings = []
+    for sched in (full, scheduler):
+        sched.advance(t0 + 19900)   # most objects active
+        start = time.perf_counter()
+        for step in range(1, sync_steps + 1):
+            sched.advance(t0 + 19900 + step * 150)
+        timings.append(time.perf_counter() - start)
+    a, b = recompiled.auth_index, incremental.auth_index
+    assert dict(a.asns) == dict(b.asns) and dict(a.sets) == dict(b.sets)
+    print(f"\nvalidator kept in step over {sync_steps} boundary batches:")
+    print(f"  full recompile per batch: {timings[0] * 1000:8.1f} ms")
+    print(f"  incremental update:       {timings[1] * 1000:8.1f} ms")